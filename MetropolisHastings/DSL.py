@@ -1,5 +1,3 @@
-import copy
-
 class DSL:
     """
     Implementation of a Domain Specific Language (DSL) for the Can't Stop
@@ -55,10 +53,13 @@ class DSL:
     
     @staticmethod
     def action_wins_at_least_one_column(state, action):
-        copy_state = copy.deepcopy(state)
-        copy_state.play(action)
-        columns_won = copy_state.columns_won_current_round()
-        columns_won_previously = state.columns_won_current_round()
+        # Play the action in place and undo it afterwards instead of
+        # deep-copying the whole state. unmake also takes back the dice
+        # play() draws, so the probe does not change the game's rolls.
+        columns_won_previously = list(state.columns_won_current_round())
+        token = state.make_move(action)
+        columns_won = list(state.columns_won_current_round())
+        state.unmake(token)
         if len(columns_won) > 0 and columns_won != columns_won_previously:
             return True
         return False
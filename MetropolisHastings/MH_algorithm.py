@@ -3,17 +3,30 @@ sys.path.insert(0,'..')
 import math
 import copy
 from game import Game
+from compact_game import CompactGame
 from play_game_template import play_single_game
 from players.vanilla_uct_player import Vanilla_UCT
 from players.uct_player import UCTPlayer
 from players.random_player import RandomPlayer
 from MetropolisHastings.MH_tree import DSL, DSLTree, Node
+from random_streams import python_random, spawn_seeds
+import numpy as np
 import time
 
 class MetropolisHastings:
-    def __init__(self, beta):
+    def __init__(self, beta, seed=None):
+        """
+        - seed (an int or a numpy SeedSequence) makes the run reproducible:
+          the mutations and each oracle game (dice and players) get their
+          own stream spawned from it. None uses the random module.
+        """
         self.beta = beta
         self.data = []
+        self.generator = None
+        self.games_seed = None
+        if seed is not None:
+            mutations_seed, self.games_seed = spawn_seeds(seed, 2)
+            self.generator = python_random(mutations_seed)
         '''
         # Toy version
         self.column_range = [2,6]
@@ -36,7 +49,7 @@ class MetropolisHastings:
     def run(self):
         script_object = None
         dsl = DSL()
-        tree = DSLTree(Node('S', ''), dsl)
+        tree = DSLTree(Node('S', ''), dsl, self.generator)
         tree.build_tree()
         current_best_program = tree.generate_random_program()
         #print('program = ', current_best_program)
@@ -46,7 +59,9 @@ class MetropolisHastings:
 
         for i in range(1000):
             
-            new_tree = copy.deepcopy(tree)
+            # The copy keeps using the same generator, otherwise a rejected
+            # mutation would replay the random choices of the previous one.
+            new_tree = copy.deepcopy(tree, {id(tree.generator): tree.generator})
             mutated_program = new_tree.generate_mutated_program(current_best_program)
 
             script_best_player = tree.generate_player(current_best_program)
@@ -68,13 +83,24 @@ class MetropolisHastings:
 
     def generate_oracle_data(self, n_games):
         
+        game_seeds = [None] * n_games
+        if self.games_seed is not None:
+            game_seeds = spawn_seeds(self.games_seed, n_games)
         for i in range(n_games):
             print('jogo ',  i)
+            rng = None
+            if game_seeds[i] is not None:
+                dice_seed, seed1, seed2 = game_seeds[i].spawn(3)
+                rng = np.random.default_rng(dice_seed)
             game = Game(self.n_players, self.dice_number, self.dice_value, 
-                        self.column_range, self.offset, self.initial_height
+                        self.column_range, self.offset, self.initial_height,
+                        rng
                         )
             player1 = Vanilla_UCT(c = 1, n_simulations = 50)
             player2 = Vanilla_UCT(c = 1, n_simulations = 50)
+            if rng is not None:
+                player1.seed(seed1)
+                player2.seed(seed2)
             self.simplified_play_single_game(player1, player2, game, 
                                                 self.max_game_length
                                             )
@@ -87,7 +113,11 @@ class MetropolisHastings:
         n_errors = 0
         v = 0
         for i in range(len(self.data)):
-            chosen_play, value = program.get_action(self.data[i][0])
+            state = CompactGame.from_bytes(self.data[i][0], self.n_players,
+                                            self.dice_number, self.dice_value,
+                                            self.column_range, self.offset,
+                                            self.initial_height)
+            chosen_play, value = program.get_action(state)
             if value == 1:
                 v += 1
             if chosen_play != self.data[i][1]:
@@ -132,7 +162,9 @@ class MetropolisHastings:
                 elif game.player_turn == 2 and not isinstance(player2, UCTPlayer):
                         chosen_play = player2.get_action(game)
 
-                self.data.append((game.clone(), chosen_play))
+                # States are stored encoded (see Game.to_bytes): a few
+                # dozen bytes each instead of a Game object.
+                self.data.append((game.to_bytes(), chosen_play))
                 # Needed because game.play() can automatically change 
                 # the player_turn attribute.
                 actual_player = game.player_turn
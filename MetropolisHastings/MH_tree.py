@@ -24,13 +24,20 @@ class Node:
 
 class DSLTree:
     """ Tree representing all transitions made based on the DSL provided. """
-    def __init__(self, node, dsl):
+    # Source of the random choices of the tree: the random module unless a
+    # random.Random is given to __init__.
+    generator = random
+
+    def __init__(self, node, dsl, generator=None):
         """
         - root is the starting symbol of the tree.
         - dsl is an instance of the DSL class.
+        - generator is a random.Random or None (see DSLTree.generator).
         """
         self.root = node
         self.dsl = dsl
+        if generator is not None:
+            self.generator = generator
         self.node_id = 0
         self.max_nodes = 20
 
@@ -71,16 +78,16 @@ class DSLTree:
         """Assign to 'node' a value related to its type. """
         if node.is_terminal:
             if node.state == 'terminal_num':
-                node.state = random.choice(self.dsl._grammar['COLS'])
+                node.state = self.generator.choice(self.dsl._grammar['COLS'])
                 node.parent = 'COLS'
             elif node.state == 'terminal_small':
-                node.state = random.choice(self.dsl._grammar['SMALL_NUM'])
+                node.state = self.generator.choice(self.dsl._grammar['SMALL_NUM'])
                 node.parent = 'SMALL_NUM'
         else:
             if  len(node.possible_values) != 0:
-                node.state = random.choice(node.possible_values)
+                node.state = self.generator.choice(node.possible_values)
                 if node.state in self.dsl._grammar:
-                    node.state = random.choice(self.dsl._grammar[node.state])
+                    node.state = self.generator.choice(self.dsl._grammar[node.state])
             # At this point the generated tree might not be finished (due to
             # the number of max nodes provided)
             
@@ -94,16 +101,16 @@ class DSLTree:
                     node.state = ''
                 elif node.state == 'BOOL':
                     # Force to finish BOOL
-                    node.state = random.choice(self.dsl._grammar[node.state])
+                    node.state = self.generator.choice(self.dsl._grammar[node.state])
                     # Force to finish ['B_0', 'B_1']
-                    node.state = random.choice(self.dsl._grammar[node.state])
+                    node.state = self.generator.choice(self.dsl._grammar[node.state])
                     # Force to finish possibles ['NUMBER', 'SMALL_NUM']
                     symbols = node.state.split()
                     for symbol in symbols:
                         if symbol in self.dsl._grammar:
                             node.state = node.state.replace(
                                     symbol, 
-                                    random.choice(self.dsl._grammar[symbol]), 
+                                    self.generator.choice(self.dsl._grammar[symbol]), 
                                     1
                                     )
             for child in node.children:
@@ -127,7 +134,7 @@ class DSLTree:
                 if symbol in self.dsl._grammar:
                     node.state = node.state.replace(
                                     symbol, 
-                                    random.choice(self.dsl._grammar[symbol]), 
+                                    self.generator.choice(self.dsl._grammar[symbol]), 
                                     1
                                     )
         for child in node.children:
@@ -138,7 +145,7 @@ class DSLTree:
         tree_size = self.get_tree_size(self.root)
         valid_mutation = False
         while not valid_mutation:
-            index_node = random.randint(2, tree_size - 2)
+            index_node = self.generator.randint(2, tree_size - 2)
             self._mutate_node(self.root, index_node)
             mutated_program = self.generate_random_program()
             if mutated_program != program:
@@ -147,11 +154,11 @@ class DSLTree:
 
     def _mutate_node(self, node, index):
         if node.node_id == index:
-            new_value = random.choice(self.dsl._grammar[node.parent])
+            new_value = self.generator.choice(self.dsl._grammar[node.parent])
             
 
             if new_value in self.dsl._grammar:
-                new_value = random.choice(self.dsl._grammar[new_value])
+                new_value = self.generator.choice(self.dsl._grammar[new_value])
 
             node.state = new_value
             return
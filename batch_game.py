@@ -0,0 +1,505 @@
+import numpy as np
+from game import combination_table, column_heights, decode_states, state_dtype
+from compact_game import CompactGame
+
+# Cache of the tables built by batch_tables(), one per (dice_number,
+# dice_value).
+_batch_tables = {}
+
+def batch_tables(dice_number, dice_value):
+    """
+    Return a dict with the tables shared by every BatchGame rolling
+    'dice_number' dice of 'dice_value' faces:
+    - actions is the list of every action, in the same order as
+      AlphaZeroPlayer.get_standard_dist_with_id: column pairs (i, j) with
+      i <= j, single columns (i,), then 'y' and 'n'. Actions are referred
+      to by their index in it (action ids).
+    - action_ids is the dict mapping each action to its id.
+    - action_columns is an int array of shape (n_actions, 2) with the
+      columns advanced by each action (-1 if none).
+    - roll_weights is an int array such that (roll - 1) @ roll_weights is
+      the roll id of 'roll' (the roll read as a base dice_value number).
+    - pairing_first and pairing_second are int arrays of shape (n_rolls, 3)
+      with the smallest and largest sum of each distinct pairing of a roll
+      (see combination_table), indexed by roll id.
+    - pairing_valid is a bool array of shape (n_rolls, 3), False for the
+      padding entries of rolls with less than 3 distinct pairings.
+    - pairing_action_ids is an int array of shape (n_rolls, 9) with the id
+      of the tuple action of each pairing, then of the single action of
+      its first sum, then of the single action of its second sum.
+    """
+
+    key = (dice_number, dice_value)
+    if key in _batch_tables:
+        return _batch_tables[key]
+
+    max_sum = dice_value * 2
+    actions = []
+    for i in range(2, max_sum + 1):
+        for j in range(i, max_sum + 1):
+            actions.append((i, j))
+    for i in range(2, max_sum + 1):
+        actions.append((i,))
+    actions.append('y')
+    actions.append('n')
+    action_ids = {action: action_id
+                    for action_id, action in enumerate(actions)}
+    action_columns = np.full((len(actions), 2), -1)
+    for action_id, action in enumerate(actions):
+        if action not in ('y', 'n'):
+            action_columns[action_id, :len(action)] = action
+
+    roll_weights = dice_value ** np.arange(dice_number - 1, -1, -1)
+    n_rolls = dice_value ** dice_number
+    pairing_first = np.zeros((n_rolls, 3), dtype=int)
+    pairing_second = np.zeros((n_rolls, 3), dtype=int)
+    pairing_valid = np.zeros((n_rolls, 3), dtype=bool)
+    pairing_action_ids = np.zeros((n_rolls, 9), dtype=int)
+    for roll, pairings in combination_table(dice_value).items():
+        roll_id = (np.array(roll) - 1) @ roll_weights
+        for p, (first_bit, second_bit, _) in enumerate(pairings):
+            first = first_bit.bit_length() - 1
+            second = second_bit.bit_length() - 1
+            pairing_first[roll_id, p] = first
+            pairing_second[roll_id, p] = second
+            pairing_valid[roll_id, p] = True
+            pairing_action_ids[roll_id, p] = action_ids[(first, second)]
+            pairing_action_ids[roll_id, 3 + p] = action_ids[(first,)]
+            pairing_action_ids[roll_id, 6 + p] = action_ids[(second,)]
+
+    _batch_tables[key] = {'actions': actions, 'action_ids': action_ids,
+                            'action_columns': action_columns,
+                            'roll_weights': roll_weights,
+                            'pairing_first': pairing_first,
+                            'pairing_second': pairing_second,
+                            'pairing_valid': pairing_valid,
+                            'pairing_action_ids': pairing_action_ids}
+    return _batch_tables[key]
+
+class BatchGame:
+    def __init__(self, n_games, n_players, dice_number, dice_value,
+                    column_range, offset, initial_height, rng=None):
+        """
+        N independent games of the same configuration stored as NumPy
+        arrays, so a vector of actions can be applied, and legal moves,
+        busts and wins computed, for all of them in one call. Each game
+        follows exactly the same rules as Game.
+
+        - n_games is the number of games (N).
+        - n_players, dice_number, dice_value, column_range, offset and
+          initial_height have the same meaning as in Game.
+        - rng is the numpy.random.Generator used to roll the dice (a new
+          one is created if None).
+        - n_slots is the number of entries per column axis (one per column
+          index, the first two are unused), as in CompactGame.
+        - heights is an array where heights[column] is the number of cells
+          of that column.
+        - The tables returned by batch_tables (actions, action_ids, ...)
+          are set as attributes, and yes_id and no_id are the ids of 'y'
+          and 'n'.
+        - positions is an int array of shape (N, n_players + 1, n_slots).
+          positions[g, marker, column] is the cell index of 'marker' in
+          'column' of game g, -1 if absent. Marker 0 is the neutral marker,
+          markers 1..n_players are the furthest permanent marker of each
+          player (same layout as CompactGame.positions).
+        - finished is an int array of shape (N, n_slots) with the player who
+          won each column (0 if the column is not finished).
+        - won_this_round is a bool array of shape (N, n_slots), True for the
+          columns won in the current round (Game.player_won_column).
+        - player_turn, n_neutral_markers and winner are int arrays of shape
+          (N,), dice_action is a bool array of shape (N,), current_roll an
+          int array of shape (N, dice_number) and n_won_columns an int
+          array of shape (N, n_players + 1). They have the same meaning as
+          in Game.
+        Finished games (winner != 0) are left untouched by every method.
+        """
+
+        self.n_games = n_games
+        self.n_players = n_players
+        self.dice_number = dice_number
+        self.dice_value = dice_value
+        self.column_range = column_range
+        self.offset = offset
+        self.initial_height = initial_height
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.n_slots = self.column_range[1] + 1
+        self.heights = np.array(column_heights(self.column_range,
+                                                self.offset,
+                                                self.initial_height
+                                                ))
+        self.__dict__.update(batch_tables(self.dice_number, self.dice_value))
+        self.yes_id = self.action_ids['y']
+        self.no_id = self.action_ids['n']
+
+        self.positions = np.full((n_games, n_players + 1, self.n_slots), -1)
+        self.finished = np.zeros((n_games, self.n_slots), dtype=int)
+        self.won_this_round = np.zeros((n_games, self.n_slots), dtype=bool)
+        self.player_turn = np.ones(n_games, dtype=int)
+        self.dice_action = np.ones(n_games, dtype=bool)
+        self.current_roll = self.roll_dice(n_games)
+        self.n_neutral_markers = np.zeros(n_games, dtype=int)
+        self.n_won_columns = np.zeros((n_games, n_players + 1), dtype=int)
+        self.winner = np.zeros(n_games, dtype=int)
+
+    @classmethod
+    def from_game(cls, game, n_games, rng=None):
+        """
+        Return a BatchGame holding n_games copies of the state of 'game' (a
+        Game or a CompactGame).
+        """
+
+        return cls.from_games([game], rng, n_games)
+
+    @classmethod
+    def from_games(cls, games, rng=None, n_copies=1):
+        """
+        Return a BatchGame holding the states of 'games', a list of Game or
+        CompactGame objects of the same configuration, each repeated
+        n_copies times in a row.
+        """
+
+        first = games[0]
+        batch = cls(len(games) * n_copies, first.n_players,
+                    first.dice_number, first.dice_value, first.column_range,
+                    first.offset, first.initial_height, rng)
+        for g, game in enumerate(games):
+            if not isinstance(game, CompactGame):
+                game = CompactGame.from_game(game)
+            rows = slice(g * n_copies, (g + 1) * n_copies)
+            batch.positions[rows] = np.reshape(game.positions,
+                                                (batch.n_players + 1,
+                                                    batch.n_slots))
+            for column, player in game.finished_columns:
+                batch.finished[rows, column] = player
+            for column, _ in game.player_won_column:
+                batch.won_this_round[rows, column] = True
+            batch.player_turn[rows] = game.player_turn
+            batch.dice_action[rows] = game.dice_action
+            batch.current_roll[rows] = game.current_roll
+            batch.n_neutral_markers[rows] = game.n_neutral_markers
+            batch.n_won_columns[rows] = game.n_won_columns
+            batch.winner[rows] = game.winner
+        return batch
+
+    @classmethod
+    def from_bytes(cls, data, n_players, dice_number, dice_value,
+                    column_range, offset, initial_height, rng=None):
+        """
+        Return a BatchGame holding the states encoded in 'data', the
+        concatenation of the to_bytes of games (Game, CompactGame or
+        BatchGame) of the given configuration. All states are decoded at
+        once by decode_states (game.py).
+        """
+
+        states = decode_states(data, n_players, dice_number, column_range)
+        batch = cls(len(states), n_players, dice_number, dice_value,
+                    column_range, offset, initial_height, rng)
+        columns = slice(column_range[0], column_range[1] + 1)
+        batch.positions[:, :, columns] = states['positions'].astype(int) - 1
+        batch.finished[:, columns] = states['finished']
+        batch.won_this_round[:, columns] = states['won'] != 0
+        batch.player_turn[:] = states['player_turn']
+        batch.dice_action[:] = states['dice_action'] != 0
+        batch.current_roll[:] = states['current_roll']
+        batch.n_neutral_markers[:] = states['n_neutral_markers']
+        for player in range(1, n_players + 1):
+            batch.n_won_columns[:, player] = np.sum(
+                                    states['finished'] == player, axis=1)
+        # Same order as Game: player 1 is checked first.
+        has_won = batch.n_won_columns[:, 1:] >= 3
+        batch.winner[:] = np.where(has_won.any(axis=1),
+                                    has_won.argmax(axis=1) + 1, 0)
+        return batch
+
+    def to_bytes(self):
+        """
+        Return the states of all games encoded at once, the concatenation
+        of the Game.to_bytes of each game (see state_dtype in game.py).
+        """
+
+        states = np.zeros(self.n_games, dtype=state_dtype(self.n_players,
+                                                        self.dice_number,
+                                                        self.column_range))
+        columns = slice(self.column_range[0], self.column_range[1] + 1)
+        states['player_turn'] = self.player_turn
+        states['dice_action'] = self.dice_action
+        states['n_neutral_markers'] = self.n_neutral_markers
+        states['current_roll'] = self.current_roll
+        states['positions'] = self.positions[:, :, columns] + 1
+        states['finished'] = self.finished[:, columns]
+        states['won'] = self.won_this_round[:, columns]
+        return states.tobytes()
+
+    def to_compact_game(self, g):
+        """Return a CompactGame with the state of game g."""
+
+        game = CompactGame.__new__(CompactGame)
+        game.n_players = self.n_players
+        game.dice_number = self.dice_number
+        game.dice_value = self.dice_value
+        game.column_range = self.column_range
+        game.offset = self.offset
+        game.initial_height = self.initial_height
+        game.n_slots = self.n_slots
+        game.heights = self.heights.tolist()
+        game.positions = self.positions[g].flatten().tolist()
+        game.neutral_columns = np.flatnonzero(
+                                    self.positions[g, 0] != -1).tolist()
+        game.finished_columns = [(column, int(self.finished[g, column]))
+                                    for column in np.flatnonzero(
+                                            self.finished[g]).tolist()]
+        game.player_won_column = [(column, int(self.player_turn[g]))
+                                    for column in np.flatnonzero(
+                                            self.won_this_round[g]).tolist()]
+        game.player_turn = int(self.player_turn[g])
+        game.dice_action = bool(self.dice_action[g])
+        game.dice_stream = None
+        game.current_roll = tuple(self.current_roll[g].tolist())
+        game.n_neutral_markers = int(self.n_neutral_markers[g])
+        game.actions_taken = []
+        game.finished_columns_mask = 0
+        game.player_won_column_mask = 0
+        game.neutral_columns_mask = 0
+        for column, _ in game.finished_columns:
+            game.finished_columns_mask |= 1 << column
+        for column, _ in game.player_won_column:
+            game.player_won_column_mask |= 1 << column
+        for column in game.neutral_columns:
+            game.neutral_columns_mask |= 1 << column
+        game.n_won_columns = self.n_won_columns[g].tolist()
+        game.winner = int(self.winner[g])
+        game.zobrist_hash = game.compute_zobrist_hash()
+        return game
+
+    def roll_ids(self, rolls):
+        """Return the roll id of each row of the int array 'rolls'."""
+
+        return (rolls - 1) @ self.roll_weights
+
+    def roll_dice(self, n_rolls):
+        """Return an int array of shape (n_rolls, dice_number) of rolls."""
+
+        return self.rng.integers(1, self.dice_value + 1,
+                                    size=(n_rolls, self.dice_number))
+
+    def neutral_columns_mask(self):
+        """Return a bool array (N, n_slots), True if a column has a neutral."""
+
+        return self.positions[:, 0, :] != -1
+
+    def is_finished(self):
+        """
+        Return two arrays of shape (N,): the winner of each game (0 if the
+        game is not over yet) and a bool array telling if it is over.
+        """
+
+        return self.winner, self.winner != 0
+
+    def available_moves_mask(self):
+        """
+        Return a bool array of shape (N, n_actions) where entry [g, a] is
+        True if action a is in the available_moves() of game g. Games
+        waiting for the 'y'/'n' decision only have 'y' and 'n' available
+        and finished games have no action available.
+        """
+
+        rows = np.arange(self.n_games)[:, None]
+        roll_ids = self.roll_ids(self.current_roll)
+        first = self.pairing_first[roll_ids]
+        second = self.pairing_second[roll_ids]
+        valid = self.pairing_valid[roll_ids]
+
+        closed = (self.finished != 0) | self.won_this_round
+        neutral = self.neutral_columns_mask()
+        open_first = ~closed[rows, first]
+        open_second = ~closed[rows, second]
+        neutral_first = neutral[rows, first]
+        neutral_second = neutral[rows, second]
+        n_neutral_markers = self.n_neutral_markers[:, None]
+
+        # Same conditions as check_tuple_availability and
+        # check_value_availability.
+        tuple_available = open_first & open_second & (
+            (n_neutral_markers < 2)
+            | ((n_neutral_markers == 2)
+                & (neutral_first | neutral_second | (first == second)))
+            | ((n_neutral_markers > 2) & neutral_first & neutral_second))
+        first_available = open_first & ((n_neutral_markers < 3)
+                                        | neutral_first)
+        second_available = open_second & ((n_neutral_markers < 3)
+                                            | neutral_second)
+
+        playing = (self.dice_action & (self.winner == 0))[:, None] & valid
+        # A playable tuple implies both of its columns are playable alone,
+        # so the single columns are only moves when the tuple is not.
+        selected = np.concatenate([playing & tuple_available,
+                                    playing & first_available
+                                        & ~tuple_available,
+                                    playing & second_available
+                                        & ~tuple_available], axis=1)
+        flat_ids = self.pairing_action_ids[roll_ids] \
+                    + rows * len(self.actions)
+        mask = np.zeros((self.n_games, len(self.actions)), dtype=bool)
+        mask.reshape(-1)[flat_ids[selected]] = True
+
+        deciding = ~self.dice_action & (self.winner == 0)
+        mask[deciding, self.yes_id] = True
+        mask[deciding, self.no_id] = True
+        return mask
+
+    def is_player_busted(self, moves_mask):
+        """
+        Check which games have no remaining plays given 'moves_mask' (as
+        returned by available_moves_mask). Busted games lose their neutral
+        markers and the columns won in the round, the turn passes to the
+        next player and new dice are rolled, as in Game.is_player_busted.
+        Return a bool array of shape (N,) with the busted games.
+        """
+
+        busted = self.dice_action & (self.winner == 0) \
+                    & ~moves_mask.any(axis=1)
+        if busted.any():
+            self.positions[busted, 0, :] = -1
+            self.won_this_round[busted] = False
+            self.n_neutral_markers[busted] = 0
+            self.player_turn[busted] = self.player_turn[busted] \
+                                        % self.n_players + 1
+            self.current_roll[busted] = self.roll_dice(busted.sum())
+        return busted
+
+    def play(self, action_ids):
+        """
+        Apply the action action_ids[g] to every game g, as Game.play does.
+        Entries equal to -1 and finished games are skipped. Actions must be
+        available in their game (see available_moves_mask).
+        """
+
+        action_ids = np.asarray(action_ids)
+        active = (action_ids != -1) & (self.winner == 0)
+        action_ids = np.where(active, action_ids, 0)
+
+        stop = active & (action_ids == self.no_id)
+        if stop.any():
+            self.transform_neutral_markers(stop)
+        self.dice_action[active & ((action_ids == self.yes_id) | stop)] = True
+
+        moving = active & self.dice_action & (action_ids != self.yes_id) \
+                    & (action_ids != self.no_id)
+        games = np.flatnonzero(moving)
+        if len(games) == 0:
+            return
+        # Columns are advanced one at a time, a (7,7) pair advances 7 twice.
+        for columns in self.action_columns[action_ids[games]].T:
+            selected = games[columns != -1]
+            self.advance(selected, columns[columns != -1])
+        self.dice_action[games] = False
+        self.current_roll[games] = self.roll_dice(len(games))
+
+    def advance(self, games, columns):
+        """
+        Advance the neutral marker of columns[k] in each game games[k] (see
+        Game.play).
+        """
+
+        players = self.player_turn[games]
+        neutral = self.positions[games, 0, columns]
+        base = np.where(neutral != -1, neutral,
+                        self.positions[games, players, columns])
+        at_top = base == self.heights[columns] - 1
+        # Placing a neutral marker counts it even if the player only wins
+        # the column and no marker is put on the board.
+        self.n_neutral_markers[games] += neutral == -1
+        self.won_this_round[games[at_top], columns[at_top]] = True
+        self.positions[games, 0, columns] = np.where(at_top, neutral,
+                                                        base + 1)
+
+    def transform_neutral_markers(self, stop):
+        """
+        Transform the neutral markers of the games in the bool array 'stop'
+        into markers of their player, mark the columns won in the round as
+        finished, check for a winner and pass the turn, as in
+        Game.transform_neutral_markers.
+        """
+
+        games = np.flatnonzero(stop)
+        players = self.player_turn[games]
+        neutral = self.positions[games, 0, :]
+        progress = self.positions[games, players, :]
+        self.positions[games, players, :] = np.where(neutral != -1, neutral,
+                                                        progress)
+        self.positions[games, 0, :] = -1
+
+        won = self.won_this_round[games]
+        won_games, won_columns = np.nonzero(won)
+        if len(won_games) > 0:
+            # A won column only holds the marker of its winner.
+            self.positions[games[won_games], :, won_columns] = -1
+            self.positions[games[won_games], players[won_games],
+                            won_columns] = self.heights[won_columns] - 1
+            self.finished[games[won_games], won_columns] = \
+                                                        players[won_games]
+            self.n_won_columns[games, players] += won.sum(axis=1)
+            winners = self.n_won_columns[games, players] >= 3
+            self.winner[games[winners]] = players[winners]
+        self.won_this_round[games] = False
+
+        self.player_turn[games] = players % self.n_players + 1
+        self.n_neutral_markers[games] = 0
+
+    def random_actions(self, moves_mask):
+        """
+        Return an int array of shape (N,) with an action drawn uniformly
+        among the True entries of each row of 'moves_mask' (-1 for rows
+        with no True entry).
+        """
+
+        scores = self.rng.random(moves_mask.shape)
+        scores[~moves_mask] = -1.
+        actions = scores.argmax(axis=1)
+        actions[~moves_mask.any(axis=1)] = -1
+        return actions
+
+    def select(self, games):
+        """
+        Return a BatchGame with a copy of the games selected by 'games' (an
+        index or bool array), sharing the tables and rng of this one.
+        """
+
+        batch = BatchGame.__new__(BatchGame)
+        batch.__dict__.update(self.__dict__)
+        for name in ['positions', 'finished', 'won_this_round',
+                        'player_turn', 'dice_action', 'current_roll',
+                        'n_neutral_markers', 'n_won_columns', 'winner']:
+            setattr(batch, name, getattr(self, name)[games])
+        batch.n_games = len(batch.winner)
+        return batch
+
+    def random_playout(self):
+        """
+        Play random actions (see random_actions) in a copy of every game
+        until it is over and return the array of winners. The games of
+        this batch are left untouched. Finished games are dropped from the
+        copy, so the remaining steps only work on the unfinished ones.
+        """
+
+        winners = self.winner.copy()
+        games = np.flatnonzero(winners == 0)
+        batch = self.select(games)
+        while len(games) > 0:
+            moves_mask = batch.available_moves_mask()
+            busted = batch.is_player_busted(moves_mask)
+            actions = batch.random_actions(moves_mask)
+            actions[busted] = -1
+            batch.play(actions)
+            # The 'y'/'n' decision following a play is drawn right away, so
+            # the next step starts with a dice roll again.
+            decisions = np.where(batch.rng.random(batch.n_games) < 0.5,
+                                    batch.yes_id, batch.no_id)
+            decisions[batch.dice_action] = -1
+            batch.play(decisions)
+            over = batch.winner != 0
+            if over.any():
+                winners[games[over]] = batch.winner[over]
+                games = games[~over]
+                batch = batch.select(~over)
+        return winners
@@ -0,0 +1,662 @@
+import math
+import pickle
+import random
+import sys
+import timeit
+import tracemalloc
+from collections import defaultdict
+from game import Game
+from compact_game import CompactGame
+from check_game_equivalence import reference_available_moves
+from rollout_kernel import random_rollout
+from batch_game import BatchGame
+from bust_tables import bust_probability
+from players.uct_player import Node
+from players.vanilla_uct_player import Vanilla_UCT
+import numpy as np
+
+# (n_players, dice_number, dice_value, column_range, offset, initial_height)
+ORIGINAL_CONFIG = (2, 4, 6, [2,12], 2, 2)
+
+def random_position(game, n_plays):
+    """
+    Apply up to n_plays random plays to 'game' (stopping earlier if the game
+    ends) and return it. Used to benchmark mid-game positions.
+    """
+
+    plays = 0
+    while plays < n_plays and not game.is_finished()[1]:
+        moves = game.available_moves()
+        if game.is_player_busted(moves):
+            continue
+        game.play(random.choice(moves))
+        plays += 1
+    return game
+
+def time_per_call(function, n_runs):
+    """Return the average time in microseconds of calling 'function'."""
+
+    return timeit.timeit(function, number=n_runs) / n_runs * 1e6
+
+def benchmark_clone(n_runs):
+    """
+    Compare the previous pickle round-trip clone against Game.clone()
+    (copy-on-write columns) and CompactGame.clone() on a mid-game position
+    of the original 2-12 board. Cloning then playing one move is also timed
+    since copy-on-write defers part of the copy to the first modification.
+    """
+
+    random.seed(0)
+    game = random_position(Game(*ORIGINAL_CONFIG), 40)
+    compact = CompactGame.from_game(game)
+    move = game.available_moves()[0]
+
+    def pickle_clone():
+        return pickle.loads(pickle.dumps(game, -1))
+
+    def pickle_clone_and_play():
+        pickle_clone().play(move)
+
+    def game_clone_and_play():
+        game.clone().play(move)
+
+    def compact_clone_and_play():
+        compact.clone().play(move)
+
+    results = [
+                ('pickle round-trip', time_per_call(pickle_clone, n_runs),
+                    time_per_call(pickle_clone_and_play, n_runs)),
+                ('Game.clone', time_per_call(game.clone, n_runs),
+                    time_per_call(game_clone_and_play, n_runs)),
+                ('CompactGame.clone', time_per_call(compact.clone, n_runs),
+                    time_per_call(compact_clone_and_play, n_runs))
+                ]
+    pickle_time = results[0][1]
+    pickle_play_time = results[0][2]
+    print('Clone benchmark (2-12 board, mid-game position,', n_runs, 'runs)')
+    for name, clone_time, play_time in results:
+        print('    {:18s} clone: {:8.2f} us ({:6.1f}x)   '
+                'clone + play: {:8.2f} us ({:6.1f}x)'.format(
+                name, clone_time, pickle_time / clone_time,
+                play_time, pickle_play_time / play_time))
+
+def benchmark_make_move(n_runs):
+    """
+    Compare applying a play to a copy (clone then play, as UCTPlayer does
+    once per node it creates) against applying it in place and reverting
+    it (make_move then unmake) on a mid-game position of the 2-12 board.
+    Then count, over a Vanilla_UCT search (fast rollouts) of n_runs // 20
+    simulations, the nodes created and the plays of the descents, which a
+    descent on a single scratch state per simulation would make and undo
+    in place instead.
+    """
+
+    random.seed(0)
+    game = random_position(Game(*ORIGINAL_CONFIG), 40)
+    compact = CompactGame.from_game(game)
+    move = game.available_moves()[0]
+
+    print('Play benchmark (2-12 board, mid-game position,', n_runs, 'runs)')
+    for name, state in [('Game', game), ('CompactGame', compact)]:
+        print('    {:12s} clone + play: {:6.2f} us   make_move + unmake: '
+                '{:6.2f} us'.format(name,
+                    time_per_call(lambda: state.clone().play(move), n_runs),
+                    time_per_call(lambda: state.unmake(state.make_move(move)),
+                                    n_runs)))
+
+    n_simulations = max(1, n_runs // 20)
+    player = Vanilla_UCT(1, n_simulations, fast_rollout=True)
+    player.seed(0)
+    depths = []
+    backpropagate = player.backpropagate
+    def recording_backpropagate(search_path, edges, value):
+        depths.append(len(edges))
+        backpropagate(search_path, edges, value)
+    player.backpropagate = recording_backpropagate
+    start = timeit.default_timer()
+    player.run_UCT(game, [])
+    seconds = timeit.default_timer() - start
+    print('    Vanilla_UCT, {} simulations: {:.0f} us per simulation, {:.2f} '
+            'nodes created and {:.2f} plays descended per simulation'.format(
+            n_simulations, seconds / n_simulations * 1e6,
+            player.get_tree_size(player.root.parent) / n_simulations,
+            sum(depths) / n_simulations))
+
+def benchmark_available_moves(n_runs):
+    """
+    Compare the original available_moves (column scans through
+    check_value_availability/check_tuple_availability) against the
+    table-based Game.available_moves() and CompactGame.available_moves()
+    over mid-game positions of the original 2-12 board.
+    """
+
+    random.seed(0)
+    games = []
+    while len(games) < 100:
+        game = random_position(Game(*ORIGINAL_CONFIG), random.randrange(60))
+        if game.dice_action and not game.is_finished()[1]:
+            games.append(game)
+    compacts = [CompactGame.from_game(game) for game in games]
+
+    def reference():
+        for game in games:
+            reference_available_moves(game)
+
+    def table():
+        for game in games:
+            game.available_moves()
+
+    def compact_table():
+        for compact in compacts:
+            compact.available_moves()
+
+    results = [(name, time_per_call(function, n_runs) / len(games))
+                for name, function in [('reference', reference),
+                                        ('Game', table),
+                                        ('CompactGame', compact_table)]]
+    reference_time = results[0][1]
+    print('available_moves benchmark (2-12 board,', len(games),
+            'positions,', n_runs, 'runs)')
+    for name, call_time in results:
+        print('    {:12s} {:6.2f} us per call ({:4.1f}x)'.format(
+                name, call_time, reference_time / call_time))
+
+def benchmark_rollout(n_runs, repetitions=7):
+    """
+    Compare the rollouts per second of Vanilla_UCT.rollout driving a Game
+    against random_rollout (rollout_kernel.py) and BatchGame playouts on
+    the original 2-12 board, from the initial position and from 20
+    mid-game positions. Each timing is the median of 'repetitions'
+    repetitions of n_runs rollouts per position, after one warm-up
+    repetition (random_rollout caches the moves it computes). Every
+    repetition draws from the same seeds, so they all play the same
+    rollouts. Batched playouts (Vanilla_UCT with rollouts_per_leaf, up to
+    100) are timed the same way. The share of rollouts won by player 1 is
+    also printed: all follow the same random policy, so they should be
+    close.
+    """
+
+    random.seed(0)
+    mid_game = []
+    while len(mid_game) < 20:
+        game = random_position(Game(*ORIGINAL_CONFIG), random.randrange(60))
+        if not game.is_finished()[1]:
+            mid_game.append(game)
+    player = Vanilla_UCT(c = 1, n_simulations = 1)
+    batch_player = Vanilla_UCT(c = 1, n_simulations = 1,
+                                rollouts_per_leaf = min(n_runs, 100))
+
+    print('Rollout benchmark (2-12 board,', n_runs,
+            'rollouts per position, median of', repetitions, 'repetitions)')
+    for description, games in [('initial position',
+                                    [Game(*ORIGINAL_CONFIG)]),
+                                (str(len(mid_game)) + ' mid-game positions',
+                                    mid_game)]:
+        nodes = [Node(game) for game in games]
+
+        def game_rollouts():
+            player.seed(0)
+            return sum(player.rollout(node) == 1 for node in nodes
+                        for _ in range(n_runs))
+
+        def kernel_rollouts():
+            generator = random.Random(0)
+            return sum(random_rollout(game, generator) == 1 for game in games
+                        for _ in range(n_runs))
+
+        def batch_rollouts():
+            batch_player.seed(0)
+            # Each call returns the mean value of rollouts_per_leaf games.
+            return sum((batch_player.rollout(node) + 1) / 2
+                        * batch_player.rollouts_per_leaf
+                        for node in nodes
+                        for _ in range(n_runs
+                                        // batch_player.rollouts_per_leaf))
+
+        results = []
+        for name, function in [('Game', game_rollouts),
+                                ('random_rollout', kernel_rollouts),
+                                ('BatchGame x' + str(
+                                    batch_player.rollouts_per_leaf),
+                                    batch_rollouts)]:
+            function()
+            times = []
+            for _ in range(repetitions):
+                start = timeit.default_timer()
+                player_1_wins = function()
+                times.append(timeit.default_timer() - start)
+            n_rollouts = len(games) * n_runs
+            if function == batch_rollouts:
+                n_rollouts = len(games) * (n_runs
+                                            // batch_player.rollouts_per_leaf
+                                            * batch_player.rollouts_per_leaf)
+            median_time = sorted(times)[len(times) // 2]
+            results.append((name, n_rollouts / median_time,
+                            player_1_wins / n_rollouts))
+        game_rate = results[0][1]
+        print('  ', description)
+        for name, rate, player_1_rate in results:
+            print('    {:15s} {:8.0f} rollouts/s ({:5.1f}x)   '
+                    'player 1 wins: {:.3f}'.format(name, rate,
+                                                    rate / game_rate,
+                                                    player_1_rate))
+
+def benchmark_batch(n_runs):
+    """
+    Compare the time to play n_runs random games on the original 2-12
+    board one Game at a time against playing them all at once with a
+    BatchGame (same random policy: a uniform choice among the available
+    moves, including 'y' and 'n').
+    """
+
+    def play_games():
+        for _ in range(n_runs):
+            game = Game(*ORIGINAL_CONFIG)
+            while not game.is_finished()[1]:
+                moves = game.available_moves()
+                if game.is_player_busted(moves):
+                    continue
+                game.play(random.choice(moves))
+
+    def play_batch():
+        BatchGame(n_runs, *ORIGINAL_CONFIG).random_playout()
+
+    print('Random games benchmark (2-12 board,', n_runs, 'games)')
+    start = timeit.default_timer()
+    play_games()
+    game_time = timeit.default_timer() - start
+    start = timeit.default_timer()
+    play_batch()
+    batch_time = timeit.default_timer() - start
+    print('  Game       {:8.0f} games/s'.format(n_runs / game_time))
+    print('  BatchGame  {:8.0f} games/s ({:.1f}x)'.format(
+            n_runs / batch_time, game_time / batch_time))
+
+def benchmark_bust_probability(n_runs):
+    """
+    Compare bust_probability (bust_tables.py) against estimating the
+    probability of busting by simulating 1000 rolls with
+    Game.available_moves, on a mid-game position of the original 2-12
+    board with 3 neutral markers.
+    """
+
+    random.seed(0)
+    game = Game(*ORIGINAL_CONFIG)
+    while game.n_neutral_markers < 3 or game.dice_action:
+        if game.is_finished()[1]:
+            game = Game(*ORIGINAL_CONFIG)
+        game = random_position(game, 1)
+    state = game.clone()
+    state.play('y')
+
+    def simulate_rolls():
+        n_busts = 0
+        for _ in range(1000):
+            state.current_roll = state.roll_dice()
+            if not state.available_moves():
+                n_busts += 1
+        return n_busts / 1000
+
+    print('Bust probability (2-12 board, 3 neutral markers)')
+    print('  1000 simulated rolls: {:10.1f} us (estimate {:.3f})'.format(
+            time_per_call(simulate_rolls, max(1, n_runs // 1000)),
+            simulate_rolls()))
+    print('  bust_probability:     {:10.1f} us (exact    {:.3f})'.format(
+            time_per_call(lambda: bust_probability(game), n_runs),
+            bust_probability(game)))
+
+def benchmark_dice(n_runs):
+    """
+    Compare Game.roll_dice with the random module against rolling from the
+    DiceStream (random_streams.py) of a seeded Game.
+    """
+
+    game = Game(*ORIGINAL_CONFIG)
+    seeded_game = Game(*ORIGINAL_CONFIG, np.random.default_rng(0))
+    print('Dice roll (4 dice)')
+    print('  random module: {:6.3f} us'.format(
+            time_per_call(game.roll_dice, n_runs)))
+    print('  DiceStream:    {:6.3f} us'.format(
+            time_per_call(seeded_game.roll_dice, n_runs)))
+
+def benchmark_serialization(n_runs):
+    """
+    Compare pickling a mid-game Game against its fixed-size encoding
+    (Game.to_bytes), and decoding states one at a time against decoding a
+    buffer of 1000 states at once with BatchGame.from_bytes.
+    """
+
+    random.seed(0)
+    game = random_position(Game(*ORIGINAL_CONFIG), 60)
+    pickled = pickle.dumps(game, -1)
+    encoded = game.to_bytes()
+    buffer = encoded * 1000
+    print('Serialization of a mid-game state (2-12 board)')
+    print('  pickle:             {:5d} bytes, dumps {:6.1f} us, '
+            'loads {:6.1f} us'.format(len(pickled),
+            time_per_call(lambda: pickle.dumps(game, -1), n_runs),
+            time_per_call(lambda: pickle.loads(pickled), n_runs)))
+    print('  to_bytes:           {:5d} bytes, encode {:5.1f} us, '
+            'Game.from_bytes {:6.1f} us, CompactGame.from_bytes {:6.1f} us'
+            .format(len(encoded),
+            time_per_call(game.to_bytes, n_runs),
+            time_per_call(lambda: Game.from_bytes(encoded, *ORIGINAL_CONFIG),
+                            n_runs),
+            time_per_call(lambda: CompactGame.from_bytes(encoded,
+                                                        *ORIGINAL_CONFIG),
+                            n_runs)))
+    print('  BatchGame.from_bytes of 1000 states: {:6.1f} us'.format(
+            time_per_call(lambda: BatchGame.from_bytes(buffer,
+                                                        *ORIGINAL_CONFIG),
+                            max(1, n_runs // 100))))
+
+class LegacyNode:
+    """
+    Node as stored before Node used __slots__ and arrays: one dict per node
+    and its children and statistics in dicts, children being created (with
+    their Game) as soon as their parent is expanded. Only used to measure
+    the memory of the old layout in benchmark_tree_memory.
+    """
+
+    def __init__(self, state, parent=None):
+        self.state = state
+        self.n_visits = 0
+        self.n_a = defaultdict(lambda: 0, {})
+        self.q_a = defaultdict(lambda: 0, {})
+        self.p_a = defaultdict(lambda: 0, {})
+        self.parent = parent
+        self.children = {}
+        self.action_taken = None
+
+def legacy_tree(node, parent=None):
+    """
+    Return a LegacyNode tree with the statistics of the Node tree rooted at
+    'node', creating every child of an expanded node as the old layout did.
+    """
+
+    legacy = LegacyNode(node.state.clone(), parent)
+    legacy.n_visits = node.n_visits
+    for i, action in enumerate(node.actions):
+        child = node.children[i]
+        if child is not None:
+            legacy_child = legacy_tree(child, legacy)
+        else:
+            child_game = node.state.clone()
+            child_game.play(action)
+            legacy_child = LegacyNode(child_game, legacy)
+        legacy_child.action_taken = action
+        legacy.children[action] = legacy_child
+        legacy.n_a[action] = node.n_a[i]
+        legacy.q_a[action] = node.q_a[i]
+    return legacy
+
+def slotted_tree(node, parent=None):
+    """
+    Return a copy of the Node tree rooted at 'node', so it is measured the
+    same way as legacy_tree.
+    """
+
+    new_node = Node(node.state.clone(), parent)
+    new_node.n_visits = node.n_visits
+    new_node.expand(node.actions)
+    for i, child in enumerate(node.children):
+        if child is not None:
+            new_node.children[i] = slotted_tree(child, new_node)
+        new_node.n_a[i] = node.n_a[i]
+        new_node.q_a[i] = node.q_a[i]
+    return new_node
+
+def count_nodes(node):
+    """Return the number of nodes of a Node or LegacyNode tree."""
+
+    children = node.children
+    if isinstance(children, dict):
+        children = children.values()
+    return 1 + sum(count_nodes(child) for child in children
+                    if child is not None)
+
+def traced_memory(build):
+    """
+    Return the result of build() and the memory it still holds (bytes
+    allocated by build and not freed when it returns).
+    """
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+def benchmark_tree_memory(n_runs):
+    """
+    Compare the memory of the search tree of a Vanilla_UCT move with
+    n_runs simulations from a mid-game position of the 2-12 board against
+    the same tree in the old layout (see LegacyNode), and against the tree
+    of a Vanilla_UCT keeping it in a TreeStore (tree_store.py) of 2 n_runs
+    nodes, whose arrays are all counted, the encoded states included.
+    Bytes include the Game of every node. The time of both searches is
+    printed too. Finally, the memory
+    kept by a search is compared with the one kept when the states of the
+    nodes whose children are all created are dropped (max_interior_states
+    of UCTPlayer set to 1).
+    """
+
+    random.seed(0)
+    game = random_position(Game(*ORIGINAL_CONFIG), 30)
+    while game.is_player_busted(game.available_moves()):
+        pass
+    player = Vanilla_UCT(c = 1, n_simulations = n_runs)
+
+    def search():
+        player.run_UCT(game, [])
+        # run_UCT moves the root to the child of the chosen action.
+        return player.root.parent
+
+    start = timeit.default_timer()
+    root = search()
+    node_time = timeit.default_timer() - start
+    # Both layouts are built from the searched tree so that only the nodes
+    # (and their Game) are measured.
+    slotted_root, tree_bytes = traced_memory(lambda: slotted_tree(root))
+    legacy_root, legacy_bytes = traced_memory(lambda: legacy_tree(root))
+    print('Search tree of', n_runs, 'simulations (2-12 board)')
+    for name, tree, n_bytes in [('dict nodes', legacy_root, legacy_bytes),
+                                ('slotted nodes', slotted_root, tree_bytes)]:
+        n_nodes = count_nodes(tree)
+        print('  {:13s} {:7d} nodes, {:6.0f} bytes/node, {:7.2f} MB'.format(
+                name, n_nodes, n_bytes / n_nodes, n_bytes / 2**20))
+    print('  tree memory: {:.2f}x smaller'.format(legacy_bytes / tree_bytes))
+
+    random.seed(0)
+    start = timeit.default_timer()
+    store_player, store_bytes = traced_memory(lambda: Vanilla_UCT(c = 1,
+                                    n_simulations = n_runs,
+                                    tree_store_size = 2 * n_runs))
+    store_player.run_UCT_store(game, [])
+    store_time = timeit.default_timer() - start
+    store = store_player.tree_store
+    # The array of the encoded states is allocated by the first search.
+    store_bytes += store.packed.nbytes
+    print('  {:13s} {:7d} nodes, {:6.0f} bytes/node, {:7.2f} MB'.format(
+            'tree store', store.n_nodes(), store_bytes / store.n_nodes(),
+            store_bytes / 2**20))
+    print('  search time: Node {:.2f} s, tree store {:.2f} s'.format(
+            node_time, store_time))
+
+    print('Memory kept by a search of', n_runs, 'simulations')
+    for max_interior_states in [0, 1]:
+        random.seed(0)
+        player = Vanilla_UCT(c = 1, n_simulations = n_runs,
+                                max_interior_states = max_interior_states)
+        root, n_bytes = traced_memory(search)
+        n_nodes = count_nodes(root)
+        print('  max_interior_states={}: {:7d} nodes, {:6.0f} bytes/node, '
+                '{:7.2f} MB'.format(max_interior_states, n_nodes,
+                                    n_bytes / n_nodes, n_bytes / 2**20))
+
+def legacy_select_child(player, node):
+    """
+    Return what UCTPlayer.select_child returns, computed as it was before
+    it was rewritten as a single loop: one UCB1 method call per action,
+    then a sort of all the scores. Only used by benchmark_select.
+    """
+
+    def calculate_ucb_max(node, i):
+        return node.q_a[i] + player.c * math.sqrt(
+                                np.divide(math.log(node.n_visits), node.n_a[i]))
+
+    def calculate_ucb_min(node, i):
+        return node.q_a[i] - player.c * math.sqrt(
+                                np.divide(math.log(node.n_visits), node.n_a[i]))
+
+    ucb_values = []
+    for i in range(len(node.actions)):
+        if node.state.player_turn == 1:
+            if node.n_a[i] == 0:
+                ucb_max = float('inf')
+            else:
+                ucb_max =  calculate_ucb_max(node, i)
+            ucb_values.append((ucb_max, i))
+        else:
+            if node.n_a[i] == 0:
+                ucb_min = float('-inf')
+            else:
+                ucb_min =  calculate_ucb_min(node, i)
+            ucb_values.append((ucb_min, i))
+    ucb_values.sort(key=lambda t: t[0])
+    if node.state.player_turn == 1:
+        best_ucb, best_i = ucb_values[-1]
+    else:
+        best_ucb, best_i = ucb_values[0]
+    return best_i, player.get_child(node, best_i)
+
+def benchmark_select(n_runs):
+    """
+    Compare UCTPlayer.select_child against the sorting implementation it
+    replaced (legacy_select_child) on the expanded nodes of a Vanilla_UCT
+    search tree of 1000 simulations from a mid-game position of the 2-12
+    board, and check that both select the same children.
+    """
+
+    random.seed(0)
+    game = random_position(Game(*ORIGINAL_CONFIG), 30)
+    while game.is_player_busted(game.available_moves()):
+        pass
+    player = Vanilla_UCT(c = 1, n_simulations = 1000)
+    player.run_UCT(game, [])
+    nodes = []
+    nodes_to_visit = [player.root.parent]
+    while nodes_to_visit:
+        node = nodes_to_visit.pop()
+        if node.n_visits > 0 and node.is_expanded():
+            nodes.append(node)
+        nodes_to_visit.extend(child for child in node.children
+                                if child is not None)
+    for node in nodes:
+        if player.select_child(node) != legacy_select_child(player, node):
+            print('select_child differs from the sorting implementation')
+            return
+    n_actions = sum(len(node.actions) for node in nodes) / len(nodes)
+    print('Child selection on', len(nodes), 'nodes ({:.1f} actions on '
+            'average, 2-12 board)'.format(n_actions))
+    for name, select in [('sort', lambda node: legacy_select_child(player,
+                                                                    node)),
+                        ('select_child', player.select_child)]:
+        print('  {:12s} {:6.2f} us'.format(name, time_per_call(
+                lambda: [select(node) for node in nodes],
+                max(1, n_runs // len(nodes))) / len(nodes)))
+
+def benchmark_root_parallel(n_runs):
+    """
+    Compare the time of a move of Vanilla_UCT searching alone and with
+    root parallel worker processes (see UCTPlayer.start_root_parallel) on
+    a mid-game position of the 2-12 board. n_runs is the number of
+    simulations of the move. The pool is started and warmed up before the
+    timed move, as it is kept for the whole game.
+    """
+
+    random.seed(0)
+    game = random_position(Game(*ORIGINAL_CONFIG), 30)
+    while game.is_player_busted(game.available_moves()):
+        pass
+    print('Move of', n_runs, 'simulations (2-12 board)')
+    for n_workers in [0, 1, 2, 4]:
+        player = Vanilla_UCT(c = 1, n_simulations = n_runs)
+        player.seed(0)
+        if n_workers > 0:
+            player.start_root_parallel(n_workers)
+            player.get_action(game, [])
+        player.reset_tree()
+        seconds = timeit.timeit(lambda: player.get_action(game, []),
+                                number=1)
+        player.stop_root_parallel()
+        name = '{} worker(s)'.format(n_workers) if n_workers else 'serial'
+        print('  {:12s} {:8.3f} s {:8.0f} simulations/s'.format(
+                name, seconds, n_runs / seconds))
+
+def benchmark_leaf_parallel(n_runs):
+    """
+    Compare the simulations per second of a Network_UCT move for several
+    batch sizes (leaf parallelization, see
+    AlphaZeroPlayer.run_batched_simulations) on a mid-game position of the
+    2-12 board, with an untrained network of models.define_model. n_runs
+    is the number of simulations of the move. Requires Keras.
+    """
+
+    from keras import backend as K
+    K.set_image_data_format('channels_first')
+    from models import define_model
+    from players.net_uct_player import Network_UCT
+
+    random.seed(0)
+    game = random_position(Game(*ORIGINAL_CONFIG), 30)
+    while game.is_player_busted(game.available_moves()):
+        pass
+    network = define_model(reg = 0.01, conv_number = 1,
+                            column_range = [2, 12], offset = 2,
+                            initial_height = 2, dice_value = 6)
+    print('Network_UCT move of', n_runs, 'simulations (2-12 board)')
+    for batch_size in [1, 4, 8, 16, 32]:
+        player = Network_UCT(c = 1, n_simulations = n_runs,
+                                column_range = [2, 12], offset = 2,
+                                initial_height = 2, dice_value = 6,
+                                network = network, batch_size = batch_size)
+        player.seed(0)
+        seconds = timeit.timeit(lambda: player.get_action(game, []),
+                                number=1)
+        print('  batch_size {:3d} {:8.3f} s {:8.0f} simulations/s'.format(
+                batch_size, seconds, n_runs / seconds))
+
+def main():
+    benchmarks = {'clone': benchmark_clone,
+                    'make': benchmark_make_move,
+                    'moves': benchmark_available_moves,
+                    'rollout': benchmark_rollout,
+                    'batch': benchmark_batch,
+                    'bust': benchmark_bust_probability,
+                    'dice': benchmark_dice,
+                    'serialize': benchmark_serialization,
+                    'tree': benchmark_tree_memory,
+                    'select': benchmark_select,
+                    'parallel': benchmark_root_parallel,
+                    'leaf': benchmark_leaf_parallel}
+    if len(sys.argv[1:]) < 1 or sys.argv[1] not in benchmarks:
+        print('Usage: benchmarks.py', '|'.join(benchmarks), '[n_runs]')
+        return
+    # Rollouts are much slower than the other benchmarked calls.
+    n_runs = 10000
+    if sys.argv[1] == 'rollout':
+        n_runs = 100
+    elif sys.argv[1] in ('batch', 'tree'):
+        n_runs = 1000
+    elif sys.argv[1] == 'parallel':
+        n_runs = 2000
+    elif sys.argv[1] == 'leaf':
+        n_runs = 500
+    if len(sys.argv) > 2:
+        n_runs = int(sys.argv[2])
+    benchmarks[sys.argv[1]](n_runs)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import collections
+import itertools
+import numpy as np
+from game import combination_table
+
+# Cache of the tables built by bust_table(), one per dice_value.
+_bust_tables = {}
+
+# Cache of the tables built by progress_table(), one per dice_value.
+_progress_tables = {}
+
+def bust_table(dice_value):
+    """
+    Return a list where entry [playable_mask] is the exact probability that
+    a roll of 4 dice of 'dice_value' faces busts the player, playable_mask
+    being the bitmask (bit i = column i) of the columns that can still be
+    advanced (see playable_mask). A roll busts when none of the sums of
+    its pairings is in playable_mask, so every state of the game maps to
+    one entry. The table is built once per dice_value and shared.
+    """
+
+    if dice_value in _bust_tables:
+        return _bust_tables[dice_value]
+
+    # Number of ordered rolls of each mask of pairing sums.
+    rolls_of_sums = collections.Counter()
+    for pairings in combination_table(dice_value).values():
+        sums_mask = 0
+        for first_bit, second_bit, _ in pairings:
+            sums_mask |= first_bit | second_bit
+        rolls_of_sums[sums_mask] += 1
+    sums_masks = np.array(list(rolls_of_sums.keys()))
+    counts = np.array(list(rolls_of_sums.values()))
+
+    playable = np.arange(1 << (2 * dice_value + 1))
+    busted = (playable[:, None] & sums_masks[None, :]) == 0
+    _bust_tables[dice_value] = (busted @ counts / counts.sum()).tolist()
+    return _bust_tables[dice_value]
+
+def playable_mask(game):
+    """
+    Return the bitmask of the columns 'game' (a Game or CompactGame) can
+    advance with the next roll: the open columns (neither finished nor won
+    in the current round) if there are less than 3 neutral markers, the
+    open columns holding a neutral marker otherwise.
+    """
+
+    open_mask = ~(game.finished_columns_mask | game.player_won_column_mask) \
+                & ((1 << (2 * game.dice_value + 1)) - 1)
+    if game.n_neutral_markers < 3:
+        return open_mask
+    return open_mask & game.neutral_columns_mask
+
+def bust_probability(game):
+    """
+    Return the exact probability that the next roll of 'game' (a Game or
+    CompactGame) busts the current player, i.e. the risk of choosing 'y'.
+    The current_roll of 'game' is ignored.
+    """
+
+    return bust_table(game.dice_value)[playable_mask(game)]
+
+def progress_key(dice_value, closed_mask, neutral_mask, n_neutral_markers):
+    """
+    Return the key of progress_table(dice_value) of the states whose closed
+    (finished or won) columns are closed_mask, whose open columns holding a
+    neutral marker are neutral_mask and which have n_neutral_markers (at
+    most 3) neutral markers.
+    """
+
+    return ((closed_mask << (2 * dice_value + 1) | neutral_mask) << 2
+            | n_neutral_markers)
+
+def progress_table(dice_value):
+    """
+    Return a 2-tuple (keys, distributions) holding the progress
+    distribution (see progress_distribution) of every state of the game
+    with 4 dice of 'dice_value' faces: keys is the sorted array of the
+    progress_key of the states and distributions[i] the distribution of
+    keys[i]. Every roll is played against every state at once with numpy,
+    with the rules of Game.available_moves. The table is built once per
+    dice_value and shared.
+    """
+
+    if dice_value in _progress_tables:
+        return _progress_tables[dice_value]
+
+    # Every closed mask, with every set of at most 3 open columns holding
+    # a neutral marker and every number of markers left for them.
+    neutral_sets = [combination for n_neutral in range(4) for combination
+                    in itertools.combinations(range(2, 2 * dice_value + 1),
+                                                n_neutral)]
+    neutral_mask = np.array([sum(1 << column for column in combination)
+                                for combination in neutral_sets])
+    n_neutral = np.array([len(combination) for combination in neutral_sets])
+    closed_mask, neutral_mask, n_neutral, n_neutral_markers = (
+        grid.ravel() for grid in np.broadcast_arrays(
+            np.arange(0, 1 << (2 * dice_value + 1), 4)[:, None, None],
+            neutral_mask[None, :, None], n_neutral[None, :, None],
+            np.arange(4)[None, None, :]))
+    valid = ((closed_mask & neutral_mask) == 0) \
+            & (n_neutral <= n_neutral_markers)
+    closed_mask = closed_mask[valid]
+    neutral_mask = neutral_mask[valid]
+    n_neutral_markers = n_neutral_markers[valid]
+    open_mask = ~closed_mask
+    available_mask = np.where(n_neutral_markers < 3, open_mask,
+                                open_mask & neutral_mask)
+
+    # Cells advanced by the best move of each pairing of sums in every
+    # state (same conditions as rollout_kernel.available_moves).
+    advances = {}
+    def pairing_advance(first_bit, second_bit):
+        if (first_bit, second_bit) not in advances:
+            pair_mask = first_bit | second_bit
+            together = (open_mask & pair_mask) == pair_mask
+            together &= (n_neutral_markers < 2) \
+                | ((n_neutral_markers == 2)
+                    & (((neutral_mask & pair_mask) != 0)
+                        | (first_bit == second_bit))) \
+                | ((n_neutral_markers == 3)
+                    & ((neutral_mask & pair_mask) == pair_mask))
+            alone = (available_mask & pair_mask) != 0
+            advances[first_bit, second_bit] = np.where(
+                together, np.int8(2), alone.astype(np.int8))
+        return advances[first_bit, second_bit]
+
+    # Number of ordered rolls of each multiset, by its pairings.
+    rolls_of_pairings = {}
+    for pairings in combination_table(dice_value).values():
+        rolls_of_pairings.setdefault(id(pairings), [pairings, 0])[1] += 1
+    counts = np.zeros((3, len(closed_mask)), dtype=np.int32)
+    best = np.empty(len(closed_mask), dtype=np.int8)
+    for pairings, n_rolls in rolls_of_pairings.values():
+        best[:] = 0
+        for first_bit, second_bit, _ in pairings:
+            np.maximum(best, pairing_advance(first_bit, second_bit), out=best)
+        for advance in range(3):
+            np.add(counts[advance], n_rolls, out=counts[advance],
+                    where=best == advance)
+
+    keys = progress_key(dice_value, closed_mask, neutral_mask,
+                        n_neutral_markers)
+    order = np.argsort(keys)
+    _progress_tables[dice_value] = (keys[order],
+                                    counts.T[order] / dice_value ** 4)
+    return _progress_tables[dice_value]
+
+def progress_distribution(game):
+    """
+    Return a 3-tuple with the exact probabilities that the best move of the
+    next roll of 'game' (a Game or CompactGame) advances 0 (bust), 1 or 2
+    cells, looked up in progress_table. The current_roll of 'game' is
+    ignored.
+    """
+
+    closed_mask = game.finished_columns_mask | game.player_won_column_mask
+    keys, distributions = progress_table(game.dice_value)
+    key = progress_key(game.dice_value, closed_mask,
+                        game.neutral_columns_mask & ~closed_mask,
+                        min(game.n_neutral_markers, 3))
+    return tuple(distributions[np.searchsorted(keys, key)].tolist())
+
+def expected_progress(game):
+    """
+    Return the expected number of cells advanced by the best move of the
+    next roll of 'game' (0 when the roll busts the player).
+    """
+
+    distribution = progress_distribution(game)
+    return distribution[1] + 2 * distribution[2]
+
+def stop_decision(game, max_bust_probability):
+    """
+    Return 'n' if the probability of busting with the next roll of 'game'
+    is greater than max_bust_probability, 'y' otherwise. A table lookup
+    usable as the 'y'/'n' policy of scripts and rollouts (see
+    max_bust_probability of Vanilla_UCT and random_rollout).
+    """
+
+    if bust_probability(game) > max_bust_probability:
+        return 'n'
+    return 'y'
+
+# The original board uses 6-faced dice.
+bust_table(6)
+progress_table(6)
@@ -0,0 +1,100 @@
+import math
+import random
+import sys
+from game import Game
+from bust_tables import bust_probability, progress_distribution
+from players.uct_player import Node
+from players.vanilla_uct_player import Vanilla_UCT
+from check_game_equivalence import BOARDS, report, finish
+
+def check_bust_tables(config, seed, n_positions):
+    """
+    Compare bust_probability and progress_distribution against a brute
+    force enumeration of every roll with Game.available_moves, on
+    n_positions random positions. Return the number of positions checked
+    and the differences found (empty list if none).
+    """
+
+    random.seed(seed)
+    game = Game(*config)
+    faces = range(1, game.dice_value + 1)
+    rolls = [(a, b, c, d) for a in faces for b in faces
+                for c in faces for d in faces]
+    n_checked = 0
+    while n_checked < n_positions:
+        if game.is_finished()[1]:
+            game = Game(*config)
+        moves = game.available_moves()
+        if game.is_player_busted(moves):
+            continue
+        game.play(random.choice(moves))
+        state = game.clone()
+        if not state.dice_action:
+            state.play('y')
+        advances = [0, 0, 0]
+        for roll in rolls:
+            state.current_roll = roll
+            advances[max([len(move) for move in state.available_moves()],
+                            default=0)] += 1
+        distribution = [advance / len(rolls) for advance in advances]
+        n_checked += 1
+        if abs(bust_probability(game) - distribution[0]) > 1e-12:
+            return n_checked, ['bust_probability']
+        if any(abs(a - b) > 1e-12 for a, b in
+                zip(progress_distribution(game), distribution)):
+            return n_checked, ['progress_distribution']
+    return n_checked, []
+
+def check_stop_policy(config, seed, n_rollouts):
+    """
+    Check that the rollouts of Vanilla_UCT stopping with
+    bust_tables.stop_decision (max_bust_probability) follow the same policy
+    with a cloned Game and with random_rollout (fast_rollout): their mean
+    values over n_rollouts from a position after 20 random plays must
+    agree within 4 standard errors. Return the number of rollouts compared
+    and the differences found (empty list if none).
+    """
+
+    random.seed(seed)
+    game = Game(*config)
+    for _ in range(20):
+        moves = game.available_moves()
+        if not game.is_player_busted(moves):
+            game.play(random.choice(moves))
+    node = Node(game)
+    values = []
+    for fast_rollout in [False, True]:
+        player = Vanilla_UCT(1, 1, fast_rollout=fast_rollout,
+                                max_bust_probability=0.3)
+        player.seed(seed)
+        values.append(sum(player.rollout(node)
+                            for _ in range(n_rollouts)) / n_rollouts)
+    # Rollout values are 1 or -1, so their standard deviation is at most 1.
+    if abs(values[0] - values[1]) > 4 * math.sqrt(2 / n_rollouts):
+        return 2 * n_rollouts, ['game %.3f, kernel %.3f' % tuple(values)]
+    return 2 * n_rollouts, []
+
+def main():
+    """
+    Check bust_probability and progress_distribution (bust_tables.py)
+    against a brute force enumeration of the rolls, and the rollouts
+    stopping with stop_decision.
+    Usage: check_bust_tables.py [seed]
+    """
+
+    seed = 0
+    if len(sys.argv) > 1:
+        seed = int(sys.argv[1])
+
+    n_mismatches = 0
+    for name, config, _ in BOARDS:
+        n_checked, differences = check_bust_tables(config, seed, 100)
+        n_mismatches += report(name, 'bust tables', n_checked, 'positions',
+                                differences)
+        n_checked, differences = check_stop_policy(config, seed, 2000)
+        n_mismatches += report(name, 'rollout stop policy', n_checked,
+                                'rollouts', differences)
+    finish(n_mismatches)
+
+if __name__ == "__main__":
+    main()
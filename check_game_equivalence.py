@@ -0,0 +1,416 @@
+import random
+import sys
+from game import Game
+from compact_game import CompactGame
+from batch_game import BatchGame
+import numpy as np
+
+# (n_players, dice_number, dice_value, column_range, offset, initial_height)
+TOY_CONFIG = (2, 4, 3, [2,6], 2, 1)
+ORIGINAL_CONFIG = (2, 4, 6, [2,12], 2, 2)
+# (name, config, maximum length of a random game)
+BOARDS = [('Toy', TOY_CONFIG, 1000), ('Original', ORIGINAL_CONFIG, 5000)]
+
+def column_has_neutral_marker(game, column):
+    """Return True if a cell of 'column' in game.board_game holds a 0."""
+
+    for cell in game.board_game.board[column]:
+        if 0 in cell.markers:
+            return True
+    return False
+
+def column_is_closed(game, column):
+    """Return True if 'column' is in finished_columns or player_won_column."""
+
+    for item in game.finished_columns + game.player_won_column:
+        if item[0] == column:
+            return True
+    return False
+
+def reference_value_availability(game, value):
+    """
+    Original implementation of Game.check_value_availability (before the
+    bitmasks), scanning the board and the column lists.
+    """
+
+    if column_is_closed(game, value):
+        return False
+    if game.n_neutral_markers < 3:
+        return True
+    return column_has_neutral_marker(game, value)
+
+def reference_tuple_availability(game, tuple):
+    """
+    Original implementation of Game.check_tuple_availability (before the
+    bitmasks), scanning the board and the column lists.
+    """
+
+    if column_is_closed(game, tuple[0]) or column_is_closed(game, tuple[1]):
+        return False
+    is_first_value_valid = column_has_neutral_marker(game, tuple[0])
+    is_second_value_valid = column_has_neutral_marker(game, tuple[1])
+    if game.n_neutral_markers < 2:
+        return True
+    elif game.n_neutral_markers == 2:
+        return is_first_value_valid or is_second_value_valid \
+                or tuple[0] == tuple[1]
+    return is_first_value_valid and is_second_value_valid
+
+def reference_is_busted(game, all_moves):
+    """
+    Original test of Game.is_player_busted (before the bitmasks), without
+    applying the bust.
+    """
+
+    if all_moves == ['y', 'n']:
+        return False
+    if len(all_moves) == 0:
+        return True
+    if game.n_neutral_markers < 3:
+        return False
+    for move in all_moves:
+        for column in move:
+            if column_has_neutral_marker(game, column):
+                return False
+    return True
+
+def reference_is_finished(game):
+    """
+    Original implementation of Game.is_finished (before the won column
+    counters), counting finished_columns.
+    """
+
+    won_columns = [0] * (game.n_players + 1)
+    for item in game.finished_columns:
+        won_columns[item[1]] += 1
+    for player in range(1, game.n_players + 1):
+        if won_columns[player] >= 3:
+            return player, True
+    return 0, False
+
+def reference_available_moves(game):
+    """
+    Original implementation of Game.available_moves (before the
+    combination table), built on the original check_value_availability and
+    check_tuple_availability. Used as the reference for both engines.
+    """
+
+    if not game.dice_action:
+        return ['y','n']
+    roll = game.current_roll
+    standard_combination = [(roll[0] + roll[1], roll[2] + roll[3]),
+                            (roll[0] + roll[2], roll[1] + roll[3]),
+                            (roll[0] + roll[3], roll[1] + roll[2])]
+    combination = []
+    for comb in standard_combination:
+        first_value_available = reference_value_availability(game, comb[0])
+        second_value_available = reference_value_availability(game, comb[1])
+        if reference_tuple_availability(game, comb):
+            combination.append(comb)
+        elif first_value_available and second_value_available:
+            combination.append((comb[0],))
+            combination.append((comb[1],))
+        if first_value_available and not second_value_available:
+            combination.append((comb[0],))
+        if second_value_available and not first_value_available:
+            combination.append((comb[1],))
+    return [t for t in {x[::-1] if x[0] > x[-1] else x for x in combination}]
+
+def compare_engines(game, compact):
+    """
+    Return a list of strings describing every difference between the
+    positions of 'game' and 'compact', two games of either engine (Game or
+    CompactGame), and between the moves both engines generate for them. An
+    empty list means both represent the same position.
+    """
+
+    differences = []
+    if not game.check_boardgame_equality(compact):
+        differences.append('board')
+    for attribute in ['player_turn', 'dice_action', 'current_roll',
+                        'n_neutral_markers']:
+        if getattr(game, attribute) != getattr(compact, attribute):
+            differences.append(attribute)
+    if sorted(game.neutral_positions) != sorted(compact.neutral_positions):
+        differences.append('neutral_positions')
+    if game.is_finished() != compact.is_finished():
+        differences.append('is_finished')
+    if sorted(game.available_moves()) != sorted(compact.available_moves()):
+        differences.append('available_moves')
+    # is_player_busted applies the bust: ask clones.
+    if not game.is_finished()[1] \
+        and game.clone().is_player_busted(game.available_moves()) \
+        != compact.clone().is_player_busted(compact.available_moves()):
+        differences.append('is_player_busted')
+    for column in range(game.column_range[0], game.column_range[1]+1):
+        if game.number_positions_conquered(column) \
+            != compact.number_positions_conquered(column):
+            differences.append('number_positions_conquered ' + str(column))
+        if game.number_positions_conquered_this_round(column) \
+            != compact.number_positions_conquered_this_round(column):
+            differences.append('number_positions_conquered_this_round '
+                                + str(column))
+    return differences
+
+def compare_zobrist_hashes(game, compact):
+    """
+    Return the differences between the Zobrist hashes of 'game' and
+    'compact' (see compare_engines) and between each incremental hash and
+    the one recomputed from scratch.
+    """
+
+    differences = []
+    if game.zobrist_hash != compact.zobrist_hash:
+        differences.append('zobrist_hash')
+    if game.zobrist_hash != game.compute_zobrist_hash():
+        differences.append('zobrist_hash (first game vs. recomputed)')
+    if compact.zobrist_hash != compact.compute_zobrist_hash():
+        differences.append('zobrist_hash (second game vs. recomputed)')
+    return differences
+
+def compare_won_columns(game, compact):
+    """
+    Return the differences between the won column counters of 'game' and
+    'compact' (see compare_engines) and between is_finished and the
+    original implementation counting finished_columns.
+    """
+
+    differences = []
+    for attribute in ['n_won_columns', 'winner']:
+        if getattr(game, attribute) != getattr(compact, attribute):
+            differences.append(attribute)
+    if game.is_finished() != reference_is_finished(game):
+        differences.append('is_finished (first game vs. reference)')
+    return differences
+
+def compare_states(game, compact):
+    """
+    Return the differences between the whole states of 'game' and
+    'compact', two games of either engine: their positions, Zobrist hashes
+    and won column counters. An empty list means both are the same state.
+    """
+
+    return compare_engines(game, compact) \
+            + compare_zobrist_hashes(game, compact) \
+            + compare_won_columns(game, compact)
+
+def compare_compact_game(game, compact):
+    """
+    Return the differences between 'game' and 'compact', a CompactGame
+    played alongside it, then between 'game' and the CompactGame converted
+    from it.
+    """
+
+    differences = compare_engines(game, compact)
+    if differences:
+        return differences
+    return [difference + ' (CompactGame.from_game)' for difference
+            in compare_engines(game, CompactGame.from_game(game))]
+
+def compare_move_generation(game, compact):
+    """
+    Return the differences between the moves generated for 'game' and
+    'compact' by the roll table and the column bitmasks and the ones of the
+    original implementation scanning the board.
+    """
+
+    differences = []
+    moves = game.available_moves()
+    if sorted(moves) != sorted(reference_available_moves(game)):
+        differences.append('available_moves (Game vs. reference)')
+    if len(moves) != len(set(moves)):
+        differences.append('available_moves (duplicates)')
+    if not game.is_finished()[1] and reference_is_busted(game, moves) \
+        != game.clone().is_player_busted(moves):
+        differences.append('is_player_busted (Game vs. reference)')
+    for column in range(game.column_range[0], game.column_range[1]+1):
+        value_available = reference_value_availability(game, column)
+        if game.check_value_availability(column) != value_available \
+            or compact.check_value_availability(column) != value_available:
+            differences.append('check_value_availability ' + str(column))
+        for other in range(column, game.column_range[1]+1):
+            tuple_available = reference_tuple_availability(game,
+                                                            (column, other))
+            if game.check_tuple_availability((column, other)) \
+                != tuple_available \
+                or compact.check_tuple_availability((column, other)) \
+                != tuple_available:
+                differences.append('check_tuple_availability '
+                                    + str((column, other)))
+    return differences
+
+def check_unmake(game, chosen_play):
+    """
+    Apply 'chosen_play' with make_move, then a bust check and a second play
+    under another undo token, undo both with unmake and return the
+    differences between the result and a clone taken beforehand.
+    """
+
+    before = game.clone()
+    token = game.make_move(chosen_play)
+    moves = game.available_moves()
+    nested_token = game.undo_token()
+    if not game.is_player_busted(moves):
+        game.play(moves[0])
+    game.unmake(nested_token)
+    game.unmake(token)
+    return [difference + ' (after unmake)'
+            for difference in compare_states(before, game)]
+
+def compare_unmake(game, compact):
+    """
+    Return the differences left by check_unmake for every available move of
+    'game' and 'compact'.
+    """
+
+    if game.is_finished()[1]:
+        return []
+    differences = []
+    for move in game.available_moves():
+        differences += check_unmake(game, move) + check_unmake(compact, move)
+    return differences
+
+def play_random_game(config, seed, max_game_length, compare):
+    """
+    Play a random game applying the same moves to a Game and a CompactGame
+    and compare them with compare(game, compact) at every step, a function
+    returning the list of the differences found. It may change the games
+    as long as it restores them. Dice rolls made by Game are copied into
+    CompactGame so both engines see the same game.
+    Return the differences found (empty list if none) and the number of
+    steps played.
+    """
+
+    random.seed(seed)
+    chooser = random.Random(seed)
+    game = Game(*config)
+    compact = CompactGame.from_game(game)
+
+    for step in range(max_game_length):
+        differences = compare(game, compact)
+        if differences:
+            return differences, step
+        if game.is_finished()[1]:
+            break
+        moves = game.available_moves()
+        busted = game.is_player_busted(moves)
+        compact.is_player_busted(compact.available_moves())
+        compact.current_roll = game.current_roll
+        if busted:
+            continue
+        chosen_play = chooser.choice(sorted(moves))
+        game.play(chosen_play)
+        compact.play(chosen_play)
+        compact.current_roll = game.current_roll
+    return [], step
+
+def check_batch_game(config, seed, n_games, max_game_length):
+    """
+    Play n_games random games at once with a BatchGame and, in lock-step,
+    with one Game per batch entry, comparing every game after each step
+    (state, available moves and busts). Dice rolls made by BatchGame are
+    copied into the Games.
+    Return the differences found (empty list if none) and the number of
+    steps played.
+    """
+
+    batch = BatchGame(n_games, *config, rng=np.random.default_rng(seed))
+    games = [Game(*config) for _ in range(n_games)]
+    for g, game in enumerate(games):
+        game.current_roll = tuple(batch.current_roll[g].tolist())
+
+    for step in range(max_game_length):
+        for g, game in enumerate(games):
+            differences = compare_states(game, batch.to_compact_game(g))
+            if differences:
+                return ['game ' + str(g) + ': ' + difference
+                        for difference in differences], step
+        if batch.is_finished()[1].all():
+            break
+        mask = batch.available_moves_mask()
+        busted = batch.is_player_busted(mask)
+        for g, game in enumerate(games):
+            if game.is_finished()[1]:
+                continue
+            moves = game.available_moves()
+            if sorted(moves, key=str) != sorted(
+                    [batch.actions[a] for a in np.flatnonzero(mask[g])],
+                    key=str):
+                return ['game ' + str(g) + ': available_moves_mask'], step
+            if game.is_player_busted(moves) != busted[g]:
+                return ['game ' + str(g) + ': is_player_busted'], step
+        actions = batch.random_actions(mask)
+        actions[busted] = -1
+        batch.play(actions)
+        for g, game in enumerate(games):
+            if actions[g] != -1:
+                game.play(batch.actions[actions[g]])
+            game.current_roll = tuple(batch.current_roll[g].tolist())
+    return [], step
+
+def report(board, feature, n_checked, unit, differences):
+    """
+    Print the result of the check of 'feature' on 'board' (n_checked
+    'unit' checked and the differences found) and return the number of
+    failed checks, 0 or 1.
+    """
+
+    if differences:
+        print(board, 'board -', feature, '- mismatch after', n_checked,
+                unit + ':', ', '.join(differences))
+        return 1
+    print(board, 'board:', feature, 'checked on', n_checked, unit + '.')
+    return 0
+
+def finish(n_mismatches):
+    """Exit with status 1 if n_mismatches checks failed."""
+
+    if n_mismatches > 0:
+        print(n_mismatches, 'check(s) failed.')
+        sys.exit(1)
+
+# Checks made at every step of the random games: (feature, comparison).
+ENGINE_CHECKS = [('CompactGame', compare_compact_game),
+                    ('move generation', compare_move_generation),
+                    ('make/unmake', compare_unmake),
+                    ('Zobrist hash', compare_zobrist_hashes),
+                    ('won column counters', compare_won_columns)]
+
+def main():
+    """
+    Check the engines on random games: CompactGame against Game, the moves
+    generated against the original implementation, make/unmake, the
+    Zobrist hash, the won column counters and BatchGame, each reported on
+    its own line.
+    Usage: check_game_equivalence.py [n_games]
+    """
+
+    n_games = 200
+    if len(sys.argv) > 1:
+        n_games = int(sys.argv[1])
+
+    n_mismatches = 0
+    for name, config, max_game_length in BOARDS:
+        for feature, compare in ENGINE_CHECKS:
+            total_steps = 0
+            for seed in range(n_games):
+                differences, steps = play_random_game(config, seed,
+                                                        max_game_length,
+                                                        compare)
+                total_steps += steps
+                if differences:
+                    n_mismatches += 1
+                    print(name, 'board -', feature, '- seed', seed,
+                            '- step', steps, '- mismatch:',
+                            ', '.join(differences))
+            print(name, 'board:', feature, 'checked on', n_games, 'games,',
+                    total_steps, 'steps.')
+
+        differences, steps = check_batch_game(config, n_games, 20,
+                                                max_game_length)
+        n_mismatches += report(name, 'BatchGame', steps, 'steps of 20 games',
+                                differences)
+    finish(n_mismatches)
+
+if __name__ == "__main__":
+    main()
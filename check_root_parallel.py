@@ -0,0 +1,50 @@
+import sys
+from players.vanilla_uct_player import Vanilla_UCT
+from check_game_equivalence import BOARDS, report, finish
+from check_seeding import play_seeded_game
+
+def check_root_parallel(config, seed):
+    """
+    Check that root parallel Vanilla_UCT players (see
+    UCTPlayer.start_root_parallel, with Node objects and with a TreeStore)
+    play reproducible seeded games, and that the merged root
+    holds the visits of all the simulations of the workers. Return the
+    number of plays compared and the differences found (empty list if
+    none).
+    """
+
+    players = {1: Vanilla_UCT(1, 30), 2: Vanilla_UCT(1, 30,
+                                                    tree_store_size=10000)}
+    for player in players.values():
+        player.start_root_parallel(2)
+    try:
+        history = play_seeded_game(config, seed, players, 0, 200)
+        if sum(players[1].root.n_a) != 30 or players[1].root.n_visits != 30:
+            return len(history), ['merged visits']
+        if play_seeded_game(config, seed, players, 0, 200) != history:
+            return len(history), ['replay']
+    finally:
+        for player in players.values():
+            player.stop_root_parallel()
+    return len(history), []
+
+def main():
+    """
+    Check that root parallel UCT searches (root_parallel.py) are
+    reproducible.
+    Usage: check_root_parallel.py [seed]
+    """
+
+    seed = 0
+    if len(sys.argv) > 1:
+        seed = int(sys.argv[1])
+
+    n_mismatches = 0
+    for name, config, _ in BOARDS:
+        n_checked, differences = check_root_parallel(config, seed)
+        n_mismatches += report(name, 'root parallel', n_checked, 'plays',
+                                differences)
+    finish(n_mismatches)
+
+if __name__ == "__main__":
+    main()
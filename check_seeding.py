@@ -0,0 +1,125 @@
+import sys
+from game import Game
+from compact_game import CompactGame
+from players.vanilla_uct_player import Vanilla_UCT
+from players.random_player import RandomPlayer
+from random_streams import spawn_seeds
+from check_game_equivalence import BOARDS, report, finish
+import numpy as np
+
+def play_seeded_game(config, seed, players, n_clones, max_game_length,
+                        probe=False):
+    """
+    Play a game seeded with 'seed' (see random_streams.py) between
+    players[1] and players[2], which are seeded too. The Vanilla_UCT
+    players start from a new tree and get the plays made since their last
+    turn, as Experiment gives them, so they reuse their trees. After every
+    play, n_clones clones of the game roll the dice. If probe is True,
+    every available move is first tried and undone with make_move and
+    unmake, as the scripts do (see DSL.actionWinsColumn). Return the list
+    of (roll, action) of the game, followed by the distribution of the
+    visits of the search for the plays of a Vanilla_UCT.
+    """
+
+    dice_seed, player1_seed, player2_seed = spawn_seeds(seed, 3)
+    game = Game(*config, np.random.default_rng(dice_seed))
+    players[1].seed(player1_seed)
+    players[2].seed(player2_seed)
+    for player in players.values():
+        if isinstance(player, Vanilla_UCT):
+            player.reset_tree()
+    history = []
+    actions_taken = []
+    actions_from_player = 1
+    for _ in range(max_game_length):
+        if game.is_finished()[1]:
+            break
+        moves = game.available_moves()
+        if game.is_player_busted(moves):
+            actions_taken = []
+            actions_from_player = game.player_turn
+            continue
+        if probe:
+            for move in moves:
+                game.unmake(game.make_move(move))
+        roll = game.current_roll
+        player = game.player_turn
+        if isinstance(players[player], Vanilla_UCT):
+            if actions_from_player == player:
+                action = players[player].get_action(game, [])
+            else:
+                action = players[player].get_action(game, actions_taken)
+            history.append((roll, action, sorted(
+                    players[player].get_dist_probability().items(), key=str)))
+        else:
+            action = players[player].get_action(game)
+            history.append((roll, action))
+        if actions_from_player != player:
+            actions_taken = []
+            actions_from_player = player
+        game.play(action)
+        actions_taken.append((action, player, game.clone()))
+        for _ in range(n_clones):
+            game.clone().roll_dice()
+    return history
+
+def check_seeded_games(config, seed):
+    """
+    Check that seeded games are reproducible: the same seed gives the same
+    game between two Vanilla_UCT (one with fast rollouts), the rolls of a
+    game do not depend on the clones rolling the dice nor on moves probed
+    with make_move and unmake, and Game and CompactGame seeded alike roll
+    the same dice, with or without probes. Return the number of plays
+    compared and the differences found (empty list if none).
+    """
+
+    def uct_players():
+        return {1: Vanilla_UCT(1, 10, fast_rollout=True),
+                2: Vanilla_UCT(1, 10)}
+
+    history = play_seeded_game(config, seed, uct_players(), 0, 200)
+    if play_seeded_game(config, seed, uct_players(), 0, 200) != history:
+        return len(history), ['replay']
+    history = play_seeded_game(config, seed, {1: RandomPlayer(),
+                                2: RandomPlayer()}, 0, 1000)
+    if play_seeded_game(config, seed, {1: RandomPlayer(),
+                        2: RandomPlayer()}, 3, 1000) != history:
+        return len(history), ['replay with clones']
+    if play_seeded_game(config, seed, {1: RandomPlayer(),
+                        2: RandomPlayer()}, 0, 1000, probe=True) != history:
+        return len(history), ['replay with probes']
+    game = Game(*config, np.random.default_rng(seed))
+    compact = CompactGame(*config, np.random.default_rng(seed))
+    if [game.roll_dice() for _ in range(5000)] \
+        != [compact.roll_dice() for _ in range(5000)]:
+        return len(history), ['CompactGame rolls']
+    # Probes drawing across the blocks of rolls of the DiceStream.
+    game = Game(*config, np.random.default_rng(seed))
+    compact = CompactGame(*config, np.random.default_rng(seed))
+    rolls = []
+    for _ in range(5000):
+        compact.unmake(compact.make_move('n'))
+        rolls.append(compact.roll_dice())
+    if rolls != [game.roll_dice() for _ in range(5000)]:
+        return len(history), ['CompactGame rolls with probes']
+    return len(history), []
+
+def main():
+    """
+    Check that seeded games (random_streams.py) are reproducible.
+    Usage: check_seeding.py [seed]
+    """
+
+    seed = 0
+    if len(sys.argv) > 1:
+        seed = int(sys.argv[1])
+
+    n_mismatches = 0
+    for name, config, _ in BOARDS:
+        n_checked, differences = check_seeded_games(config, seed)
+        n_mismatches += report(name, 'seeded games', n_checked, 'plays',
+                                differences)
+    finish(n_mismatches)
+
+if __name__ == "__main__":
+    main()
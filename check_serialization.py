@@ -0,0 +1,77 @@
+import random
+import sys
+from game import Game
+from compact_game import CompactGame
+from batch_game import BatchGame
+from check_game_equivalence import BOARDS, compare_states, report, finish
+
+def check_serialization(config, seed, n_steps):
+    """
+    Play random moves for n_steps steps and check that every state encoded
+    by Game.to_bytes is decoded by Game.from_bytes and CompactGame.from_bytes
+    into the same state, also when Game.from_bytes shares the columns of
+    the previous state (base), which must not be modified by plays on the
+    decoded state. Also check that CompactGame encodes every state into
+    the same bytes and that BatchGame decodes and re-encodes all of them
+    at once. Return the number of states checked and the differences
+    found (empty list if none).
+    """
+
+    random.seed(seed)
+    game = Game(*config)
+    previous = game.clone()
+    encoded = []
+    for step in range(n_steps):
+        if game.is_finished()[1]:
+            game = Game(*config)
+        data = game.to_bytes()
+        encoded.append(data)
+        if CompactGame.from_game(game).to_bytes() != data:
+            return step, ['CompactGame.to_bytes']
+        for engine in [Game, CompactGame]:
+            differences = compare_states(game, engine.from_bytes(data,
+                                                                    *config))
+            if differences:
+                return step, [engine.__name__ + '.from_bytes ' + difference
+                                for difference in differences]
+        previous_data = previous.to_bytes()
+        rebuilt = Game.from_bytes(data, *config, base=previous)
+        differences = compare_states(game, rebuilt)
+        if differences:
+            return step, ['Game.from_bytes with base ' + difference
+                            for difference in differences]
+        moves = rebuilt.available_moves()
+        if not rebuilt.is_finished()[1] and not rebuilt.is_player_busted(moves):
+            rebuilt.play(moves[0])
+        if previous.to_bytes() != previous_data:
+            return step, ['base modified']
+        previous = game.clone()
+        moves = game.available_moves()
+        if game.is_player_busted(moves):
+            continue
+        game.play(random.choice(moves))
+    if BatchGame.from_bytes(b''.join(encoded), *config).to_bytes() \
+        != b''.join(encoded):
+        return n_steps, ['BatchGame.from_bytes']
+    return n_steps, []
+
+def main():
+    """
+    Check that the fixed-size encoding of the states (Game.to_bytes)
+    round-trips through Game, CompactGame and BatchGame.
+    Usage: check_serialization.py [seed]
+    """
+
+    seed = 0
+    if len(sys.argv) > 1:
+        seed = int(sys.argv[1])
+
+    n_mismatches = 0
+    for name, config, _ in BOARDS:
+        n_checked, differences = check_serialization(config, seed, 1000)
+        n_mismatches += report(name, 'serialization', n_checked, 'states',
+                                differences)
+    finish(n_mismatches)
+
+if __name__ == "__main__":
+    main()
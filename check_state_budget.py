@@ -0,0 +1,45 @@
+import sys
+from players.vanilla_uct_player import Vanilla_UCT
+from check_game_equivalence import BOARDS, report, finish
+from check_seeding import play_seeded_game
+
+def check_state_budget(config, seed):
+    """
+    Check that dropping the states of the fully expanded nodes of the tree
+    (max_interior_states of UCTPlayer, with and without a transposition
+    table) does not change the game played by seeded Vanilla_UCT players.
+    Return the number of plays compared and the differences found (empty
+    list if none).
+    """
+
+    def uct_players(max_interior_states):
+        return {1: Vanilla_UCT(1, 30,
+                                max_interior_states=max_interior_states),
+                2: Vanilla_UCT(1, 30, transposition_table_size=1000,
+                                max_interior_states=max_interior_states)}
+
+    history = play_seeded_game(config, seed, uct_players(0), 0, 200)
+    if play_seeded_game(config, seed, uct_players(1), 0, 200) != history:
+        return len(history), ['max_interior_states']
+    return len(history), []
+
+def main():
+    """
+    Check that dropping the states of the fully expanded UCT nodes
+    (StateBudget) does not change the searches.
+    Usage: check_state_budget.py [seed]
+    """
+
+    seed = 0
+    if len(sys.argv) > 1:
+        seed = int(sys.argv[1])
+
+    n_mismatches = 0
+    for name, config, _ in BOARDS:
+        n_checked, differences = check_state_budget(config, seed)
+        n_mismatches += report(name, 'state budget', n_checked, 'plays',
+                                differences)
+    finish(n_mismatches)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import random
+import sys
+from game import Game
+from tablebase import Tablebase
+from check_game_equivalence import BOARDS, report, finish
+
+def check_tablebase_model(config, seed, n_steps):
+    """
+    Play random moves for n_steps steps and check that the turn states
+    computed by Tablebase.advance (used by the solver) are the ones of the
+    games. Return the number of moves checked and the differences found
+    (empty list if none).
+    """
+
+    random.seed(seed)
+    tablebase = Tablebase(config)
+    game = Game(*config)
+    n_checked = 0
+    for _ in range(n_steps):
+        if game.is_finished()[1]:
+            game = Game(*config)
+        moves = game.available_moves()
+        if game.is_player_busted(moves):
+            continue
+        if game.dice_action:
+            positions, n_neutral_markers = tablebase.turn_state(game)
+            own_progress = tablebase.game_board(game)[1][game.player_turn]
+            for move in moves:
+                token = game.make_move(move)
+                n_checked += 1
+                if tablebase.advance(own_progress, positions,
+                                        n_neutral_markers, move) \
+                    != tablebase.turn_state(game):
+                    return n_checked, ['advance ' + str(move)]
+                game.unmake(token)
+        game.play(random.choice(moves))
+    return n_checked, []
+
+def main():
+    """
+    Check the turn model of the tablebase solver (Tablebase.advance)
+    against the games.
+    Usage: check_tablebase.py [seed]
+    """
+
+    seed = 0
+    if len(sys.argv) > 1:
+        seed = int(sys.argv[1])
+
+    n_mismatches = 0
+    for name, config, _ in BOARDS:
+        n_checked, differences = check_tablebase_model(config, seed, 2000)
+        n_mismatches += report(name, 'tablebase turn model', n_checked,
+                                'moves', differences)
+    finish(n_mismatches)
+
+if __name__ == "__main__":
+    main()
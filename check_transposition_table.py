@@ -0,0 +1,84 @@
+import gc
+import random
+import sys
+import tracemalloc
+from game import Game
+from players.vanilla_uct_player import Vanilla_UCT
+from check_game_equivalence import BOARDS, report, finish
+from check_seeding import play_seeded_game
+
+TABLE_SIZE = 100
+N_SIMULATIONS = [2 * TABLE_SIZE, 4 * TABLE_SIZE, 8 * TABLE_SIZE]
+
+def held_memory(config, seed, n_simulations):
+    """
+    Return the memory in bytes held by a Vanilla_UCT player with a
+    transposition table of TABLE_SIZE nodes after n_simulations from the
+    start of a game, and the number of nodes left in its table.
+    """
+
+    random.seed(seed)
+    game = Game(*config)
+    player = Vanilla_UCT(1, n_simulations, transposition_table_size=TABLE_SIZE)
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    player.search_root(game)
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return memory, len(player.transposition_table)
+
+def check_transposition_table(config, seed):
+    """
+    Check that the memory held by a UCT search stops growing once its
+    transposition table is full (the nodes evicted from it are released,
+    see UCTPlayer.evict_transpositions), and that seeded Vanilla_UCT
+    players with a table much smaller than their trees play a whole game.
+    Return the number of searches measured and the differences found
+    (empty list if none).
+    """
+
+    differences = []
+    memories = []
+    for n_simulations in N_SIMULATIONS:
+        memory, n_nodes = held_memory(config, seed, n_simulations)
+        memories.append(memory)
+        if n_nodes > TABLE_SIZE:
+            differences.append('%d nodes in the table after %d simulations'
+                                % (n_nodes, n_simulations))
+    # Released nodes stay in the children of the nodes kept as empty
+    # shells, so some growth is allowed.
+    if memories[-1] > 1.25 * memories[0]:
+        differences.append('held memory ' + ' -> '.join(
+            '%d bytes' % memory for memory in memories))
+
+    players = {1: Vanilla_UCT(1, 30, transposition_table_size=20),
+                2: Vanilla_UCT(1, 30, transposition_table_size=20)}
+    play_seeded_game(config, seed, players, 0, 200)
+    for player in players.values():
+        if len(player.transposition_table) > 20:
+            differences.append('%d nodes in the table after a game'
+                                % len(player.transposition_table))
+    return len(N_SIMULATIONS), differences
+
+def main():
+    """
+    Check that the transposition table of the UCT players bounds the
+    memory of their searches.
+    Usage: check_transposition_table.py [seed]
+    """
+
+    seed = 0
+    if len(sys.argv) > 1:
+        seed = int(sys.argv[1])
+
+    n_mismatches = 0
+    for name, config, _ in BOARDS:
+        n_checked, differences = check_transposition_table(config, seed)
+        n_mismatches += report(name, 'transposition table', n_checked,
+                                'searches', differences)
+    finish(n_mismatches)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import sys
+from players.vanilla_uct_player import Vanilla_UCT
+from check_game_equivalence import TOY_CONFIG, BOARDS, report, finish
+from check_seeding import play_seeded_game
+
+class ReuseRecordingUCT(Vanilla_UCT):
+    def __init__(self, *args, **kwargs):
+        """
+        Vanilla_UCT recording the results of its reuse tests (see
+        UCTPlayer.is_same_position) in reuse_tests, in order.
+        """
+
+        super().__init__(*args, **kwargs)
+        self.reuse_tests = []
+
+    def is_same_position(self, state, game):
+        same = super().is_same_position(state, game)
+        self.reuse_tests.append(same)
+        return same
+
+def compare_backends(config, seed, n_simulations):
+    """
+    Play the game seeded with 'seed' between two ReuseRecordingUCT with
+    n_simulations keeping their trees in Node objects, then in a TreeStore.
+    Return the history of the first game (see play_seeded_game), the
+    results of the reuse tests of its players and the differences found
+    (empty list if none): both games must be the same, with the same
+    searches, and the roots must follow the same plays of actions_taken.
+    """
+
+    players = {}
+    for tree_store_size in (0, 10000):
+        players[tree_store_size] = {player: ReuseRecordingUCT(1,
+                                            n_simulations,
+                                            tree_store_size=tree_store_size)
+                                    for player in (1, 2)}
+    history = play_seeded_game(config, seed, players[0], 0, 200)
+    if play_seeded_game(config, seed, players[10000], 0, 200) != history:
+        return history, [], ['TreeStore game']
+    reuse_tests = []
+    for player in (1, 2):
+        if players[0][player].reuse_tests \
+            != players[10000][player].reuse_tests:
+            return history, [], ['plays followed by the root']
+        reuse_tests += players[0][player].reuse_tests
+    return history, reuse_tests, []
+
+def check_tree_store(config, seed):
+    """
+    Check that Vanilla_UCT searches the same tree whether it is kept in
+    Node objects or in a TreeStore (tree_store.py, see compare_backends). A
+    TreeStore too small for the search must still play a whole game,
+    reclaiming the nodes released when the root advances.
+    Return the number of plays compared and the differences found (empty
+    list if none).
+    """
+
+    history, _, differences = compare_backends(config, seed, 30)
+    if differences:
+        return len(history), differences
+    players = {1: Vanilla_UCT(1, 30, tree_store_size=50),
+                2: Vanilla_UCT(1, 30, tree_store_size=50)}
+    small_history = play_seeded_game(config, seed, players, 0, 200)
+    if not small_history or players[1].tree_store.generation < 2:
+        return len(history), ['small TreeStore']
+    return len(history), []
+
+def check_tree_reuse(config, seed, n_games):
+    """
+    Check with compare_backends on the n_games games seeded from 'seed'
+    that the Node objects and the TreeStore reuse their trees through the
+    same plays of actions_taken, and that some plays are followed. Without
+    chance nodes, a child keeps the roll sampled when it was created, so
+    the root only follows a play when that roll is the actual one: the 81
+    rolls of the toy board make it frequent enough. Return the number of
+    games compared and the differences found (empty list if none).
+    """
+
+    n_followed = 0
+    for game_seed in range(seed, seed + n_games):
+        _, reuse_tests, differences = compare_backends(config, game_seed, 10)
+        if differences:
+            return game_seed - seed, differences
+        n_followed += reuse_tests.count(True)
+    if n_followed == 0:
+        return n_games, ['no play followed by the root']
+    return n_games, []
+
+def main():
+    """
+    Check that the TreeStore backend of the UCT players (tree_store.py)
+    searches and reuses its tree like the Node objects.
+    Usage: check_tree_store.py [seed]
+    """
+
+    seed = 0
+    if len(sys.argv) > 1:
+        seed = int(sys.argv[1])
+
+    n_mismatches = 0
+    for name, config, _ in BOARDS:
+        n_checked, differences = check_tree_store(config, seed)
+        n_mismatches += report(name, 'tree store', n_checked, 'plays',
+                                differences)
+    n_checked, differences = check_tree_reuse(TOY_CONFIG, seed, 20)
+    n_mismatches += report('Toy', 'tree reuse', n_checked, 'games',
+                            differences)
+    finish(n_mismatches)
+
+if __name__ == "__main__":
+    main()
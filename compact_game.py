@@ -0,0 +1,688 @@
+import random
+from game import Board, combination_table, column_heights, zobrist_keys
+from random_streams import DiceStream
+
+class CompactGame:
+    def __init__(self, n_players, dice_number, dice_value, column_range,
+                    offset, initial_height, rng=None):
+        """
+        Array-backed implementation of the Game API. It follows exactly the
+        same rules as Game, but instead of a Board of Cell objects holding
+        lists of markers, the board is stored as a flat list of integers.
+
+        - n_players, dice_number, dice_value, column_range, offset and
+          initial_height have the same meaning as in Game.
+        - n_slots is the number of entries reserved per marker in positions
+          (one per column index, the first two are unused).
+        - heights is a list where heights[column] is the number of cells of
+          that column. It never changes, so it is shared between clones.
+        - positions is a list of n_slots * (n_players + 1) integers.
+          positions[marker * n_slots + column] is the cell index of 'marker'
+          in 'column', -1 if the marker is not in the column. Marker 0 is
+          the neutral marker, markers 1..n_players are the furthest
+          permanent marker of each player.
+        - neutral_columns is a list of the columns that currently hold a
+          neutral marker.
+        - player_turn, finished_columns, player_won_column, dice_action,
+          current_roll, n_neutral_markers, actions_taken,
+          finished_columns_mask, player_won_column_mask,
+          neutral_columns_mask, n_won_columns, winner, zobrist_hash and
+          dice_stream (built from 'rng') have the same meaning as in Game.
+        """
+
+        self.n_players = n_players
+        self.dice_number = dice_number
+        self.dice_value = dice_value
+        self.column_range = column_range
+        self.offset = offset
+        self.initial_height = initial_height
+        self.n_slots = self.column_range[1] + 1
+        self.heights = column_heights(self.column_range, self.offset,
+                                        self.initial_height
+                                        )
+        self.positions = [-1] * (self.n_slots * (self.n_players + 1))
+        self.neutral_columns = []
+        self.player_turn = 1
+        self.finished_columns = []
+        self.player_won_column = []
+        self.dice_action = True
+        self.dice_stream = None
+        if rng is not None:
+            self.dice_stream = DiceStream(dice_number, dice_value, rng)
+        self.current_roll = self.roll_dice()
+        self.n_neutral_markers = 0
+        self.actions_taken = []
+        self.finished_columns_mask = 0
+        self.player_won_column_mask = 0
+        self.neutral_columns_mask = 0
+        self.n_won_columns = [0] * (self.n_players + 1)
+        self.winner = 0
+        keys = zobrist_keys(self)
+        self.zobrist_hash = keys.turn[self.player_turn] ^ keys.dice_action \
+                            ^ keys.neutral_count[0]
+
+    @classmethod
+    def from_game(cls, game):
+        """Return a CompactGame representing the same state as 'game'."""
+
+        compact = cls.__new__(cls)
+        compact.n_players = game.n_players
+        compact.dice_number = game.dice_number
+        compact.dice_value = game.dice_value
+        compact.column_range = game.column_range
+        compact.offset = game.offset
+        compact.initial_height = game.initial_height
+        compact.n_slots = compact.column_range[1] + 1
+        compact.heights = column_heights(compact.column_range,
+                                            compact.offset,
+                                            compact.initial_height
+                                            )
+        compact.positions = [-1] * (compact.n_slots * (compact.n_players + 1))
+        for x in range(compact.column_range[0], compact.column_range[1]+1):
+            list_of_cells = game.board_game.board[x]
+            for i in range(len(list_of_cells)):
+                for marker in list_of_cells[i].markers:
+                    compact.positions[marker * compact.n_slots + x] = i
+        compact.neutral_columns = [item[0] for item in game.neutral_positions]
+        compact.player_turn = game.player_turn
+        compact.finished_columns = list(game.finished_columns)
+        compact.player_won_column = list(game.player_won_column)
+        compact.dice_action = game.dice_action
+        compact.dice_stream = None
+        if game.dice_stream is not None:
+            compact.dice_stream = game.dice_stream.clone_stream()
+        compact.current_roll = game.current_roll
+        compact.n_neutral_markers = game.n_neutral_markers
+        compact.actions_taken = list(game.actions_taken)
+        compact.finished_columns_mask = 0
+        for item in compact.finished_columns:
+            compact.finished_columns_mask |= 1 << item[0]
+        compact.player_won_column_mask = 0
+        for item in compact.player_won_column:
+            compact.player_won_column_mask |= 1 << item[0]
+        compact.neutral_columns_mask = 0
+        for col in compact.neutral_columns:
+            compact.neutral_columns_mask |= 1 << col
+        compact.n_won_columns = game.n_won_columns[:]
+        compact.winner = game.winner
+        compact.zobrist_hash = compact.compute_zobrist_hash()
+        return compact
+
+    def to_bytes(self):
+        """
+        Return the state of the game as a fixed-size bytes object, the same
+        encoding as Game.to_bytes (see state_dtype in game.py).
+        """
+
+        first, last = self.column_range
+        n_slots = self.n_slots
+        positions = []
+        for marker in range(self.n_players + 1):
+            for position in self.positions[marker * n_slots + first:
+                                            marker * n_slots + last + 1]:
+                positions.append(position + 1)
+        finished = [0] * (last - first + 1)
+        won = [0] * (last - first + 1)
+        for column, player in self.finished_columns:
+            finished[column - first] = player
+        for column, _ in self.player_won_column:
+            won[column - first] = 1
+        return bytes([self.player_turn, self.dice_action,
+                        self.n_neutral_markers, *self.current_roll]
+                        + positions + finished + won)
+
+    @classmethod
+    def from_bytes(cls, data, n_players, dice_number, dice_value,
+                    column_range, offset, initial_height, rng=None,
+                    base=None):
+        """
+        Return a CompactGame of the given configuration in the state encoded
+        in 'data' by to_bytes (see Game.from_bytes). 'base' is accepted for
+        compatibility with Game.from_bytes and ignored: a CompactGame
+        shares nothing with other states.
+        """
+
+        compact = cls.__new__(cls)
+        compact.n_players = n_players
+        compact.dice_number = dice_number
+        compact.dice_value = dice_value
+        compact.column_range = column_range
+        compact.offset = offset
+        compact.initial_height = initial_height
+        compact.n_slots = column_range[1] + 1
+        compact.heights = column_heights(column_range, offset,
+                                            initial_height)
+        compact.positions = [-1] * (compact.n_slots * (n_players + 1))
+        compact.player_turn = data[0]
+        compact.dice_action = bool(data[1])
+        compact.n_neutral_markers = data[2]
+        compact.current_roll = tuple(data[3:3 + dice_number])
+        compact.dice_stream = None
+        if rng is not None:
+            compact.dice_stream = DiceStream(dice_number, dice_value, rng)
+        compact.neutral_columns = []
+        compact.finished_columns = []
+        compact.player_won_column = []
+        compact.actions_taken = []
+        compact.finished_columns_mask = 0
+        compact.player_won_column_mask = 0
+        compact.neutral_columns_mask = 0
+        compact.n_won_columns = [0] * (n_players + 1)
+
+        first, last = column_range
+        n_columns = last - first + 1
+        for marker in range(n_players + 1):
+            start = 3 + dice_number + marker * n_columns - first
+            for x in range(first, last + 1):
+                compact.positions[marker * compact.n_slots + x] = \
+                                                        data[start + x] - 1
+        finished = 3 + dice_number + (n_players + 1) * n_columns - first
+        won = finished + n_columns
+        for x in range(first, last + 1):
+            if compact.positions[x] != -1:
+                compact.neutral_columns.append(x)
+                compact.neutral_columns_mask |= 1 << x
+            if data[finished + x]:
+                compact.finished_columns.append((x, data[finished + x]))
+                compact.finished_columns_mask |= 1 << x
+                compact.n_won_columns[data[finished + x]] += 1
+            if data[won + x]:
+                compact.player_won_column.append((x, compact.player_turn))
+                compact.player_won_column_mask |= 1 << x
+        compact.winner = 0
+        for player in range(1, n_players + 1):
+            if compact.n_won_columns[player] >= 3:
+                compact.winner = player
+                break
+        compact.zobrist_hash = compact.compute_zobrist_hash()
+        return compact
+
+    @property
+    def neutral_positions(self):
+        """
+        List of 2-tuples (column index, cell index) of the neutral markers,
+        as stored by Game.
+        """
+
+        return [(col, self.positions[col]) for col in self.neutral_columns]
+
+    @property
+    def board_game(self):
+        """
+        Return a Board equivalent to the current state. It is built on
+        demand, so it should only be used for printing and comparisons.
+        """
+
+        board = Board(self.column_range, self.offset, self.initial_height)
+        finished = dict(self.finished_columns)
+        for x in range(self.column_range[0], self.column_range[1]+1):
+            list_of_cells = board.board[x]
+            # A won column is filled with the markers of its winner
+            if x in finished:
+                for cell in list_of_cells:
+                    cell.markers.append(finished[x])
+                continue
+            for marker in range(self.n_players + 1):
+                position = self.positions[marker * self.n_slots + x]
+                if position != -1:
+                    list_of_cells[position].markers.append(marker)
+        return board
+
+    def check_boardgame_equality(self, game):
+        """ Check if self and 'game' represents the same state."""
+
+        condition_1 = self.board_game.check_board_equality(game.board_game)
+        condition_2 = sorted(self.finished_columns) \
+                        == sorted(game.finished_columns)
+        condition_3 = sorted(self.player_won_column) \
+                        == sorted(game.player_won_column)
+
+        return condition_1 and condition_2 and condition_3
+
+    def number_positions_conquered_this_round(self, column):
+        """
+        Return the number of positions advanced in this round for a given
+        column by the player.
+        """
+
+        counter = 0
+        neutral = self.positions[column]
+        if neutral != -1:
+            counter = neutral \
+                        - self.positions[self.player_turn * self.n_slots
+                                            + column]
+        for item in self.player_won_column:
+            if item[0] == column:
+                counter += 1
+                break
+        return counter
+
+    def number_positions_conquered(self, column):
+        """
+        Return how far the player is in 'column'. -1 if the player is not in
+        the column.
+        """
+
+        return self.positions[self.player_turn * self.n_slots + column]
+
+    def print_board(self):
+        self.board_game.print_board(self.player_won_column)
+
+    def clone(self):
+        """Return a copy of this game. Used for MCTS routines."""
+
+        copy_game = CompactGame.__new__(CompactGame)
+        copy_game.__dict__.update(self.__dict__)
+        copy_game.positions = self.positions[:]
+        copy_game.neutral_columns = self.neutral_columns[:]
+        copy_game.finished_columns = self.finished_columns[:]
+        copy_game.player_won_column = self.player_won_column[:]
+        copy_game.actions_taken = self.actions_taken[:]
+        copy_game.n_won_columns = self.n_won_columns[:]
+        if self.dice_stream is not None:
+            copy_game.dice_stream = self.dice_stream.clone_stream()
+        return copy_game
+
+    def columns_won_current_round(self):
+        """
+        Return a list containing the set of columns won by the player in the
+        current round. That is, the number of columns won should the player
+        stopped playing now.
+        """
+
+        return self.player_won_column
+
+    def undo_token(self):
+        """
+        Return an undo token for the current state. Whatever is applied to
+        the game afterwards (play, transform_neutral_markers,
+        erase_neutral_markers, a bust in is_player_busted or a new
+        current_roll) is reverted by unmake(token), including the rolls
+        drawn from dice_stream, with the same exceptions as in Game.
+        """
+
+        return (self.positions[:], self.player_turn, self.dice_action,
+                self.current_roll, self.n_neutral_markers,
+                self.neutral_columns[:], self.finished_columns[:],
+                self.player_won_column[:], self.finished_columns_mask,
+                self.player_won_column_mask, self.neutral_columns_mask,
+                self.n_won_columns[:], self.winner, self.zobrist_hash,
+                None if self.dice_stream is None
+                else self.dice_stream.position())
+
+    def unmake(self, token):
+        """
+        Revert the game to the state 'token' was taken from. Tokens may be
+        used several times, and nested tokens should be undone in the
+        reverse order they were made.
+        """
+
+        (positions, self.player_turn, self.dice_action, self.current_roll,
+            self.n_neutral_markers, neutral_columns, finished_columns,
+            player_won_column, self.finished_columns_mask,
+            self.player_won_column_mask, self.neutral_columns_mask,
+            n_won_columns, self.winner, self.zobrist_hash,
+            dice_position) = token
+        if dice_position is not None:
+            self.dice_stream.restore(dice_position)
+        self.positions = positions[:]
+        self.neutral_columns = neutral_columns[:]
+        self.finished_columns = finished_columns[:]
+        self.player_won_column = player_won_column[:]
+        self.n_won_columns = n_won_columns[:]
+
+    def make_move(self, chosen_play):
+        """
+        Apply "chosen_play" to the game (see play) and return the undo token
+        that reverts it (see unmake).
+        """
+
+        token = self.undo_token()
+        self.play(chosen_play)
+        return token
+
+    def make_roll(self, roll):
+        """
+        Replace the current dice roll by 'roll' and return the undo token
+        that reverts it (see unmake).
+        """
+
+        token = self.undo_token()
+        self.current_roll = roll
+        return token
+
+    def hash_key(self, include_roll=False):
+        """
+        Return the Zobrist hash of the current position. If include_roll is
+        True, the current dice roll (regardless of the dice order) is also
+        taken into account.
+        """
+
+        if include_roll:
+            return self.zobrist_hash ^ zobrist_keys(self).rolls[
+                                                        self.current_roll]
+        return self.zobrist_hash
+
+    def compute_zobrist_hash(self):
+        """
+        Return the Zobrist hash of the current position computed from
+        scratch. It is always equal to zobrist_hash, which is maintained
+        incrementally instead.
+        """
+
+        keys = zobrist_keys(self)
+        zobrist_hash = keys.turn[self.player_turn] \
+                        ^ keys.neutral_count[self.n_neutral_markers]
+        if self.dice_action:
+            zobrist_hash ^= keys.dice_action
+        for marker in range(self.n_players + 1):
+            for x in range(self.column_range[0], self.column_range[1]+1):
+                position = self.positions[marker * self.n_slots + x]
+                if position != -1:
+                    zobrist_hash ^= keys.markers[marker][x][position]
+        for column_won in self.finished_columns:
+            zobrist_hash ^= keys.finished[column_won[0]][column_won[1]]
+        for column_won in self.player_won_column:
+            zobrist_hash ^= keys.won[column_won[0]]
+        return zobrist_hash
+
+    def play(self, chosen_play):
+        """
+        Apply the "chosen_play" to the game.
+        Depending on the play and dice roll, it will change player_turn.
+        """
+
+        keys = zobrist_keys(self)
+        if chosen_play == 'n':
+            self.transform_neutral_markers()
+            # Next action should be to choose a dice combination
+            if not self.dice_action:
+                self.zobrist_hash ^= keys.dice_action
+            self.dice_action = True
+            return
+        if chosen_play == 'y':
+            # Next action should be to choose a dice combination
+            if not self.dice_action:
+                self.zobrist_hash ^= keys.dice_action
+            self.dice_action = True
+            return
+        if self.is_player_busted(self.available_moves()):
+            return
+        neutral_keys = keys.markers[0]
+        positions = self.positions
+        player_offset = self.player_turn * self.n_slots
+        for col in chosen_play:
+            last_cell = self.heights[col] - 1
+            neutral = positions[col]
+            player_position = positions[player_offset + col]
+            # If there's no neutral marker and no player_id marker
+            if neutral == -1 and player_position == -1:
+                positions[col] = 0
+                self.zobrist_hash ^= \
+                        keys.neutral_count[self.n_neutral_markers] \
+                        ^ keys.neutral_count[self.n_neutral_markers + 1]
+                self.n_neutral_markers += 1
+                self.neutral_columns.append(col)
+                self.neutral_columns_mask |= 1 << col
+                self.zobrist_hash ^= neutral_keys[col][0]
+            # If there's no neutral marker but there is player id marker
+            elif neutral == -1:
+                # First check if the player will win that column
+                self.zobrist_hash ^= \
+                        keys.neutral_count[self.n_neutral_markers] \
+                        ^ keys.neutral_count[self.n_neutral_markers + 1]
+                self.n_neutral_markers += 1
+                if player_position == last_cell:
+                    if (col, self.player_turn) not in self.player_won_column:
+                        self.player_won_column.append((col, self.player_turn))
+                        self.player_won_column_mask |= 1 << col
+                        self.zobrist_hash ^= keys.won[col]
+                else:
+                    positions[col] = player_position + 1
+                    self.neutral_columns.append(col)
+                    self.neutral_columns_mask |= 1 << col
+                    self.zobrist_hash ^= neutral_keys[col][player_position + 1]
+            # If there's a neutral marker
+            else:
+                # First check if the player will win that column
+                if neutral == last_cell:
+                    if (col, self.player_turn) not in self.player_won_column:
+                        self.player_won_column.append((col, self.player_turn))
+                        self.player_won_column_mask |= 1 << col
+                        self.zobrist_hash ^= keys.won[col]
+                else:
+                    positions[col] = neutral + 1
+                    self.zobrist_hash ^= neutral_keys[col][neutral] \
+                                            ^ neutral_keys[col][neutral + 1]
+        # Next action should be [y,n]
+        if self.dice_action:
+            self.zobrist_hash ^= keys.dice_action
+        self.dice_action = False
+        # Then a new dice roll is done (same is done if the player is busted)
+        self.current_roll = self.roll_dice()
+
+    def transform_neutral_markers(self):
+        """Transform the neutral markers into player_id markers (1 or 2)."""
+
+        keys = zobrist_keys(self)
+        player_keys = keys.markers[self.player_turn]
+        positions = self.positions
+        player_offset = self.player_turn * self.n_slots
+        # Only the furthest marker of each player is stored, so the neutral
+        # marker simply replaces the previous player_id marker.
+        for col in self.neutral_columns:
+            self.zobrist_hash ^= keys.markers[0][col][positions[col]] \
+                                    ^ player_keys[col][positions[col]]
+            if positions[player_offset + col] != -1:
+                self.zobrist_hash ^= \
+                                player_keys[col][positions[player_offset + col]]
+            positions[player_offset + col] = positions[col]
+            positions[col] = -1
+
+        # Remove the duplicates from player_won_column (see Game).
+        self.player_won_column = list(set(self.player_won_column))
+
+        # Check if the player won some column and update it accordingly.
+        for column_won in self.player_won_column:
+            self.finished_columns.append((column_won[0], column_won[1]))
+            self.n_won_columns[column_won[1]] += 1
+            for marker in range(1, self.n_players + 1):
+                position = positions[marker * self.n_slots + column_won[0]]
+                if position != -1:
+                    self.zobrist_hash ^= keys.markers[marker][column_won[0]][
+                                                                    position]
+                positions[marker * self.n_slots + column_won[0]] = -1
+            positions[player_offset + column_won[0]] = \
+                                                self.heights[column_won[0]] - 1
+            self.zobrist_hash ^= \
+                player_keys[column_won[0]][self.heights[column_won[0]] - 1] \
+                ^ keys.finished[column_won[0]][column_won[1]] \
+                ^ keys.won[column_won[0]]
+
+        self.player_won_column.clear()
+        self.finished_columns_mask |= self.player_won_column_mask
+        # Same order as the previous column count: player 1 is checked first.
+        for player in range(1, self.n_players + 1):
+            if self.n_won_columns[player] >= 3:
+                self.winner = player
+                break
+        self.player_won_column_mask = 0
+
+        self.zobrist_hash ^= keys.turn[self.player_turn]
+        if self.player_turn == self.n_players:
+            self.player_turn = 1
+        else:
+            self.player_turn += 1
+        self.zobrist_hash ^= keys.turn[self.player_turn]
+
+        self.zobrist_hash ^= \
+                keys.neutral_count[self.n_neutral_markers] \
+                ^ keys.neutral_count[0]
+        self.n_neutral_markers = 0
+        self.neutral_columns = []
+        self.neutral_columns_mask = 0
+
+    def erase_neutral_markers(self):
+        """Remove the neutral markers because the player is busted."""
+
+        keys = zobrist_keys(self)
+        neutral_keys = keys.markers[0]
+        for col in self.neutral_columns:
+            self.zobrist_hash ^= neutral_keys[col][self.positions[col]]
+            self.positions[col] = -1
+
+        self.zobrist_hash ^= \
+                keys.neutral_count[self.n_neutral_markers] \
+                ^ keys.neutral_count[0]
+        self.n_neutral_markers = 0
+        self.neutral_columns = []
+        self.neutral_columns_mask = 0
+
+    def count_neutral_markers(self):
+        """Return the number of neutral markers present in the current board."""
+        return self.n_neutral_markers
+
+    def is_player_busted(self, all_moves):
+        """
+        Check if the player has no remaining plays. Return a boolean.
+        - all_moves is a list of 2-tuples or integers relating to the possible
+        plays the player can make or the [y,n] list regarding the turn the
+        player chooses if he wants to continue playing or not.
+        """
+
+        if all_moves == ['y', 'n']:
+            return False
+        if len(all_moves) != 0:
+            if self.count_neutral_markers() < 3:
+                return False
+            for move in all_moves:
+                for col in move:
+                    if self.positions[col] != -1:
+                        return False
+        self.erase_neutral_markers()
+        keys = zobrist_keys(self)
+        for column_won in self.player_won_column:
+            self.zobrist_hash ^= keys.won[column_won[0]]
+        self.player_won_column.clear()
+        self.player_won_column_mask = 0
+        self.zobrist_hash ^= keys.turn[self.player_turn]
+        if self.player_turn == self.n_players:
+            self.player_turn = 1
+        else:
+            self.player_turn += 1
+        self.zobrist_hash ^= keys.turn[self.player_turn]
+        # A new dice roll is done (same is done if a play is completed)
+        self.current_roll = self.roll_dice()
+        return True
+
+    def roll_dice(self):
+        """Return a tuple with integers representing the dice roll."""
+
+        if self.dice_stream is not None:
+            return self.dice_stream.roll()
+        my_list = []
+        for _ in range(0,self.dice_number):
+          my_list.append(random.randrange(1,self.dice_value+1))
+        return tuple(my_list)
+
+    def check_tuple_availability(self, tuple):
+        """
+        Check if there is a neutral marker in both tuples columns taking into
+        account the number of neutral_markers currently on the board.
+        Return a boolean.
+        """
+
+        #First check if the column 'value' is already completed
+        closed_mask = self.finished_columns_mask | self.player_won_column_mask
+        if closed_mask & (1 << tuple[0] | 1 << tuple[1]):
+            return False
+
+        neutral_markers = self.count_neutral_markers()
+
+        if neutral_markers == 0 or neutral_markers == 1:
+            return True
+
+        # Variables to store if there is a neutral marker in tuples columns.
+        is_first_value_valid = self.positions[tuple[0]] != -1
+        is_second_value_valid = self.positions[tuple[1]] != -1
+
+        if neutral_markers == 2:
+            return is_first_value_valid or is_second_value_valid \
+                    or tuple[0] == tuple[1]
+        else:
+            return is_first_value_valid and is_second_value_valid
+
+    def check_value_availability(self, value):
+        """
+        Check if there's a neutral marker in the 'value' column.
+        Return a boolean.
+        """
+
+        #First check if the column 'value' is already completed
+        closed_mask = self.finished_columns_mask | self.player_won_column_mask
+        if closed_mask & (1 << value):
+            return False
+
+        if self.count_neutral_markers() < 3:
+            return True
+        return self.positions[value] != -1
+
+    def available_moves(self):
+        """
+        Return a list of 2-tuples of possible combinations player_id can play
+        if neutral counter is less than 2 or return the list [y,n] in case the
+        current action is to continue to play or not.
+        """
+
+        if not self.dice_action:
+            return ['y','n']
+
+        # The pairings of the roll come from a precomputed table, so only
+        # the availability of their columns has to be checked (see
+        # combination_table).
+        neutral_markers = self.n_neutral_markers
+        neutral_mask = self.neutral_columns_mask
+        open_mask = ~(self.finished_columns_mask | self.player_won_column_mask)
+        if neutral_markers < 3:
+            available_mask = open_mask
+        else:
+            available_mask = open_mask & neutral_mask
+
+        moves = []
+        for first_bit, second_bit, outcomes in \
+            combination_table(self.dice_value)[self.current_roll]:
+            pair_mask = first_bit | second_bit
+            if (open_mask & pair_mask) != pair_mask:
+                code = 0
+            elif neutral_markers < 2:
+                code = 4
+            elif neutral_markers == 2:
+                if (neutral_mask & pair_mask) or first_bit == second_bit:
+                    code = 4
+                else:
+                    code = 0
+            elif (neutral_mask & pair_mask) == pair_mask:
+                code = 4
+            else:
+                code = 0
+            if available_mask & first_bit:
+                code += 2
+            if available_mask & second_bit:
+                code += 1
+            # Remove duplicate actions (Example: dice = (2,6,6,6) will give
+            # actions = [(8,12), (8,12), (8,12)])
+            for move in outcomes[code]:
+                if move not in moves:
+                    moves.append(move)
+        return moves
+
+    def is_finished(self):
+        """
+        Return two values: what player won (player 1 = 1, player 2 = 2 and
+        0 if the game is not over yet) and a boolean value representing if the
+        game is over or not.
+        """
+
+        # >= 3 columns is checked in transform_neutral_markers, the only place
+        # where columns are won.
+        return self.winner, self.winner != 0
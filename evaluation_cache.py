@@ -0,0 +1,90 @@
+import collections
+
+# EvaluationCache shared by the games played in the current process (see
+# worker_cache).
+_worker_cache = None
+
+class EvaluationCache:
+    def __init__(self, max_size):
+        """
+        Least recently used cache of the predictions of a network (see
+        AlphaZeroPlayer.predict_batch), so that a position evaluated again
+        (tree reuse misses, transpositions, the same opening in another
+        game, or the value of a leaf and then its priors when it is
+        expanded) does not cost another prediction. It is only valid for a
+        single set of weights.
+        - max_size is the maximum number of entries. When the cache is
+          full, the least recently used entry is replaced.
+        - entries is an OrderedDict {key: (policy, value)} ordered from the
+          least to the most recently used, where key is the Zobrist hash of
+          the position (Game.hash_key) and the frozenset of its valid
+          actions (the action mask given to the network), policy is the
+          array of the probabilities of every action and value the value
+          predicted by the network.
+        - hits and misses count the lookups that found an entry and the ones
+          that did not.
+        """
+
+        self.max_size = max_size
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, state, valid_actions):
+        """Return the key of the position 'state' with 'valid_actions'."""
+
+        return state.hash_key(), frozenset(valid_actions)
+
+    def get(self, key):
+        """
+        Return the (policy, value) of 'key', None if it is not cached. The
+        policy is a copy, so the caller may modify it.
+        """
+
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0].copy(), entry[1]
+
+    def put(self, key, policy, value):
+        """Store a copy of 'policy' and 'value' for 'key'."""
+
+        self.entries[key] = (policy.copy(), value)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def hit_rate(self):
+        """Return the fraction of the lookups that found an entry."""
+
+        n_lookups = self.hits + self.misses
+        return self.hits / n_lookups if n_lookups else 0.0
+
+    def clear(self):
+        """
+        Remove every entry and reset the counters. Call it when the
+        weights of the network change.
+        """
+
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+def worker_cache(max_size):
+    """
+    Return the EvaluationCache shared by the games played in the current
+    process, created with 'max_size' on the first call. The processes of a
+    ProcessPoolExecutor of Experiment play with a single set of weights, so
+    their games can share the evaluations of the same network.
+    """
+
+    global _worker_cache
+    if _worker_cache is None:
+        _worker_cache = EvaluationCache(max_size)
+    return _worker_cache
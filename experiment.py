@@ -6,17 +6,39 @@ import pickle
 import psutil
 import os.path
 import gc
+import numpy as np
 from players.vanilla_uct_player import Vanilla_UCT
 from players.alphazero_player import AlphaZeroPlayer
 from players.uct_player import UCTPlayer
 from statistics import Statistic
+from random_streams import seed_sequence
 from concurrent.futures import ProcessPoolExecutor
+from inference_server import InferenceServer, worker_client
+from evaluation_cache import worker_cache
+from numpy_network import NumpyNetwork
 
 class Experiment:
 
     def __init__(self, n_players, dice_number, dice_value, column_range,
-        offset, initial_height, max_game_length, reg, conv_number, n_cores):
-        """n_cpus is the number of cores used for parallel computations. """
+        offset, initial_height, max_game_length, reg, conv_number, n_cores,
+        seed=None, inference_batch_size=0, inference_max_wait=0.001,
+        numpy_inference=False):
+        """
+        n_cpus is the number of cores used for parallel computations.
+        seed (an int or a numpy SeedSequence) makes the games reproducible:
+        every game gets its own SeedSequence spawned from it (see
+        _game_seeds). None keeps using the global random module.
+        inference_batch_size is the maximum batch size of the
+        InferenceServer (inference_server.py) evaluating the positions of
+        the selfplay and network evaluation games, which are then played
+        by n_cores processes that do not build networks. If it is 0
+        (default), every process builds its own networks.
+        inference_max_wait is the maximum time in seconds the server waits
+        to fill a batch.
+        numpy_inference is a boolean. If True, the games are played with the
+        NumpyNetwork (numpy_network.py) of the weights instead of Keras
+        models, so the processes playing them do not import TensorFlow.
+        """
         self.n_players = n_players
         self.dice_number = dice_number
         self.dice_value = dice_value
@@ -27,6 +49,51 @@ class Experiment:
         self.reg = reg
         self.conv_number = conv_number
         self.n_cores = n_cores
+        self.seed = None
+        if seed is not None:
+            self.seed = seed_sequence(seed)
+        self.inference_batch_size = inference_batch_size
+        self.inference_max_wait = inference_max_wait
+        self.numpy_inference = numpy_inference
+
+    def _start_inference_server(self, weights):
+        """
+        Return an InferenceServer serving one network per element of
+        'weights', or None if inference_batch_size is 0. Only the server
+        process builds networks.
+        """
+
+        if self.inference_batch_size == 0:
+            return None
+        network_spec = {'reg': self.reg, 'conv_number': self.conv_number,
+                        'column_range': self.column_range,
+                        'offset': self.offset,
+                        'initial_height': self.initial_height,
+                        'dice_value': self.dice_value}
+        return InferenceServer(network_spec, weights, self.n_cores,
+                                self.inference_batch_size,
+                                self.inference_max_wait)
+
+    def _game_executor(self, server):
+        """
+        Return the ProcessPoolExecutor playing the games, whose workers are
+        clients of 'server' if it is not None.
+        """
+
+        if server is None:
+            return ProcessPoolExecutor(max_workers=self.n_cores)
+        return server.executor(self.n_cores)
+
+    def _game_seeds(self, n_games):
+        """
+        Return a list with the seeds of the next n_games games: independent
+        SeedSequence spawned from the seed of the experiment (the same ones
+        in every run with that seed), or None if it has no seed.
+        """
+
+        if self.seed is None:
+            return [None] * n_games
+        return self.seed.spawn(n_games)
 
     def _play_single_game(self, args):
         """
@@ -37,6 +104,8 @@ class Experiment:
         Return an empty list if none of the players are instances of 
         AlphaZeroPlayer or the data collected from the game otherwise.
         Return 1 if player1 won and 2 if player2 won.
+        args[5], if present, is the seed of the game (see _game_seeds):
+        the dice and each player get their own stream spawned from it.
         """
 
         player1 = args[0]
@@ -44,82 +113,117 @@ class Experiment:
         type_of_game = args[2]
         player1_weights = args[3]
         player2_weights = args[4]
-
-        from keras import backend as K 
-        K.set_image_data_format('channels_first') 
-        # Selfplay
-        if type_of_game == 's':
-            from models import define_model
-            current_model = define_model(
-                                    reg = self.reg, 
-                                    conv_number = self.conv_number, 
-                                    column_range = self.column_range, 
-                                    offset = self.offset, 
-                                    initial_height = self.initial_height, 
-                                    dice_value = self.dice_value
-                                    )
+        game_seed = args[5] if len(args) > 5 else None
+
+        client = worker_client()
+        if client is not None:
+            # The networks are served by the InferenceServer of the pool
+            # (see _start_inference_server): one per player, except in
+            # selfplay where both players share it.
+            network_ids = iter(range(2))
+            for player in (player1, player2):
+                if isinstance(player, AlphaZeroPlayer):
+                    player.network = client.network(
+                        0 if type_of_game == 's' else next(network_ids))
+        elif self.numpy_inference:
+            if type_of_game == 's':
+                player2_weights = player1_weights
+            for player, weights in ((player1, player1_weights),
+                                    (player2, player2_weights)):
+                if isinstance(player, AlphaZeroPlayer) and weights is not None:
+                    player.network = NumpyNetwork.from_weights(weights,
+                                        self.conv_number, self.column_range,
+                                        self.offset, self.initial_height,
+                                        self.dice_value)
+        else:
+            from keras import backend as K 
+            K.set_image_data_format('channels_first') 
+            # Selfplay
+            if type_of_game == 's':
+                from models import define_model
+                current_model = define_model(
+                                        reg = self.reg, 
+                                        conv_number = self.conv_number, 
+                                        column_range = self.column_range, 
+                                        offset = self.offset, 
+                                        initial_height = self.initial_height, 
+                                        dice_value = self.dice_value
+                                        )
             
-            copy_model = define_model(
-                                    reg = self.reg, 
-                                    conv_number = self.conv_number, 
-                                    column_range = self.column_range, 
-                                    offset = self.offset, 
-                                    initial_height = self.initial_height, 
-                                    dice_value = self.dice_value
-                                    )
+                copy_model = define_model(
+                                        reg = self.reg, 
+                                        conv_number = self.conv_number, 
+                                        column_range = self.column_range, 
+                                        offset = self.offset, 
+                                        initial_height = self.initial_height, 
+                                        dice_value = self.dice_value
+                                        )
 
-            player1.network = current_model
-            player2.network = copy_model
+                player1.network = current_model
+                player2.network = copy_model
                 
-            player1.network.set_weights(player1_weights)
-            player2.network.set_weights(player1_weights)
-        # Evaluation vs network
-        elif type_of_game == 'en':
-            from models import define_model
-            current_model = define_model(
-                                    reg = self.reg, 
-                                    conv_number = self.conv_number, 
-                                    column_range = self.column_range, 
-                                    offset = self.offset, 
-                                    initial_height = self.initial_height, 
-                                    dice_value = self.dice_value
-                                    )
+                player1.network.set_weights(player1_weights)
+                player2.network.set_weights(player1_weights)
+            # Evaluation vs network
+            elif type_of_game == 'en':
+                from models import define_model
+                current_model = define_model(
+                                        reg = self.reg, 
+                                        conv_number = self.conv_number, 
+                                        column_range = self.column_range, 
+                                        offset = self.offset, 
+                                        initial_height = self.initial_height, 
+                                        dice_value = self.dice_value
+                                        )
             
-            old_model = define_model(
-                                    reg = self.reg, 
-                                    conv_number = self.conv_number, 
-                                    column_range = self.column_range, 
-                                    offset = self.offset, 
-                                    initial_height = self.initial_height, 
-                                    dice_value = self.dice_value
-                                    )
+                old_model = define_model(
+                                        reg = self.reg, 
+                                        conv_number = self.conv_number, 
+                                        column_range = self.column_range, 
+                                        offset = self.offset, 
+                                        initial_height = self.initial_height, 
+                                        dice_value = self.dice_value
+                                        )
 
-            player1.network = current_model
-            player2.network = old_model
-            player1.network.set_weights(player1_weights)
-            player2.network.set_weights(player2_weights)
-        
-        # Evaluation vs UCTs
-        elif type_of_game == 'eu':
-            from models import define_model
-            network = define_model(
-                                    reg = self.reg, 
-                                    conv_number = self.conv_number, 
-                                    column_range = self.column_range, 
-                                    offset = self.offset, 
-                                    initial_height = self.initial_height, 
-                                    dice_value = self.dice_value
-                                    )
-            if player1_weights != None:
-                player1.network = network
+                player1.network = current_model
+                player2.network = old_model
                 player1.network.set_weights(player1_weights)
-            else:
-                player2.network = network
                 player2.network.set_weights(player2_weights)
+        
+            # Evaluation vs UCTs
+            elif type_of_game == 'eu':
+                from models import define_model
+                network = define_model(
+                                        reg = self.reg, 
+                                        conv_number = self.conv_number, 
+                                        column_range = self.column_range, 
+                                        offset = self.offset, 
+                                        initial_height = self.initial_height, 
+                                        dice_value = self.dice_value
+                                        )
+                if player1_weights != None:
+                    player1.network = network
+                    player1.network.set_weights(player1_weights)
+                else:
+                    player2.network = network
+                    player2.network.set_weights(player2_weights)
+
+        if type_of_game == 's' and player1.evaluation_cache is not None:
+            # Every selfplay game of this process uses the same weights, so
+            # both players and all the games share the evaluations.
+            player1.evaluation_cache = worker_cache(
+                                        player1.evaluation_cache_size)
+            player2.evaluation_cache = player1.evaluation_cache
 
         data_of_a_game = []
+        rng = None
+        if game_seed is not None:
+            dice_seed, player1_seed, player2_seed = game_seed.spawn(3)
+            rng = np.random.default_rng(dice_seed)
+            player1.seed(player1_seed)
+            player2.seed(player2_seed)
         game = Game(self.n_players, self.dice_number, self.dice_value, 
-                    self.column_range, self.offset, self.initial_height)
+                    self.column_range, self.offset, self.initial_height, rng)
 
         is_over = False
         rounds = 0
@@ -248,16 +352,22 @@ class Experiment:
 
         copy_model = current_model.clone()
 
-        # ProcessPoolExecutor() will take care of joining() and closing()
-        # the processes after they are finished.
-        with ProcessPoolExecutor(max_workers=self.n_cores) as executor:
-            # Specify which arguments will be used for each parallel call
-            args = (
-                    (current_model, copy_model, 's', current_weights, None) 
-                    for _ in range(n_games)
-                    )
-            # data is a list of 2-tuples = (data_of_a_game, who_won) 
-            results = executor.map(self._play_single_game, args)
+        server = self._start_inference_server([current_weights])
+        try:
+            # ProcessPoolExecutor() will take care of joining() and closing()
+            # the processes after they are finished.
+            with self._game_executor(server) as executor:
+                # Specify which arguments will be used for each parallel call
+                args = (
+                        (current_model, copy_model, 's', current_weights, None,
+                        game_seed) 
+                        for game_seed in self._game_seeds(n_games)
+                        )
+                # data is a list of 2-tuples = (data_of_a_game, who_won) 
+                results = executor.map(self._play_single_game, args)
+        finally:
+            if server is not None:
+                server.shutdown()
         data_of_all_games = []
         for result in results:
             data_of_all_games.append(result)
@@ -408,24 +518,39 @@ class Experiment:
         old_model = current_model.clone()
         # We do n_games//2 parallel games. Each of the operations we switch 
         # who is the first player to avoid first player winning bias.
+        # Both halves use the same seeds, so each pair of games with swapped
+        # sides sees the same dice (common random numbers).
+        game_seeds = self._game_seeds(n_games_evaluate//2)
+
+        server = self._start_inference_server([cur_weights, old_weights])
+        try:
+            # ProcessPoolExecutor() will take care of joining() and closing()
+            # the processes after they are finished.
+            with self._game_executor(server) as executor:
+                # Specify which arguments will be used for each parallel call
+                args = (
+                        (current_model, old_model, 'en', cur_weights,
+                        old_weights, game_seed) 
+                        for game_seed in game_seeds
+                        )
+                results_1 = executor.map(self._play_single_game, args)
+        finally:
+            if server is not None:
+                server.shutdown()
 
-        # ProcessPoolExecutor() will take care of joining() and closing()
-        # the processes after they are finished.
-        with ProcessPoolExecutor(max_workers=self.n_cores) as executor:
-            # Specify which arguments will be used for each parallel call
-            args = (
-                    (current_model, old_model, 'en', cur_weights, old_weights) 
-                    for _ in range(n_games_evaluate//2)
-                    )
-            results_1 = executor.map(self._play_single_game, args)
-
-        with ProcessPoolExecutor(max_workers=self.n_cores) as executor:
-            # Specify which arguments will be used for each parallel call
-            args = (
-                    (old_model, current_model, 'en', old_weights, cur_weights) 
-                    for _ in range(n_games_evaluate//2)
-                    )   
-            results_2 = executor.map(self._play_single_game, args)
+        server = self._start_inference_server([old_weights, cur_weights])
+        try:
+            with self._game_executor(server) as executor:
+                # Specify which arguments will be used for each parallel call
+                args = (
+                        (old_model, current_model, 'en', old_weights,
+                        cur_weights, game_seed) 
+                        for game_seed in game_seeds
+                        )   
+                results_2 = executor.map(self._play_single_game, args)
+        finally:
+            if server is not None:
+                server.shutdown()
         
         for result in results_1:
             if result[1] == 1:
@@ -778,19 +903,23 @@ class Experiment:
             start_evaluate_uct = time.time()
             # We do n_games//2 parallel games. Each of the operations we switch 
             # who is the first player to avoid first player winning bias.
+            # Both halves use the same seeds (common random numbers).
+            game_seeds = self._game_seeds(n_games_evaluate//2)
             with ProcessPoolExecutor(max_workers=self.n_cores) as executor:
             # Specify which arguments will be used for each parallel call
                 args = (
-                        (network, UCTs_eval[ucts], 'eu', weights, None) 
-                        for _ in range(n_games_evaluate//2)
+                        (network, UCTs_eval[ucts], 'eu', weights, None,
+                        game_seed) 
+                        for game_seed in game_seeds
                         )
                 results_1 = executor.map(self._play_single_game, args)
 
             with ProcessPoolExecutor(max_workers=self.n_cores) as executor:
                 # Specify which arguments will be used for each parallel call
                 args = (
-                        (UCTs_eval[ucts], network, 'eu', None, weights) 
-                        for _ in range(n_games_evaluate//2)
+                        (UCTs_eval[ucts], network, 'eu', None, weights,
+                        game_seed) 
+                        for game_seed in game_seeds
                         )   
                 results_2 = executor.map(self._play_single_game, args)
 
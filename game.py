@@ -1,7 +1,195 @@
 import numpy as np
 import random
 import copy
-import pickle
+import itertools
+from random_streams import DiceStream
+
+# Cache of the tables built by combination_table(), one per dice_value.
+_combination_tables = {}
+
+def combination_table(dice_value):
+    """
+    Return a dict mapping every possible roll of 4 dice (as returned by
+    Game.roll_dice) to the distinct ways of pairing its dice. Each pairing
+    is a 3-tuple (first_bit, second_bit, outcomes):
+    - first_bit and second_bit are the column bitmasks (1 << column) of the
+      two pair sums, the smallest sum first.
+    - outcomes is a list of 8 tuples of moves indexed by
+      4 * tuple_available + 2 * first_available + second_available, where
+      tuple_available means both sums can be played together and
+      first/second_available means that sum can be played alone (same
+      semantics as check_tuple_availability and check_value_availability).
+    The table is built once per dice_value and shared by every game.
+    """
+
+    if dice_value in _combination_tables:
+        return _combination_tables[dice_value]
+
+    table = {}
+    pairings_of_multiset = {}
+    faces = range(1, dice_value + 1)
+    for roll in [(a, b, c, d) for a in faces for b in faces
+                    for c in faces for d in faces]:
+        multiset = tuple(sorted(roll))
+        if multiset not in pairings_of_multiset:
+            pairs = []
+            for comb in [(roll[0] + roll[1], roll[2] + roll[3]),
+                            (roll[0] + roll[2], roll[1] + roll[3]),
+                            (roll[0] + roll[3], roll[1] + roll[2])]:
+                comb = (min(comb), max(comb))
+                if comb not in pairs:
+                    pairs.append(comb)
+            pairings = []
+            for comb in pairs:
+                outcomes = []
+                for code in range(8):
+                    tuple_available = code & 4
+                    first_available = code & 2
+                    second_available = code & 1
+                    moves = []
+                    if tuple_available:
+                        moves.append(comb)
+                    elif first_available and second_available:
+                        moves.append((comb[0],))
+                        if comb[1] != comb[0]:
+                            moves.append((comb[1],))
+                    if first_available and not second_available:
+                        moves.append((comb[0],))
+                    if second_available and not first_available:
+                        moves.append((comb[1],))
+                    outcomes.append(tuple(moves))
+                pairings.append((1 << comb[0], 1 << comb[1], outcomes))
+            pairings_of_multiset[multiset] = tuple(pairings)
+        table[roll] = pairings_of_multiset[multiset]
+
+    _combination_tables[dice_value] = table
+    return table
+
+def column_heights(column_range, offset, initial_height):
+    """
+    Return a list where the i-th element is the number of cells of
+    column i. Same layout used by Board.
+    """
+
+    heights = [0] * (column_range[1] + 1)
+    height = initial_height
+    for x in range(column_range[0], column_range[1]+1):
+        heights[x] = height
+        if x < column_range[1]/2 +1:
+            height += offset
+        else:
+            height -= offset
+    return heights
+
+class ZobristKeys:
+    def __init__(self, n_players, dice_number, dice_value, column_range,
+                    offset, initial_height):
+        """
+        Random 64-bit keys of the Zobrist hash of a game (see
+        Game.zobrist_hash). They are drawn from a generator with a fixed
+        seed, so a given configuration always gets the same keys, in every
+        process.
+        - markers[marker][column][cell] is the key of 'marker' (0 is the
+          neutral marker) being the furthest marker of its kind in 'column'.
+        - won[column] is the key of 'column' being in player_won_column.
+        - finished[column][player] is the key of 'column' having been won
+          by 'player'.
+        - turn[player] is the key of being 'player's turn.
+        - dice_action is the key of dice_action being True.
+        - neutral_count[n] is the key of n_neutral_markers being n.
+        - rolls maps every roll to a key that only depends on the dice
+          values, not on their order.
+        """
+
+        generator = random.Random(0)
+        heights = column_heights(column_range, offset, initial_height)
+        self.markers = [[[generator.getrandbits(64)
+                            for _ in range(heights[column])]
+                            for column in range(len(heights))]
+                            for _ in range(n_players + 1)]
+        self.won = [generator.getrandbits(64) for _ in range(len(heights))]
+        self.finished = [[generator.getrandbits(64)
+                            for _ in range(n_players + 1)]
+                            for _ in range(len(heights))]
+        self.turn = [generator.getrandbits(64) for _ in range(n_players + 1)]
+        self.dice_action = generator.getrandbits(64)
+        # n_neutral_markers can go beyond 3 (see Game.play), but never beyond
+        # two per column.
+        self.neutral_count = [generator.getrandbits(64)
+                                for _ in range(2 * len(heights) + 1)]
+        self.rolls = {}
+        multiset_keys = {}
+        for roll in itertools.product(range(1, dice_value + 1),
+                                        repeat=dice_number):
+            multiset = tuple(sorted(roll))
+            if multiset not in multiset_keys:
+                multiset_keys[multiset] = generator.getrandbits(64)
+            self.rolls[roll] = multiset_keys[multiset]
+
+# Cache of the keys built by zobrist_keys(), one per game configuration.
+_zobrist_keys = {}
+
+def zobrist_keys(game):
+    """Return the ZobristKeys of the configuration of 'game'."""
+
+    configuration = (game.n_players, game.dice_number, game.dice_value,
+                        game.column_range[0], game.column_range[1],
+                        game.offset, game.initial_height)
+    if configuration not in _zobrist_keys:
+        _zobrist_keys[configuration] = ZobristKeys(game.n_players,
+                                                    game.dice_number,
+                                                    game.dice_value,
+                                                    game.column_range,
+                                                    game.offset,
+                                                    game.initial_height
+                                                    )
+    return _zobrist_keys[configuration]
+
+# Cache of the dtypes built by state_dtype(), one per layout.
+_state_dtypes = {}
+
+def state_dtype(n_players, dice_number, column_range):
+    """
+    Return the NumPy structured dtype of a game state encoded by
+    Game.to_bytes. Every field is made of uint8, so a state takes
+    3 + dice_number + (n_players + 3) * n_columns bytes (62 on the
+    original 2-12 board):
+    - player_turn, dice_action and n_neutral_markers.
+    - current_roll is the dice roll.
+    - positions[marker][i] is the cell index + 1 of 'marker' (0 is the
+      neutral marker) in column column_range[0] + i, 0 if absent. A
+      finished column only holds its winner's marker, at its last cell.
+    - finished[i] is the player who won column column_range[0] + i, 0 if
+      the column is not finished.
+    - won[i] is 1 if the column is in player_won_column, 0 otherwise.
+    """
+
+    key = (n_players, dice_number, column_range[0], column_range[1])
+    if key not in _state_dtypes:
+        n_columns = column_range[1] - column_range[0] + 1
+        _state_dtypes[key] = np.dtype([
+                                ('player_turn', np.uint8),
+                                ('dice_action', np.uint8),
+                                ('n_neutral_markers', np.uint8),
+                                ('current_roll', np.uint8, (dice_number,)),
+                                ('positions', np.uint8,
+                                    (n_players + 1, n_columns)),
+                                ('finished', np.uint8, (n_columns,)),
+                                ('won', np.uint8, (n_columns,))])
+    return _state_dtypes[key]
+
+def decode_states(data, n_players, dice_number, column_range):
+    """
+    Return a NumPy structured array (see state_dtype) of the states encoded
+    in 'data', a bytes-like object holding the concatenation of any number
+    of Game.to_bytes (or CompactGame.to_bytes) of the same configuration.
+    The array is a view of 'data': decoding is a single call whatever the
+    number of states, and every field is available as an array
+    (e.g. states['positions'] has shape (N, n_players + 1, n_columns)).
+    """
+
+    return np.frombuffer(data, dtype=state_dtype(n_players, dice_number,
+                                                    column_range))
 
 class Cell:
     def __init__(self):
@@ -13,11 +201,21 @@ class Cell:
 
         self.markers = []
 
+    def clone(self):
+        """Return a copy of this cell."""
+
+        copy_cell = Cell.__new__(Cell)
+        copy_cell.markers = self.markers[:]
+        return copy_cell
+
 class Board:
     def __init__(self, column_range, offset, initial_height):
         """
         First two columns are unused.
         Used columns vary from range 2 to 12 (inclusive).
+        Columns are shared between clones (copy-on-write): shared_columns[x]
+        is True if column x may be referenced by another Board, in which case
+        it must be copied before being modified (see writable_column).
         """
 
         self.column_range = column_range
@@ -33,6 +231,49 @@ class Board:
                 height += self.offset
             else:
                 height -= self.offset
+        self.shared_columns = [False] * len(self.board)
+
+    def clone(self):
+        """
+        Return a copy of this board. Columns are only copied when one of the
+        boards modifies them.
+        """
+
+        copy_board = Board.__new__(Board)
+        copy_board.column_range = self.column_range
+        copy_board.offset = self.offset
+        copy_board.initial_height = self.initial_height
+        copy_board.board = self.board[:]
+        self.shared_columns = [True] * len(self.board)
+        copy_board.shared_columns = [True] * len(self.board)
+        return copy_board
+
+    def snapshot_columns(self):
+        """
+        Return a list with the current columns of the board. The columns are
+        marked as shared, so they are not modified by later plays and can be
+        put back with restore_columns.
+        """
+
+        self.shared_columns = [True] * len(self.board)
+        return self.board[:]
+
+    def restore_columns(self, columns):
+        """Put back the columns returned by snapshot_columns."""
+
+        self.board = columns[:]
+        self.shared_columns = [True] * len(self.board)
+
+    def writable_column(self, column):
+        """
+        Return the list of cells of 'column', copying it first if it is
+        shared with another board. Must be used before modifying any marker.
+        """
+
+        if self.shared_columns[column]:
+            self.board[column] = [cell.clone() for cell in self.board[column]]
+            self.shared_columns[column] = False
+        return self.board[column]
 
     def print_board(self, rows):
         """
@@ -72,7 +313,7 @@ class Board:
 
 class Game:
     def __init__(self, n_players, dice_number, dice_value, column_range,
-                    offset, initial_height):
+                    offset, initial_height, rng=None):
         """
         - n_players is the number of players (only 2 is possible).
         - dice_number is the number of dice used in the Can't Stop game.
@@ -93,6 +334,29 @@ class Game:
         - neutral_positions is a 2-tuple storing where the neutral markers are
           stored in the board (column index, cell index).
         - current_roll refers to all dice_number dice roll.
+        - finished_columns_mask, player_won_column_mask and
+          neutral_columns_mask are bitmasks (bit i = column i) of the
+          columns in finished_columns, in player_won_column and holding a
+          neutral marker. They are kept up to date by play(),
+          transform_neutral_markers() and is_player_busted() and are used
+          by available_moves(), check_value_availability(),
+          check_tuple_availability() and is_player_busted().
+        - n_won_columns is a list where n_won_columns[player] is the number
+          of columns in finished_columns won by 'player' (index 0 unused).
+        - winner is the player who won the game, 0 if the game is not over.
+          Both are updated by transform_neutral_markers() so is_finished()
+          does not have to count finished_columns.
+        - zobrist_hash is a 64-bit hash of the position (markers, finished
+          columns, player_won_column, player_turn, dice_action and
+          n_neutral_markers; the current roll is left out, see hash_key).
+          It is updated incrementally by play(), transform_neutral_markers(),
+          erase_neutral_markers() and is_player_busted(). Games on the same
+          configuration in the same position have the same hash, whichever
+          engine (Game or CompactGame) they use.
+        - dice_stream is the DiceStream (random_streams.py) the dice are
+          rolled from when 'rng' (a numpy.random.Generator) is given, None
+          otherwise (the random module is used). Clones roll from the
+          simulation stream of dice_stream (see DiceStream.clone_stream).
         """
 
         self.n_players = n_players
@@ -108,10 +372,21 @@ class Game:
         self.finished_columns = []
         self.player_won_column = []
         self.dice_action = True
+        self.dice_stream = None
+        if rng is not None:
+            self.dice_stream = DiceStream(dice_number, dice_value, rng)
         self.current_roll = self.roll_dice()
         self.n_neutral_markers = 0
         self.neutral_positions = []
         self.actions_taken = [] 
+        self.finished_columns_mask = 0
+        self.player_won_column_mask = 0
+        self.neutral_columns_mask = 0
+        self.n_won_columns = [0] * (self.n_players + 1)
+        self.winner = 0
+        keys = zobrist_keys(self)
+        self.zobrist_hash = keys.turn[self.player_turn] ^ keys.dice_action \
+                            ^ keys.neutral_count[0]
     
     def check_boardgame_equality(self, game):
         """ Check if self and 'game' represents the same state."""
@@ -164,9 +439,147 @@ class Game:
         self.board_game.print_board(self.player_won_column)
 
     def clone(self):
-        """Return a "deepcopy" of this game. Used for MCTS routines."""
-        
-        return pickle.loads(pickle.dumps(self, -1))
+        """
+        Return a "deepcopy" of this game. Used for MCTS routines.
+        The board columns are copied lazily (see Board.writable_column).
+        """
+
+        copy_game = Game.__new__(Game)
+        copy_game.__dict__.update(self.__dict__)
+        copy_game.board_game = self.board_game.clone()
+        copy_game.finished_columns = self.finished_columns[:]
+        copy_game.player_won_column = self.player_won_column[:]
+        copy_game.neutral_positions = self.neutral_positions[:]
+        copy_game.actions_taken = self.actions_taken[:]
+        copy_game.n_won_columns = self.n_won_columns[:]
+        if self.dice_stream is not None:
+            copy_game.dice_stream = self.dice_stream.clone_stream()
+        return copy_game
+
+    def to_bytes(self):
+        """
+        Return the state of the game as a fixed-size bytes object (see
+        state_dtype), a few dozen bytes instead of the kilobytes of a
+        pickle of the Board and its Cell objects. The configuration,
+        actions_taken and dice_stream are not encoded. Game and CompactGame
+        produce the same bytes for the same state.
+        """
+
+        first, last = self.column_range
+        n_columns = last - first + 1
+        positions = [0] * ((self.n_players + 1) * n_columns)
+        finished = [0] * n_columns
+        won = [0] * n_columns
+        for column, player in self.finished_columns:
+            finished[column - first] = player
+        for column, _ in self.player_won_column:
+            won[column - first] = 1
+        for x in range(first, last + 1):
+            list_of_cells = self.board_game.board[x]
+            if finished[x - first]:
+                positions[finished[x - first] * n_columns + x - first] = \
+                                                        len(list_of_cells)
+                continue
+            for i in range(len(list_of_cells)):
+                for marker in list_of_cells[i].markers:
+                    positions[marker * n_columns + x - first] = i + 1
+        return bytes([self.player_turn, self.dice_action,
+                        self.n_neutral_markers, *self.current_roll]
+                        + positions + finished + won)
+
+    @classmethod
+    def from_bytes(cls, data, n_players, dice_number, dice_value,
+                    column_range, offset, initial_height, rng=None,
+                    base=None):
+        """
+        Return a Game of the given configuration in the state encoded in
+        'data' by to_bytes. 'rng' has the same meaning as in __init__.
+        neutral_positions, finished_columns and player_won_column are
+        listed in column order and actions_taken is empty.
+        'base' is None or a Game of the same configuration, usually a close
+        state (the parent of a tree node). Its columns holding the same
+        markers as in 'data' are shared with it (copy-on-write, see Board)
+        instead of being rebuilt, which saves most of the memory of a new
+        Board.
+        """
+
+        game = cls.__new__(cls)
+        game.n_players = n_players
+        game.dice_number = dice_number
+        game.dice_value = dice_value
+        game.column_range = column_range
+        game.offset = offset
+        game.initial_height = initial_height
+        if base is None:
+            game.board_game = Board(column_range, offset, initial_height)
+        else:
+            game.board_game = base.board_game.clone()
+        game.player_turn = data[0]
+        game.dice_action = bool(data[1])
+        game.n_neutral_markers = data[2]
+        game.current_roll = tuple(data[3:3 + dice_number])
+        game.dice_stream = None
+        if rng is not None:
+            game.dice_stream = DiceStream(dice_number, dice_value, rng)
+        game.finished_columns = []
+        game.player_won_column = []
+        game.neutral_positions = []
+        game.actions_taken = []
+        game.finished_columns_mask = 0
+        game.player_won_column_mask = 0
+        game.neutral_columns_mask = 0
+        game.n_won_columns = [0] * (n_players + 1)
+
+        first, last = column_range
+        n_columns = last - first + 1
+        start = 3 + dice_number
+        positions = data[start:start + (n_players + 1) * n_columns]
+        start += (n_players + 1) * n_columns
+        finished = data[start:start + n_columns]
+        won = data[start + n_columns:start + 2 * n_columns]
+        if base is not None:
+            base_data = base.to_bytes()
+            base_positions = base_data[3 + dice_number:start]
+            base_finished = base_data[start:start + n_columns]
+        for i in range(n_columns):
+            x = first + i
+            list_of_cells = game.board_game.board[x]
+            # The markers of a column shared with 'base' are already set.
+            set_markers = True
+            if base is not None:
+                if positions[i::n_columns] == base_positions[i::n_columns] \
+                    and finished[i] == base_finished[i]:
+                    set_markers = False
+                else:
+                    list_of_cells = [Cell() for _ in list_of_cells]
+                    game.board_game.board[x] = list_of_cells
+                    game.board_game.shared_columns[x] = False
+            if finished[i]:
+                game.finished_columns.append((x, finished[i]))
+                game.finished_columns_mask |= 1 << x
+                game.n_won_columns[finished[i]] += 1
+                if set_markers:
+                    for cell in list_of_cells:
+                        cell.markers.append(finished[i])
+                continue
+            if won[i]:
+                game.player_won_column.append((x, game.player_turn))
+                game.player_won_column_mask |= 1 << x
+            for marker in range(n_players + 1):
+                position = positions[marker * n_columns + i]
+                if position:
+                    if set_markers:
+                        list_of_cells[position - 1].markers.append(marker)
+                    if marker == 0:
+                        game.neutral_positions.append((x, position - 1))
+                        game.neutral_columns_mask |= 1 << x
+        game.winner = 0
+        for player in range(1, n_players + 1):
+            if game.n_won_columns[player] >= 3:
+                game.winner = player
+                break
+        game.zobrist_hash = game.compute_zobrist_hash()
+        return game
     
     def columns_won_current_round(self):
         """
@@ -177,6 +590,107 @@ class Game:
 
         return self.player_won_column
 
+    def undo_token(self):
+        """
+        Return an undo token for the current state. Whatever is applied to
+        the game afterwards (play, transform_neutral_markers,
+        erase_neutral_markers, a bust in is_player_busted or a new
+        current_roll) is reverted by unmake(token), including the rolls
+        drawn from dice_stream, so probing moves does not change the dice
+        of a seeded game. Clones never take their rolls back (see
+        DiceStream.position), nor do unseeded games, which roll with the
+        random module. The board columns are not copied, they are shared
+        until modified (see Board).
+        """
+
+        return (self.board_game.snapshot_columns(), self.player_turn,
+                self.dice_action, self.current_roll, self.n_neutral_markers,
+                self.neutral_positions[:], self.finished_columns[:],
+                self.player_won_column[:], self.finished_columns_mask,
+                self.player_won_column_mask, self.neutral_columns_mask,
+                self.n_won_columns[:], self.winner, self.zobrist_hash,
+                None if self.dice_stream is None
+                else self.dice_stream.position())
+
+    def unmake(self, token):
+        """
+        Revert the game to the state 'token' was taken from. Tokens may be
+        used several times, and nested tokens should be undone in the
+        reverse order they were made.
+        """
+
+        (columns, self.player_turn, self.dice_action, self.current_roll,
+            self.n_neutral_markers, neutral_positions, finished_columns,
+            player_won_column, self.finished_columns_mask,
+            self.player_won_column_mask, self.neutral_columns_mask,
+            n_won_columns, self.winner, self.zobrist_hash,
+            dice_position) = token
+        if dice_position is not None:
+            self.dice_stream.restore(dice_position)
+        self.board_game.restore_columns(columns)
+        self.neutral_positions = neutral_positions[:]
+        self.finished_columns = finished_columns[:]
+        self.player_won_column = player_won_column[:]
+        self.n_won_columns = n_won_columns[:]
+
+    def make_move(self, chosen_play):
+        """
+        Apply "chosen_play" to the game (see play) and return the undo token
+        that reverts it (see unmake).
+        """
+
+        token = self.undo_token()
+        self.play(chosen_play)
+        return token
+
+    def make_roll(self, roll):
+        """
+        Replace the current dice roll by 'roll' and return the undo token
+        that reverts it (see unmake).
+        """
+
+        token = self.undo_token()
+        self.current_roll = roll
+        return token
+
+    def hash_key(self, include_roll=False):
+        """
+        Return the Zobrist hash of the current position. If include_roll is
+        True, the current dice roll (regardless of the dice order) is also
+        taken into account.
+        """
+
+        if include_roll:
+            return self.zobrist_hash ^ zobrist_keys(self).rolls[
+                                                        self.current_roll]
+        return self.zobrist_hash
+
+    def compute_zobrist_hash(self):
+        """
+        Return the Zobrist hash of the current position computed from
+        scratch. It is always equal to zobrist_hash, which is maintained
+        incrementally instead.
+        """
+
+        keys = zobrist_keys(self)
+        zobrist_hash = keys.turn[self.player_turn] \
+                        ^ keys.neutral_count[self.n_neutral_markers]
+        if self.dice_action:
+            zobrist_hash ^= keys.dice_action
+        finished = dict(self.finished_columns)
+        for x in range(self.column_range[0], self.column_range[1]+1):
+            list_of_cells = self.board_game.board[x]
+            if x in finished:
+                zobrist_hash ^= keys.finished[x][finished[x]] \
+                        ^ keys.markers[finished[x]][x][len(list_of_cells) - 1]
+                continue
+            for i in range(len(list_of_cells)):
+                for marker in list_of_cells[i].markers:
+                    zobrist_hash ^= keys.markers[marker][x][i]
+        for column_won in self.player_won_column:
+            zobrist_hash ^= keys.won[column_won[0]]
+        return zobrist_hash
+
     def play(self, chosen_play):
         """
         Apply the "chosen_play" to the game.
@@ -186,14 +700,19 @@ class Game:
         #print('board do iniciao - chosen play = ', chosen_play)
         #print('player turn = ', self.player_turn)
         #self.print_board()
+        keys = zobrist_keys(self)
         if chosen_play == 'n':
             self.transform_neutral_markers()
             # Next action should be to choose a dice combination
+            if not self.dice_action:
+                self.zobrist_hash ^= keys.dice_action
             self.dice_action = True
             #print('escolheu nao')
             return
         if chosen_play == 'y':
             # Next action should be to choose a dice combination
+            if not self.dice_action:
+                self.zobrist_hash ^= keys.dice_action
             self.dice_action = True
             #print('escolheu ism')
             return
@@ -204,7 +723,7 @@ class Game:
             current_position_zero = -1
             current_position_id = -1
             col = chosen_play[die_position]
-            cell_list = self.board_game.board[col]
+            cell_list = self.board_game.writable_column(col)
             for i in range(0, len(cell_list)):
                 if 0 in cell_list[i].markers:
                     #print('descobriu um 0')
@@ -219,30 +738,50 @@ class Game:
             # If there's no zero and no player_id marker
             if current_position_zero == current_position_id == -1:
                 cell_list[0].markers.append(0)
+                self.zobrist_hash ^= \
+                        keys.neutral_count[self.n_neutral_markers] \
+                        ^ keys.neutral_count[self.n_neutral_markers + 1]
                 self.n_neutral_markers += 1
                 self.neutral_positions.append((col, 0))
+                self.neutral_columns_mask |= 1 << col
+                self.zobrist_hash ^= keys.markers[0][col][0]
             # If there's no zero but there is player id marker
             elif current_position_zero == -1:
                 #First check if the player will win that column
+                self.zobrist_hash ^= \
+                        keys.neutral_count[self.n_neutral_markers] \
+                        ^ keys.neutral_count[self.n_neutral_markers + 1]
                 self.n_neutral_markers += 1
                 if current_position_id == len(cell_list) - 1:
                     if (col, self.player_turn) not in self.player_won_column:
                         self.player_won_column.append((col, self.player_turn))
+                        self.player_won_column_mask |= 1 << col
+                        self.zobrist_hash ^= keys.won[col]
                 else:
                     cell_list[current_position_id+1].markers.append(0)
                     self.neutral_positions.append((col, current_position_id+1))
+                    self.neutral_columns_mask |= 1 << col
+                    self.zobrist_hash ^= \
+                                keys.markers[0][col][current_position_id+1]
             # If there's zero    
             else:
                 #First check if the player will win that column
                 if current_position_zero == len(cell_list) - 1:
                     if (col, self.player_turn) not in self.player_won_column:
                         self.player_won_column.append((col, self.player_turn))
+                        self.player_won_column_mask |= 1 << col
+                        self.zobrist_hash ^= keys.won[col]
                 else:
                     cell_list[current_position_zero].markers.remove(0)
                     cell_list[current_position_zero+1].markers.append(0)
                     self.neutral_positions.remove((col, current_position_zero))
                     self.neutral_positions.append((col, current_position_zero+1))
+                    self.zobrist_hash ^= \
+                                keys.markers[0][col][current_position_zero] \
+                                ^ keys.markers[0][col][current_position_zero+1]
         # Next action should be [y,n]
+        if self.dice_action:
+            self.zobrist_hash ^= keys.dice_action
         self.dice_action = False
         # Then a new dice roll is done (same is done if the player is busted)
         self.current_roll = self.roll_dice()
@@ -251,17 +790,23 @@ class Game:
     def transform_neutral_markers(self):
         """Transform the neutral markers into player_id markers (1 or 2)."""
 
+        keys = zobrist_keys(self)
         for neutral in self.neutral_positions:
-            markers = self.board_game.board[neutral[0]][neutral[1]].markers
+            col_cell_list = self.board_game.writable_column(neutral[0])
+            markers = col_cell_list[neutral[1]].markers
             for i in range(len(markers)):
                 if markers[i] == 0:
                     markers[i] = self.player_turn
+            self.zobrist_hash ^= \
+                        keys.markers[0][neutral[0]][neutral[1]] \
+                        ^ keys.markers[self.player_turn][neutral[0]][neutral[1]]
             # Remove the previous player_turn id in order to keep only the
             # the furthest one
-            col_cell_list = self.board_game.board[neutral[0]]
             for i in range(neutral[1]-1, -1, -1):
                 if self.player_turn in col_cell_list[i].markers:
                     col_cell_list[i].markers.remove(self.player_turn)
+                    self.zobrist_hash ^= \
+                                keys.markers[self.player_turn][neutral[0]][i]
                     break
 
         # Special case example: Player 1 is about to win, for ex. column 7 
@@ -275,31 +820,63 @@ class Game:
 
         for column_won in self.player_won_column:
             self.finished_columns.append((column_won[0], column_won[1]))
-            for cell in self.board_game.board[column_won[0]]:
+            self.n_won_columns[column_won[1]] += 1
+            col_cell_list = self.board_game.writable_column(column_won[0])
+            # For hashing purposes, a won column only holds the winner's
+            # marker at its last cell.
+            for i in range(len(col_cell_list)):
+                for marker in col_cell_list[i].markers:
+                    self.zobrist_hash ^= keys.markers[marker][column_won[0]][i]
+            self.zobrist_hash ^= \
+                keys.markers[self.player_turn][column_won[0]][
+                                                    len(col_cell_list) - 1] \
+                ^ keys.finished[column_won[0]][column_won[1]] \
+                ^ keys.won[column_won[0]]
+            for cell in col_cell_list:
                 cell.markers.clear()
                 cell.markers.append(self.player_turn)
 
         self.player_won_column.clear()
+        self.finished_columns_mask |= self.player_won_column_mask
+        # Same order as the previous column count: player 1 is checked first.
+        for player in range(1, self.n_players + 1):
+            if self.n_won_columns[player] >= 3:
+                self.winner = player
+                break
+        self.player_won_column_mask = 0
 
+        self.zobrist_hash ^= keys.turn[self.player_turn]
         if self.player_turn == self.n_players:
             self.player_turn = 1
         else:
             self.player_turn += 1
+        self.zobrist_hash ^= keys.turn[self.player_turn]
 
+        self.zobrist_hash ^= \
+                keys.neutral_count[self.n_neutral_markers] \
+                ^ keys.neutral_count[0]
         self.n_neutral_markers = 0
         self.neutral_positions = []
+        self.neutral_columns_mask = 0
 
 
     def erase_neutral_markers(self):
         """Remove the neutral markers because the player is busted."""
 
+        keys = zobrist_keys(self)
         for neutral in self.neutral_positions:
-            markers = self.board_game.board[neutral[0]][neutral[1]].markers
+            markers = self.board_game.writable_column(
+                                        neutral[0])[neutral[1]].markers
             if 0 in markers:
                 markers.remove(0)
+                self.zobrist_hash ^= keys.markers[0][neutral[0]][neutral[1]]
 
+        self.zobrist_hash ^= \
+                keys.neutral_count[self.n_neutral_markers] \
+                ^ keys.neutral_count[0]
         self.n_neutral_markers = 0
         self.neutral_positions = []
+        self.neutral_columns_mask = 0
 
 
     def count_neutral_markers(self):
@@ -319,11 +896,17 @@ class Game:
         	return False
         if len(all_moves) == 0:
             self.erase_neutral_markers()
+            keys = zobrist_keys(self)
+            for column_won in self.player_won_column:
+                self.zobrist_hash ^= keys.won[column_won[0]]
             self.player_won_column.clear()
+            self.player_won_column_mask = 0
+            self.zobrist_hash ^= keys.turn[self.player_turn]
             if self.player_turn == self.n_players:
                 self.player_turn = 1
             else:
                 self.player_turn += 1
+            self.zobrist_hash ^= keys.turn[self.player_turn]
             # A new dice roll is done (same is done if a play is completed)
             self.current_roll = self.roll_dice()
             return True
@@ -331,16 +914,20 @@ class Game:
             return False
         for move in all_moves:
             for i in range(len(move)):
-                list_of_cells = self.board_game.board[move[i]]
-                for cell in list_of_cells:
-                    if 0 in cell.markers:
-                        return False
+                if self.neutral_columns_mask & (1 << move[i]):
+                    return False
         self.erase_neutral_markers()
+        keys = zobrist_keys(self)
+        for column_won in self.player_won_column:
+            self.zobrist_hash ^= keys.won[column_won[0]]
         self.player_won_column.clear()
+        self.player_won_column_mask = 0
+        self.zobrist_hash ^= keys.turn[self.player_turn]
         if self.player_turn == self.n_players:
             self.player_turn = 1
         else:
             self.player_turn += 1
+        self.zobrist_hash ^= keys.turn[self.player_turn]
         # A new dice roll is done (same is done if a play is completed)
         self.current_roll = self.roll_dice()
         return True
@@ -349,6 +936,8 @@ class Game:
     def roll_dice(self):
         """Return a tuple with integers representing the dice roll."""
 
+        if self.dice_stream is not None:
+            return self.dice_stream.roll()
         my_list = []
         for _ in range(0,self.dice_number):
           my_list.append(random.randrange(1,self.dice_value+1))
@@ -363,27 +952,16 @@ class Game:
         """
 
         #First check if the column 'value' is already completed
-        for tuple_finished in self.finished_columns:
-            if tuple_finished[0] == tuple[0] or tuple_finished[0] == tuple[1]:
-                return False
-        for tuple_column in self.player_won_column:
-            if tuple_column[0] == tuple[0] or tuple_column[0] == tuple[1]:
-                return False
+        closed_mask = self.finished_columns_mask | self.player_won_column_mask
+        if closed_mask & (1 << tuple[0] | 1 << tuple[1]):
+            return False
 
         # Variables to store if there is a neutral marker in tuples columns.
-        is_first_value_valid = False
-        is_second_value_valid = False
+        is_first_value_valid = self.neutral_columns_mask & (1 << tuple[0]) != 0
+        is_second_value_valid = self.neutral_columns_mask & (1 << tuple[1]) != 0
 
         neutral_markers = self.count_neutral_markers()
 
-        for cell in self.board_game.board[tuple[0]]:
-            if 0 in cell.markers:
-                is_first_value_valid = True
-        
-        for cell in self.board_game.board[tuple[1]]:
-            if 0 in cell.markers:
-                is_second_value_valid = True
-
         if neutral_markers == 0 or neutral_markers == 1:
             return True
         elif neutral_markers == 2:
@@ -411,20 +989,13 @@ class Game:
         """
 
         #First check if the column 'value' is already completed
-        for tuple_finished in self.finished_columns:
-            if tuple_finished[0] == value:
-                return False
-        for tuple_column in self.player_won_column:
-            if tuple_column[0] == value:
-                return False
+        closed_mask = self.finished_columns_mask | self.player_won_column_mask
+        if closed_mask & (1 << value):
+            return False
         
         if self.count_neutral_markers() < 3:
             return True
-        list_of_cells = self.board_game.board[value]
-        for cell in list_of_cells:
-            if 0 in cell.markers:
-                return True
-        return False
+        return self.neutral_columns_mask & (1 << value) != 0
 
 
     def available_moves(self):
@@ -439,31 +1010,45 @@ class Game:
 
         if not self.dice_action:
             return ['y','n']
-        standard_combination = [(self.current_roll[0] + self.current_roll[1], 
-        						self.current_roll[2] + self.current_roll[3]),
-                                (self.current_roll[0] + self.current_roll[2], 
-                                self.current_roll[1] + self.current_roll[3]),
-                                (self.current_roll[0] + self.current_roll[3], 
-                                self.current_roll[1] + self.current_roll[2])]
-        combination = []
-        for comb in standard_combination:
-            first_value_available = self.check_value_availability(comb[0])
-            second_value_available = self.check_value_availability(comb[1])
-            if self.check_tuple_availability(comb):
-                combination.append(comb)
-            elif first_value_available and second_value_available:
-                combination.append((comb[0],))
-                combination.append((comb[1],))
-            if first_value_available and not second_value_available:
-                combination.append((comb[0],))
-            if second_value_available and not first_value_available:
-                combination.append((comb[1],))
-
-        # Remove duplicate actions (Example: dice = (2,6,6,6) will give 
-        # actions = [(8,12), (8,12), (8,12)])
-        # Also remove redundant actions (Example: (8,12) and (12,8))
-
-        return [t for t in {x[::-1] if x[0] > x[-1] else x for x in combination}]
+
+        # The pairings of the roll come from a precomputed table, so only
+        # the availability of their columns has to be checked (see
+        # combination_table).
+        neutral_markers = self.n_neutral_markers
+        neutral_mask = self.neutral_columns_mask
+        open_mask = ~(self.finished_columns_mask | self.player_won_column_mask)
+        if neutral_markers < 3:
+            available_mask = open_mask
+        else:
+            available_mask = open_mask & neutral_mask
+
+        moves = []
+        for first_bit, second_bit, outcomes in \
+            combination_table(self.dice_value)[self.current_roll]:
+            pair_mask = first_bit | second_bit
+            if (open_mask & pair_mask) != pair_mask:
+                code = 0
+            elif neutral_markers < 2:
+                code = 4
+            elif neutral_markers == 2:
+                if (neutral_mask & pair_mask) or first_bit == second_bit:
+                    code = 4
+                else:
+                    code = 0
+            elif (neutral_mask & pair_mask) == pair_mask:
+                code = 4
+            else:
+                code = 0
+            if available_mask & first_bit:
+                code += 2
+            if available_mask & second_bit:
+                code += 1
+            # Remove duplicate actions (Example: dice = (2,6,6,6) will give
+            # actions = [(8,12), (8,12), (8,12)])
+            for move in outcomes[code]:
+                if move not in moves:
+                    moves.append(move)
+        return moves
 
     def is_finished(self):
         """
@@ -472,18 +1057,6 @@ class Game:
         game is over or not.
         """
 
-        won_columns_player_1 = 0
-        won_columns_player_2 = 0
-        for tuples in self.finished_columns:
-            if tuples[1] == 1:
-                won_columns_player_1 += 1
-            else:
-                won_columns_player_2 += 1
-        # >= because the player can have 2 columns and win another 2 columns
-        # in one turn.
-        if won_columns_player_1 >= 3:
-            return 1, True
-        elif  won_columns_player_2 >= 3:
-            return 2, True
-        else:
-            return 0, False
+        # >= 3 columns is checked in transform_neutral_markers, the only place
+        # where columns are won.
+        return self.winner, self.winner != 0
@@ -0,0 +1,317 @@
+import multiprocessing
+import queue
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+
+# Client of the InferenceServer in the current worker process, None if the
+# process is not a worker of InferenceServer.executor (see worker_client).
+_client = None
+
+# Seconds a client waits for a response before checking that the server
+# process is still running (see InferenceClient.predict).
+LIVENESS_INTERVAL = 1.0
+
+def network_shapes(column_range, offset, initial_height, dice_value):
+    """
+    Return the shape of the state channels of a single position and the
+    number of actions of the networks of models.define_model.
+    """
+
+    height = column_range[1] - column_range[0] + 1
+    longest_column = (column_range[1] // 2) + 1
+    width = initial_height + offset * (longest_column - column_range[0])
+    temp = len(list(range(2, dice_value * 2 + 1)))
+    n_actions = (temp*(1+temp))//2 + temp + 2
+    return (6, height, width), n_actions
+
+def shared_arrays(buffer, n_clients, max_rows, input_shape, n_actions):
+    """
+    Return the dictionary of the arrays laid out in 'buffer' (the buffer of
+    the SharedMemory of an InferenceServer, or None to only compute its
+    size under the key 'size'). Client i writes the positions of its
+    requests to inputs[i] and valid_actions[i] and reads the predictions in
+    policy[i] and value[i], max_rows positions at most.
+    """
+
+    shapes = {'inputs': (n_clients, max_rows) + tuple(input_shape),
+                'valid_actions': (n_clients, max_rows, n_actions),
+                'policy': (n_clients, max_rows, n_actions),
+                'value': (n_clients, max_rows, 1)}
+    arrays = {}
+    offset = 0
+    for name, shape in shapes.items():
+        if buffer is not None:
+            arrays[name] = np.ndarray(shape, dtype=np.float32, buffer=buffer,
+                                        offset=offset)
+        offset += int(np.prod(shape)) * 4
+    arrays['size'] = offset
+    return arrays
+
+def build_network(network_spec, weights):
+    """
+    Return the network of models.define_model(**network_spec) with
+    'weights', as built by Experiment._play_single_game.
+    """
+
+    from keras import backend as K
+    K.set_image_data_format('channels_first')
+    from models import define_model
+    network = define_model(**network_spec)
+    network.set_weights(weights)
+    return network
+
+def serve(network_spec, weights, memory_name, layout, max_batch_size,
+            max_wait, requests, responses, alive):
+    """
+    Main loop of the server process of InferenceServer. A request is a
+    tuple (client id, network id, number of positions) put in 'requests'
+    once the client wrote its positions in the shared memory. After the
+    first request of a batch, requests are gathered until the batch holds
+    max_batch_size positions, every client is waiting or max_wait seconds
+    passed. Each network then predicts its positions at once, and the
+    clients are told through responses[client id] that their predictions
+    are in the shared memory. If a prediction raises, its clients get the
+    traceback instead and the server keeps serving. None stops the server.
+    - alive is the writing end of a pipe the server never writes to: its
+      clients see the end of the pipe once this process is gone, however
+      it ended (see InferenceClient.predict).
+    """
+
+    networks = [build_network(network_spec, network_weights)
+                for network_weights in weights]
+    memory = shared_memory.SharedMemory(name=memory_name)
+    arrays = shared_arrays(memory.buf, *layout)
+    n_clients = layout[0]
+    stop = False
+    while not stop:
+        request = requests.get()
+        if request is None:
+            break
+        batch = [request]
+        n_rows = request[2]
+        deadline = time.monotonic() + max_wait
+        while n_rows < max_batch_size and len(batch) < n_clients:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                stop = True
+                break
+            batch.append(request)
+            n_rows += request[2]
+        for network_id, network in enumerate(networks):
+            network_batch = [request for request in batch
+                                if request[1] == network_id]
+            if not network_batch:
+                continue
+            inputs = np.concatenate([arrays['inputs'][client][:rows]
+                                    for client, _, rows in network_batch])
+            valid_actions = np.concatenate(
+                                    [arrays['valid_actions'][client][:rows]
+                                    for client, _, rows in network_batch])
+            try:
+                policy, value = network.predict([inputs, valid_actions])
+            except Exception:
+                # A string: an exception may not pickle, and the queue would
+                # then drop it.
+                error = traceback.format_exc()
+                for client, _, _ in network_batch:
+                    responses[client].put(error)
+                continue
+            start = 0
+            for client, _, rows in network_batch:
+                arrays['policy'][client][:rows] = policy[start:start + rows]
+                arrays['value'][client][:rows] = value[start:start + rows]
+                start += rows
+                responses[client].put(rows)
+    del arrays
+    memory.close()
+
+def connect(requests, responses, client_ids, memory_name, layout,
+            server_alive):
+    """
+    Initializer of the worker processes of InferenceServer.executor: take a
+    free client id and attach the shared memory (see worker_client).
+    """
+
+    global _client
+    _client = InferenceClient(requests, responses, client_ids.get(),
+                                memory_name, layout, server_alive)
+
+def worker_client():
+    """
+    Return the InferenceClient of the current process, None if it is not a
+    worker of InferenceServer.executor.
+    """
+
+    return _client
+
+class InferenceServer:
+    def __init__(self, network_spec, weights, n_clients, max_batch_size,
+                    max_wait):
+        """
+        Process owning the networks used by the games played in other
+        processes (self-play workers) and predicting their positions by
+        batches, so that the games in flight share the cost of a
+        prediction and only this process loads the networks. The positions
+        and predictions go through shared memory; the queues only carry the
+        requests and the responses.
+        - network_spec is the dictionary of the arguments of
+          models.define_model.
+        - weights is the list of the weights of the networks served. A
+          client asks for a network by its index in this list.
+        - n_clients is the maximum number of client processes (see
+          executor).
+        - max_batch_size is the maximum number of positions of a batch, and
+          of a single request (see InferenceClient.predict).
+        - max_wait is the maximum time in seconds the server waits for more
+          requests once a batch has started, trading the latency of a
+          prediction for larger batches.
+        """
+
+        input_shape, n_actions = network_shapes(
+                                    network_spec['column_range'],
+                                    network_spec['offset'],
+                                    network_spec['initial_height'],
+                                    network_spec['dice_value'])
+        self.layout = (n_clients, max_batch_size, input_shape, n_actions)
+        self.memory = shared_memory.SharedMemory(
+                            create=True,
+                            size=shared_arrays(None, *self.layout)['size'])
+        self.requests = multiprocessing.Queue()
+        self.responses = [multiprocessing.Queue() for _ in range(n_clients)]
+        self.client_ids = multiprocessing.Queue()
+        for client_id in range(n_clients):
+            self.client_ids.put(client_id)
+        self.server_alive, alive = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(target=serve,
+                                args=(network_spec, weights, self.memory.name,
+                                        self.layout, max_batch_size, max_wait,
+                                        self.requests, self.responses, alive),
+                                daemon=True)
+        self.process.start()
+        # Only the server keeps the writing end, so that its clients see the
+        # pipe close when it ends.
+        alive.close()
+
+    def executor(self, max_workers):
+        """
+        Return a ProcessPoolExecutor whose workers are clients of this
+        server (see worker_client). max_workers cannot be greater than
+        n_clients.
+        """
+
+        return ProcessPoolExecutor(max_workers=max_workers,
+                                    initializer=connect,
+                                    initargs=(self.requests, self.responses,
+                                                self.client_ids,
+                                                self.memory.name,
+                                                self.layout,
+                                                self.server_alive))
+
+    def shutdown(self):
+        """Stop the server process and release the shared memory."""
+
+        self.requests.put(None)
+        self.process.join()
+        self.server_alive.close()
+        self.memory.close()
+        self.memory.unlink()
+
+class InferenceClient:
+    def __init__(self, requests, responses, client_id, memory_name, layout,
+                    server_alive):
+        """
+        Connection of a worker process to an InferenceServer (see connect).
+        - client_id is the index of the slots of the client in the shared
+          memory and of its response queue in responses.
+        - server_alive is the reading end of the pipe of the server process
+          (see serve): it becomes readable once the server is gone.
+        """
+
+        self.requests = requests
+        self.server_alive = server_alive
+        self.response = responses[client_id]
+        self.client_id = client_id
+        self.memory = shared_memory.SharedMemory(name=memory_name)
+        arrays = shared_arrays(self.memory.buf, *layout)
+        self.inputs = arrays['inputs'][client_id]
+        self.valid_actions = arrays['valid_actions'][client_id]
+        self.policy = arrays['policy'][client_id]
+        self.value = arrays['value'][client_id]
+        self.max_rows = layout[1]
+
+    def network(self, network_id):
+        """
+        Return a RemoteNetwork predicting with the network 'network_id' of
+        the server.
+        """
+
+        return RemoteNetwork(self, network_id)
+
+    def predict(self, network_id, inputs, valid_actions):
+        """
+        Return the policies and values predicted by the network
+        'network_id' of the server for 'inputs' and 'valid_actions', sent
+        max_rows positions at a time. Raise a RuntimeError if the server
+        fails to predict them or its process ends before answering.
+        """
+
+        policies = []
+        values = []
+        for start in range(0, len(inputs), self.max_rows):
+            rows = min(self.max_rows, len(inputs) - start)
+            self.inputs[:rows] = inputs[start:start + rows]
+            self.valid_actions[:rows] = valid_actions[start:start + rows]
+            self.requests.put((self.client_id, network_id, rows))
+            response = self.wait_response()
+            if isinstance(response, str):
+                raise RuntimeError('the inference server failed to predict:\n'
+                                    + response)
+            policies.append(self.policy[:rows].copy())
+            values.append(self.value[:rows].copy())
+        return np.concatenate(policies), np.concatenate(values)
+
+    def wait_response(self):
+        """
+        Return the next response of the server, checking every
+        LIVENESS_INTERVAL seconds that its process still runs.
+        """
+
+        while True:
+            try:
+                return self.response.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                # The server never writes to the pipe: it is readable only
+                # once closed. A last response may have arrived meanwhile.
+                if self.server_alive.poll():
+                    try:
+                        return self.response.get(timeout=LIVENESS_INTERVAL)
+                    except queue.Empty:
+                        raise RuntimeError('the inference server process '
+                                            'ended') from None
+
+class RemoteNetwork:
+    def __init__(self, client, network_id):
+        """
+        Stand-in for a Keras model served by an InferenceServer: players
+        call predict as they would on the model (see AlphaZeroPlayer).
+        """
+
+        self.client = client
+        self.network_id = network_id
+
+    def predict(self, inputs):
+        """
+        Return [policies, values] for inputs = [state channels, valid
+        actions], as Keras' predict does for the models of define_model.
+        """
+
+        return self.client.predict(self.network_id, inputs[0], inputs[1])
@@ -4,7 +4,7 @@ from players.scripts.GP import GP
 
 def main():
     if len(sys.argv[1:]) < 8:
-        print('Usage for synthesizing scripts: main-gp generations mutation_rate population_size elite tournament_size number_matches invaders run_id')
+        print('Usage for synthesizing scripts: main-gp generations mutation_rate population_size elite tournament_size number_matches invaders run_id [seed]')
         return
     
     generations = int(sys.argv[1])
@@ -15,8 +15,9 @@ def main():
     number_matches = int(sys.argv[6])
     number_invaders = int(sys.argv[7])
     run_id = int(sys.argv[8])
+    seed = int(sys.argv[9]) if len(sys.argv[1:]) > 8 else None
     
-    gp = GP(generations, mutation_rate, population_size, elite, tournament_size, number_matches, number_invaders, run_id)
+    gp = GP(generations, mutation_rate, population_size, elite, tournament_size, number_matches, number_invaders, run_id, seed)
     gp.evolve()
     
 if __name__ == "__main__":
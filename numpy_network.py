@@ -0,0 +1,330 @@
+import copy
+import sys
+import time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Default epsilon of keras.layers.BatchNormalization.
+BATCH_NORM_EPSILON = 1e-3
+
+def relu(x):
+    return np.maximum(x, 0)
+
+def softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+class NumpyNetwork:
+    def __init__(self, convs, prob_dense, value_dense, padding=0,
+                    batch_norm=None, flatten_channels_last=True,
+                    dtype=np.float32):
+        """
+        Forward pass of the networks of models.define_model and
+        models.define_model_experimental written with NumPy only, so that
+        search processes evaluate positions without TensorFlow and without
+        the dispatch cost of Keras' predict (see export_network and
+        from_weights). It has the predict method of the Keras model.
+        - convs is the list of the (kernel, bias) of the 'valid' Conv2D
+          layers with ReLU activations, kernels in the Keras layout
+          (rows, columns, input channels, filters).
+        - prob_dense and value_dense are the lists of the (kernel, bias) of
+          the Dense layers of the policy head (whose input is the flattened
+          features followed by the valid actions) and of the value head.
+          Hidden layers use ReLU, the last ones softmax and tanh.
+        - padding is the number of zeros added around the rows and columns
+          of the input (ZeroPadding2D of define_model_experimental).
+        - batch_norm is None or the (gamma, beta, moving_mean,
+          moving_variance, epsilon) of the BatchNormalization followed by
+          a ReLU after the convolutions. Since the models are built with
+          the channels_first image format and the default axis -1, it
+          normalizes along the columns of the feature maps, not the
+          channels.
+        - flatten_channels_last is True if Flatten orders the features
+          (row, column, channel), as the Flatten of Keras 2.2 and later does
+          with the channels_first image format, and False if it keeps the
+          (channel, row, column) order.
+        - dtype is the floating point type of the computations.
+        Inputs are in the channels_first layout of
+        AlphaZeroPlayer.transform_to_input. The computations are done with
+        channels last, so a convolution is a single einsum over the windows
+        of the input (im2col).
+        """
+
+        self.dtype = dtype
+        self.convs = [(np.asarray(kernel, dtype), np.asarray(bias, dtype))
+                        for kernel, bias in convs]
+        self.prob_dense = [(np.asarray(kernel, dtype),
+                            np.asarray(bias, dtype))
+                            for kernel, bias in prob_dense]
+        self.value_dense = [(np.asarray(kernel, dtype),
+                            np.asarray(bias, dtype))
+                            for kernel, bias in value_dense]
+        self.padding = padding
+        self.batch_norm = None
+        if batch_norm is not None:
+            gamma, beta, mean, variance, epsilon = batch_norm
+            scale = np.asarray(gamma, np.float64) \
+                    / np.sqrt(np.asarray(variance, np.float64) + epsilon)
+            shift = np.asarray(beta, np.float64) \
+                    - np.asarray(mean, np.float64) * scale
+            # Folded into a scale and a shift along the columns.
+            self.batch_norm = (scale.astype(dtype)[:, None],
+                                shift.astype(dtype)[:, None])
+        self.flatten_channels_last = flatten_channels_last
+
+    def features(self, states):
+        """
+        Return the flattened features of the batch of positions 'states',
+        of shape (n, channels, rows, columns).
+        """
+
+        x = np.asarray(states, self.dtype).transpose(0, 2, 3, 1)
+        if self.padding:
+            p = self.padding
+            x = np.pad(x, ((0, 0), (p, p), (p, p), (0, 0)))
+        for layer in self.convs:
+            x = relu(self.convolve(x, layer))
+        if self.batch_norm is not None:
+            scale, shift = self.batch_norm
+            x = relu(x * scale + shift)
+        if not self.flatten_channels_last:
+            x = x.transpose(0, 3, 1, 2)
+        return x.reshape(len(x), -1)
+
+    def predict(self, inputs):
+        """
+        Return [policies, values] for inputs = [state channels, valid
+        actions], as Keras' predict does: arrays of shapes (n, n_actions)
+        and (n, 1).
+        """
+
+        states, valid_actions = inputs
+        flat = self.features(states)
+        x = np.concatenate([flat, np.asarray(valid_actions, self.dtype)],
+                            axis=1)
+        for layer in self.prob_dense[:-1]:
+            x = relu(self.dense(x, layer))
+        policies = softmax(self.dense(x, self.prob_dense[-1]))
+        x = flat
+        for layer in self.value_dense[:-1]:
+            x = relu(self.dense(x, layer))
+        values = np.tanh(self.dense(x, self.value_dense[-1]))
+        return [policies, values]
+
+    def convolve(self, x, layer):
+        """
+        Return the 'valid' convolution of the batch 'x' (channels last) by
+        'layer', a (kernel, bias) of convs, before its activation.
+        """
+
+        kernel, bias = layer
+        rows, columns = kernel.shape[:2]
+        # windows[n, i, j, c, k, l] = x[n, i + k, j + l, c]
+        windows = sliding_window_view(x, (rows, columns), axis=(1, 2))
+        return np.einsum('nijckl,klcf->nijf', windows, kernel,
+                            optimize=True) + bias
+
+    def dense(self, x, layer):
+        """
+        Return the output of 'layer', a (kernel, bias) of prob_dense or
+        value_dense, for the batch 'x', before its activation.
+        """
+
+        kernel, bias = layer
+        return x @ kernel + bias
+
+    def astype(self, dtype):
+        """
+        Return a copy of this network whose weights and computations use
+        'dtype' (np.float16 halves the memory of the weights).
+        """
+
+        network = copy.copy(self)
+        network.dtype = dtype
+        network.convs = [(kernel.astype(dtype), bias.astype(dtype))
+                            for kernel, bias in self.convs]
+        network.prob_dense = [(kernel.astype(dtype), bias.astype(dtype))
+                                for kernel, bias in self.prob_dense]
+        network.value_dense = [(kernel.astype(dtype), bias.astype(dtype))
+                                for kernel, bias in self.value_dense]
+        if self.batch_norm is not None:
+            network.batch_norm = tuple(a.astype(dtype)
+                                        for a in self.batch_norm)
+        return network
+
+    @classmethod
+    def from_weights(cls, weights, conv_number, column_range, offset,
+                        initial_height, dice_value, experimental=False,
+                        dtype=np.float32):
+        """
+        Return the NumpyNetwork of the list 'weights' given by get_weights
+        of a model of models.define_model (models.define_model_experimental
+        if experimental is True) with these arguments, without Keras, e.g.
+        for weights loaded from a pickle file. Keras lists the weights of a
+        functional model layer by layer, from the inputs to the outputs
+        (decreasing depth) and, at the same depth, the policy head before
+        the value head. The shapes are checked against the architecture.
+        """
+
+        weights = [np.asarray(w) for w in weights]
+        padding = 2 if experimental else 0
+        n_convs = 2 if experimental else conv_number
+        n_prob = 3
+        n_value = 2 if experimental else 3
+        if len(weights) != 2 * (n_convs + n_prob + n_value) \
+                            + (4 if experimental else 0):
+            raise ValueError('The weights do not match the architecture.')
+        convs = [(weights[2 * i], weights[2 * i + 1])
+                    for i in range(n_convs)]
+        position = 2 * n_convs
+        batch_norm = None
+        if experimental:
+            batch_norm = tuple(weights[position:position + 4]) \
+                            + (BATCH_NORM_EPSILON,)
+            position += 4
+        # Layer k of a head of n layers is at depth n - 1 - k from the
+        # outputs.
+        layers = sorted([(n_prob - 1 - k, 0, k) for k in range(n_prob)]
+                        + [(n_value - 1 - k, 1, k) for k in range(n_value)],
+                        key=lambda layer: (-layer[0], layer[1]))
+        heads = ([None] * n_prob, [None] * n_value)
+        for _, head, k in layers:
+            heads[head][k] = (weights[position], weights[position + 1])
+            position += 2
+        network = cls(convs, heads[0], heads[1], padding, batch_norm,
+                        dtype=dtype)
+        network.check_shapes(column_range, offset, initial_height,
+                                dice_value)
+        return network
+
+    def check_shapes(self, column_range, offset, initial_height, dice_value):
+        """
+        Raise a ValueError if the weights of this network cannot be the ones
+        of a network of models.define_model for these arguments.
+        """
+
+        height = column_range[1] - column_range[0] + 1
+        longest_column = (column_range[1] // 2) + 1
+        width = initial_height + offset * (longest_column - column_range[0])
+        temp = len(list(range(2, dice_value * 2 + 1)))
+        n_actions = (temp*(1+temp))//2 + temp + 2
+        n_features = self.features(np.zeros((1, 6, height, width))).shape[1]
+        expected = [(self.prob_dense, n_features + n_actions, n_actions),
+                    (self.value_dense, n_features, 1)]
+        for dense, n_inputs, n_outputs in expected:
+            for kernel, bias in dense:
+                if kernel.shape[0] != n_inputs \
+                    or bias.shape != kernel.shape[1:]:
+                    raise ValueError('The weights do not match the '
+                                        'architecture.')
+                n_inputs = kernel.shape[1]
+            if n_inputs != n_outputs:
+                raise ValueError('The weights do not match the architecture.')
+
+def export_network(model, dtype=np.float32):
+    """
+    Return the NumpyNetwork computing the same function as 'model', a Keras
+    model of models.define_model or models.define_model_experimental. The
+    layers are found by name, so the result does not depend on the order of
+    get_weights.
+    """
+
+    names = [layer.name for layer in model.layers]
+    convs = [tuple(model.get_layer(name).get_weights())
+                for name in ('Conv_Layer', 'Conv_Layer2') if name in names]
+    prob_dense = [tuple(model.get_layer(name).get_weights())
+                    for name in ('FC_Prob_1', 'FC_Prob_2', 'Output_Dist')]
+    value_dense = [tuple(model.get_layer(name).get_weights())
+                    for name in ('FC_Value_1', 'FC_Value_2', 'Output_Value')
+                    if name in names]
+    padding = 0
+    batch_norm = None
+    for layer in model.layers:
+        if type(layer).__name__ == 'ZeroPadding2D':
+            padding = layer.padding[0][0]
+        elif type(layer).__name__ == 'BatchNormalization':
+            batch_norm = tuple(layer.get_weights()) + (layer.epsilon,)
+    flatten = model.get_layer('Flatten_Layer')
+    flatten_channels_last = getattr(flatten, 'data_format', None) \
+                            == 'channels_first'
+    return NumpyNetwork(convs, prob_dense, value_dense, padding, batch_norm,
+                        flatten_channels_last, dtype)
+
+def random_inputs(player, n_positions, seed):
+    """
+    Return [state channels, valid actions] of n_positions positions of
+    random games of the 2-12 board, in the format of the inputs of the
+    network of 'player' (an AlphaZeroPlayer).
+    """
+
+    import random
+    from game import Game
+    random.seed(seed)
+    states = []
+    valid_actions = []
+    game = Game(2, 4, 6, [2, 12], 2, 2)
+    while len(states) < n_positions:
+        if game.is_finished()[1]:
+            game = Game(2, 4, 6, [2, 12], 2, 2)
+        moves = game.available_moves()
+        if game.is_player_busted(moves):
+            continue
+        states.append(player.transform_to_input(game, [2, 12], 2, 2))
+        valid_actions.append(player.transform_actions_to_dist(moves))
+        game.play(random.choice(moves))
+    return [np.concatenate(states), np.concatenate(valid_actions)]
+
+def main():
+    """
+    Check that NumpyNetwork (built by export_network and by from_weights)
+    predicts what Keras predicts for untrained networks of
+    models.define_model (one and two convolutions) and
+    models.define_model_experimental on random positions of the 2-12
+    board, and compare the time of a single prediction. Requires Keras.
+    """
+
+    from keras import backend as K
+    K.set_image_data_format('channels_first')
+    from models import define_model, define_model_experimental
+    from players.net_uct_player import Network_UCT
+
+    player = Network_UCT(1, 1, [2, 12], 2, 2, 6, None)
+    inputs = random_inputs(player, 500, 0)
+    n_failures = 0
+    for name, define, conv_number in [
+                            ('define_model, 1 conv', define_model, 1),
+                            ('define_model, 2 convs', define_model, 2),
+                            ('define_model_experimental',
+                                define_model_experimental, 2)]:
+        model = define(reg = 0.01, conv_number = conv_number,
+                        column_range = [2, 12], offset = 2,
+                        initial_height = 2, dice_value = 6)
+        policies, values = model.predict(inputs)
+        for export, network in [
+                ('export_network', export_network(model)),
+                ('from_weights', NumpyNetwork.from_weights(
+                        model.get_weights(), conv_number, [2, 12], 2, 2, 6,
+                        experimental = define is define_model_experimental))]:
+            numpy_policies, numpy_values = network.predict(inputs)
+            policy_error = np.abs(numpy_policies - policies).max()
+            value_error = np.abs(numpy_values - values).max()
+            status = 'ok'
+            if policy_error > 1e-5 or value_error > 1e-5:
+                status = 'MISMATCH'
+                n_failures += 1
+            print('{:26s} {:14s} max error policy {:.2e} value {:.2e} {}'
+                    .format(name, export, policy_error, value_error, status))
+        single = [inputs[0][:1], inputs[1][:1]]
+        for label, predict in [('Keras', model.predict),
+                                ('NumPy', network.predict)]:
+            n_runs = 20 if label == 'Keras' else 2000
+            start = time.perf_counter()
+            for _ in range(n_runs):
+                predict(single)
+            print('  {:6s} {:10.1f} us per prediction'.format(label,
+                    (time.perf_counter() - start) / n_runs * 1e6))
+    if n_failures > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,72 @@
 import math, random
+import array
 import numpy as np
 import copy
 import collections
 from random import sample
-from players.uct_player import UCTPlayer, Node
+from players.uct_player import UCTPlayer, Node, ChanceNode
+from evaluation_cache import EvaluationCache
+from numpy_network import NumpyNetwork, export_network
 from abc import abstractmethod
 from collections import defaultdict
 import time
 
 class AlphaZeroPlayer(UCTPlayer):
+    # Children are selected by the modified PUCT (see UCTPlayer).
+    prior_exploration = True
+
     @abstractmethod
     def __init__(self, c, n_simulations, column_range, 
-                        offset, initial_height, dice_value, network):
+                        offset, initial_height, dice_value, network,
+                        transposition_table_size=0, chance_nodes=False,
+                        tree_store_size=0, max_interior_states=0,
+                        batch_size=1, evaluation_cache_size=0):
         """
         - column_range is a list denoting the range of the board game columns.
         - offset is the height difference between columns.
         - initial_height is the height of the columns at the board border.
         - dice_value is the number of faces of a single die.
         - network is the neural network AlphaZero trains.
+        - transposition_table_size is the maximum number of nodes kept in the
+          transposition table (see UCTPlayer). 0 disables it.
+        - chance_nodes is a boolean telling if dice rolls are searched
+          through chance nodes (see UCTPlayer).
+        - tree_store_size is the maximum number of nodes of the TreeStore
+          keeping the tree (see UCTPlayer). 0 keeps it in Node objects.
+        - max_interior_states is the maximum number of states of fully
+          expanded nodes kept in memory (see UCTPlayer). 0 keeps all of
+          them.
+        - batch_size is the number of leaves selected before the network
+          evaluates them together (see run_batched_simulations). If it is 1
+          (default), every simulation is run on its own as in UCTPlayer. It
+          cannot be greater than 1 with a tree store.
+        - evaluation_cache_size is the maximum number of predictions of the
+          network kept in an EvaluationCache (evaluation_cache.py). If it is
+          0 (default), every evaluation is predicted.
+        - evaluation_cache is the EvaluationCache of the player, 'None' if
+          not used. It is kept between games; players using the same
+          network may share one.
+        - keras_network is the Keras model the NumpyNetwork in self.network
+          is exported from (see use_numpy_network), 'None' if the player
+          evaluates positions with self.network itself.
         """
 
-        super().__init__(c, n_simulations)
+        super().__init__(c, n_simulations, transposition_table_size,
+                            chance_nodes, tree_store_size, max_interior_states)
+        if batch_size > 1 and tree_store_size > 0:
+            raise ValueError('Batched simulations cannot be used with a '
+                                'tree store.')
         self.column_range = column_range 
         self.offset = offset
         self.initial_height = initial_height
         self.dice_value = dice_value
         self.network = network
+        self.batch_size = batch_size
+        self.evaluation_cache_size = evaluation_cache_size
+        self.evaluation_cache = None
+        self.keras_network = None
+        if evaluation_cache_size > 0:
+            self.evaluation_cache = EvaluationCache(evaluation_cache_size)
 
     @abstractmethod
     def rollout(self, node, scratch_game):
@@ -46,6 +87,57 @@ class AlphaZeroPlayer(UCTPlayer):
         """
         pass
 
+    def use_numpy_network(self):
+        """
+        Evaluate positions with the NumpyNetwork (numpy_network.py) of
+        self.network, a Keras model of models.define_model or
+        models.define_model_experimental, from now on. It predicts the same
+        values without the cost of Keras' predict. The Keras model is kept
+        in self.keras_network: call it again after its weights change to
+        export them again (the evaluation cache, if any, is cleared).
+        """
+
+        if not isinstance(self.network, NumpyNetwork):
+            self.keras_network = self.network
+        elif self.keras_network is None:
+            # Built from weights (see NumpyNetwork.from_weights).
+            return
+        self.network = export_network(self.keras_network)
+        if self.evaluation_cache is not None:
+            self.evaluation_cache.clear()
+
+    def search_copy(self):
+        """
+        Return the copy of the player sent to the workers of RootParallel
+        (see UCTPlayer.search_copy). A NumpyNetwork is sent along with it.
+        """
+
+        worker = super().search_copy()
+        worker.keras_network = None
+        if isinstance(self.network, NumpyNetwork):
+            worker.network = self.network
+        return worker
+
+    def start_root_parallel(self, n_workers, reg=None, conv_number=None):
+        """
+        Search with 'n_workers' worker processes (see
+        UCTPlayer.start_root_parallel). Each worker rebuilds the network
+        with models.define_model and the current weights of self.network;
+        reg and conv_number are the ones self.network was defined with.
+        A NumpyNetwork is sent to the workers as is, so they do not import
+        TensorFlow. Call it again after the weights change.
+        """
+
+        if isinstance(self.network, NumpyNetwork):
+            super().start_root_parallel(n_workers)
+            return
+        network_spec = {'reg': reg, 'conv_number': conv_number,
+                        'column_range': self.column_range,
+                        'offset': self.offset,
+                        'initial_height': self.initial_height,
+                        'dice_value': self.dice_value}
+        super().start_root_parallel(n_workers, network_spec)
+
     def select_action(self, game, root, dist_probability):
         """Return the action sampled from the distribution probability."""
 
@@ -58,7 +150,7 @@ class AlphaZeroPlayer(UCTPlayer):
         for i in range(len(dist)):
             partial_sum += dist[i][0]
             additive_probabilities.append(partial_sum)
-        random_number = random.uniform(0.0, 1.0)
+        random_number = self.random.uniform(0.0, 1.0)
         selected_action_index = -1
         #Iterate through the list to get the sampled action.
         for i in range(len(additive_probabilities)):
@@ -69,60 +161,210 @@ class AlphaZeroPlayer(UCTPlayer):
 
     def expand_children(self, parent):
         """Expand the children of the "parent" node."""
-        
-        # parent might not have any children given the dice configuration. 
-        # Therefore, it should be checked if the player is busted. 
-        # is_player_busted() automatically change the game dynamics 
-        #(player turn, etc) if the player is indeed busted.
-        is_busted = True
-        while is_busted:
-            is_busted = parent.state.is_player_busted(
-                                parent.state.available_moves()
-                                )
-        valid_actions = parent.state.available_moves()
-        
-        for action in valid_actions:
-            child_game = parent.state.clone()
-            child_game.play(action)
-            child_state = Node(child_game, parent)
-            child_state.action_taken = action
-            parent.children[action] = child_state
 
-        #Update the  distribution probability of the children (node.p_a)
-        network_input_parent = self.transform_to_input(parent.state, 
-                                    self.column_range, self.offset, 
-                                    self.initial_height
+        self.expand_children_batch([parent])
+
+    def expand_children_batch(self, parents):
+        """
+        Expand the children of the nodes of 'parents', whose priors are
+        given by a single prediction of the network over all of them.
+        """
+
+        for parent in parents:
+            # parent might not have any children given the dice
+            # configuration. Therefore, it should be checked if the player
+            # is busted. is_player_busted() automatically change the game
+            # dynamics (player turn, etc) if the player is indeed busted.
+            is_busted = True
+            while is_busted:
+                is_busted = parent.state.is_player_busted(
+                                    parent.state.available_moves()
                                     )
-        valid_actions_dist = self.transform_actions_to_dist(valid_actions)
+            valid_actions = parent.state.available_moves()
+            # Children are created lazily, when first selected (see
+            # get_child).
+            parent.expand(valid_actions)
 
-        dist_prob, _= self.network.predict(
-                                [network_input_parent, valid_actions_dist]
-                                )
-        dist_prob = self.remove_invalid_actions(dist_prob[0], 
-                                        parent.children.keys()
-                                        )
+        #Update the  distribution probability of the children (node.p_a)
+        dist_prob, _= self.predict_batch([parent.state for parent in parents],
+                                        [parent.actions for parent in parents])
+        for parent, parent_dist_prob in zip(parents, dist_prob):
+            parent_dist_prob = self.remove_invalid_actions(parent_dist_prob,
+                                                            parent.actions
+                                                            )
+            self.add_dist_prob_to_children(parent, parent_dist_prob)
+
+    def predict_batch(self, states, valid_actions):
+        """
+        Return the lists of the policies and of the values predicted by the
+        network for the positions 'states' whose valid actions are
+        'valid_actions' (a list of lists of actions), with a single
+        prediction for all of them. With an evaluation cache, only the
+        positions not cached yet are predicted (once each) and added to it.
+        """
 
-        self.add_dist_prob_to_children(parent, dist_prob)
+        policies = [None] * len(states)
+        values = [None] * len(states)
+        # Positions to predict, and the indexes of 'states' waiting for each
+        # of them.
+        to_predict = []
+        waiting = []
+        keys = {}
+        for i, (state, actions) in enumerate(zip(states, valid_actions)):
+            key = None
+            if self.evaluation_cache is not None:
+                key = self.evaluation_cache.key(state, actions)
+                if key in keys:
+                    waiting[keys[key]].append(i)
+                    continue
+                entry = self.evaluation_cache.get(key)
+                if entry is not None:
+                    policies[i], values[i] = entry
+                    continue
+                keys[key] = len(to_predict)
+            to_predict.append((state, actions, key))
+            waiting.append([i])
+        if not to_predict:
+            return policies, values
+
+        network_input = np.concatenate([self.transform_to_input(state,
+                                            self.column_range, self.offset,
+                                            self.initial_height
+                                            ) for state, _, _ in to_predict])
+        valid_actions_dist = np.concatenate(
+                                [self.transform_actions_to_dist(actions)
+                                for _, actions, _ in to_predict])
+        dist_prob, network_value_output = self.network.predict(
+                                    [network_input, valid_actions_dist]
+                                    )
+        for (_, _, key), indexes, policy, value in zip(to_predict, waiting,
+                                                    dist_prob,
+                                                    network_value_output):
+            if key is not None:
+                self.evaluation_cache.put(key, policy, value[0])
+            for i in indexes:
+                policies[i] = policy if i == indexes[0] else policy.copy()
+                values[i] = value[0]
+        return policies, values
+
+    def rollout_batch(self, nodes):
+        """
+        Return the list of the values of the simulations ending at 'nodes'
+        (see rollout). Players whose values come from the network override
+        it to evaluate all of them at once.
+        """
+
+        return [self.rollout(node) for node in nodes]
 
-    def calculate_ucb_max(self, node, action):
+    def run_simulations(self, root_state):
         """
-        Return the node modified PUCT (see AZ paper) value of the MAX player.
+        Run n_simulations from self.root (see UCTPlayer.run_simulations),
+        batch_size at a time if it is greater than 1.
         """
 
-        return node.q_a[action] + self.c * node.p_a[action] \
-                * np.divide(math.sqrt(math.log(node.n_visits)), \
-                            node.n_a[action]
-                            )
+        if self.batch_size > 1:
+            self.run_batched_simulations(root_state)
+        else:
+            super().run_simulations(root_state)
+
+    def add_virtual_loss(self, node, i, applied):
+        """
+        Count a lost visit of node.actions[i] for the player to move in
+        'node' until the batch is backpropagated, so that the next
+        simulations of the batch prefer other paths. The previous value of
+        q_a[i] is pushed to 'applied' for remove_virtual_losses. Dice rolls
+        of chance nodes are not chosen by a player and get no loss.
+        """
 
-    def calculate_ucb_min(self, node, action):
+        if isinstance(node, ChanceNode):
+            return
+        applied.append((node, i, node.q_a[i]))
+        node.n_visits += 1
+        node.n_a[i] += 1
+        loss = -1 if node.player_turn == 1 else 1
+        node.q_a[i] = (node.q_a[i] * (node.n_visits - 1) + loss) / \
+                        node.n_visits
+
+    def remove_virtual_losses(self, applied):
+        """Undo the virtual losses of 'applied', the latest first."""
+
+        while applied:
+            node, i, q = applied.pop()
+            node.n_visits -= 1
+            node.n_a[i] -= 1
+            node.q_a[i] = q
+
+    def run_batched_simulations(self, root_state):
         """
-        Return the node modified PUCT (see AZ paper) value of the MIN player.
+        Run n_simulations from self.root by batches of batch_size (leaf
+        parallelization). The simulations of a batch descend the tree one
+        after the other as in UCTPlayer.run_simulations, each adding a
+        virtual loss to the actions it chooses (see add_virtual_loss) so
+        that the batch reaches different leaves. The leaves to expand are
+        then expanded with one prediction (expand_children_batch), the
+        leaves reached are evaluated at once (rollout_batch), the virtual
+        losses are removed and every simulation is backpropagated.
         """
 
-        return node.q_a[action] - self.c * node.p_a[action] \
-                * np.divide(math.sqrt(math.log(node.n_visits)), \
-                            node.n_a[action]
-                            )
+        n_simulations = 0
+        while n_simulations < self.n_simulations:
+            batch_size = min(self.batch_size,
+                                self.n_simulations - n_simulations)
+            n_simulations += batch_size
+            applied = []
+            # Each simulation is a list [search_path, edges, leaf] (see
+            # run_UCT), leaf being None until the node where the descent
+            # stopped is expanded.
+            simulations = []
+            to_expand = []
+            for _ in range(batch_size):
+                node = self.root
+                node.state = root_state.clone()
+                search_path = [node]
+                edges = []
+                leaf = None
+                while node.is_expanded():
+                    if isinstance(node, ChanceNode):
+                        i, new_node = self.select_roll(node)
+                    else:
+                        i, new_node = self.select_child(node)
+                    self.add_virtual_loss(node, i, applied)
+                    edges.append(i)
+                    # Stop at a cycle of the transposition table (see
+                    # run_UCT).
+                    if self.transposition_table is not None \
+                        and new_node in search_path:
+                        leaf = new_node
+                        break
+                    search_path.append(new_node)
+                    node = new_node
+                if leaf is None and (node.n_visits == 0
+                                    or node.state.is_finished()[1]):
+                    leaf = node
+                elif leaf is None and node not in to_expand:
+                    to_expand.append(node)
+                simulations.append([search_path, edges, leaf])
+
+            if to_expand:
+                self.expand_children_batch(to_expand)
+            for simulation in simulations:
+                search_path, edges, leaf = simulation
+                if leaf is None:
+                    node = search_path[-1]
+                    i, leaf = self.select_child(node)
+                    self.add_virtual_loss(node, i, applied)
+                    edges.append(i)
+                    search_path.append(leaf)
+                    simulation[2] = leaf
+
+            values = self.rollout_batch([leaf for _, _, leaf in simulations])
+            self.remove_virtual_losses(applied)
+            for (search_path, edges, _), value in zip(simulations, values):
+                self.backpropagate(search_path, edges, value)
+            if self.state_budget is not None:
+                self.state_budget.enforce()
+            if self.transposition_table is not None:
+                self.evict_transpositions()
 
     def add_dist_prob_to_children(self, node, dist_prob):
         """
@@ -133,8 +375,8 @@ class AlphaZeroPlayer(UCTPlayer):
 
         standard_dist = self.get_standard_dist_with_id()
         standard_dist = collections.OrderedDict(standard_dist)
-        for key in node.children.keys():
-            node.p_a[key] = dist_prob[standard_dist[key]]
+        node.p_a = array.array('d', [dist_prob[standard_dist[key]]
+                                        for key in node.actions])
 
     def valid_positions_channel(self, column_range, offset, initial_height):
         """
@@ -11,9 +11,15 @@ import pickle
 class Network_UCT(AlphaZeroPlayer):
 
     def __init__(self, c, n_simulations, column_range, 
-                        offset, initial_height, dice_value, network):
+                        offset, initial_height, dice_value, network,
+                        transposition_table_size=0, chance_nodes=False,
+                        tree_store_size=0, max_interior_states=0,
+                        batch_size=1, evaluation_cache_size=0):
         super().__init__(c, n_simulations, column_range, 
-                                offset, initial_height, dice_value, network)
+                                offset, initial_height, dice_value, network,
+                                transposition_table_size, chance_nodes,
+                                tree_store_size, max_interior_states,
+                                batch_size, evaluation_cache_size)
 
     def rollout(self, node):
         """
@@ -21,18 +27,21 @@ class Network_UCT(AlphaZeroPlayer):
         from the network.
         """
 
-        network_input = self.transform_to_input(node.state, self.column_range,
-                                                self.offset, 
-                                                self.initial_height
-                                                )
-        valid_actions_dist = self.transform_actions_to_dist(
-                                            node.state.available_moves()
-                                            )
+        return self.rollout_batch([node])[0]
 
-        _, network_value_output = self.network.predict(
-                                    [network_input,valid_actions_dist]
-                                    )
-        return network_value_output[0][0]
+    def rollout_batch(self, nodes):
+        """
+        Retrieve the values of the simulations ending at 'nodes' from a
+        single prediction of the network (see predict_batch). With an
+        evaluation cache, the priors predicted along with the value of a
+        leaf are reused when it is expanded.
+        """
+
+        _, network_value_output = self.predict_batch(
+                                [node.state for node in nodes],
+                                [node.state.available_moves() for node in nodes]
+                                )
+        return network_value_output
 
     def clone(self):
         """
@@ -42,7 +51,10 @@ class Network_UCT(AlphaZeroPlayer):
         """
         self_copy = Network_UCT(self.c, self.n_simulations, self.column_range, 
                         self.offset, self.initial_height, 
-                        self.dice_value, None)
+                        self.dice_value, None, self.transposition_table_size,
+                        self.chance_nodes, self.tree_store_size,
+                        self.max_interior_states, self.batch_size,
+                        self.evaluation_cache_size)
         self_copy.root = pickle.loads(pickle.dumps(self.root, -1))
         self_copy.action = pickle.loads(pickle.dumps(self.action, -1))
         self_copy.dist_probability = pickle.loads(
@@ -5,14 +5,31 @@ import numpy as np
 import copy
 import collections
 from players.alphazero_player import AlphaZeroPlayer, Node
+from rollout_kernel import random_rollout
 import pickle
 
 class Network_UCT_With_Playout(AlphaZeroPlayer):
 
     def __init__(self, c, n_simulations, column_range, 
-                        offset, initial_height, dice_value, network):
+                        offset, initial_height, dice_value, network,
+                        transposition_table_size=0, chance_nodes=False,
+                        fast_rollout=False, tree_store_size=0,
+                        max_interior_states=0, batch_size=1,
+                        evaluation_cache_size=0):
+        """
+        - fast_rollout is a boolean. If True, rollouts are played by
+          random_rollout (rollout_kernel.py) instead of a cloned Game.
+        - batch_size is the number of leaves whose expansions are predicted
+          together (see AlphaZeroPlayer). Their rollouts are still played
+          one by one.
+        """
+
         super().__init__(c, n_simulations, column_range, 
-                                offset, initial_height, dice_value, network)
+                                offset, initial_height, dice_value, network,
+                                transposition_table_size, chance_nodes,
+                                tree_store_size, max_interior_states,
+                                batch_size, evaluation_cache_size)
+        self.fast_rollout = fast_rollout
 
     def rollout(self, node):
         """Take random actions until a game is finished and return the value."""
@@ -25,17 +42,20 @@ class Network_UCT_With_Playout(AlphaZeroPlayer):
             else:
                 return -1
             
-        end_game = False
-        game = node.state.clone()
-        while not end_game:
-            #avoid infinite loops in smaller boards
-            who_won, end_game = game.is_finished()
-            moves = game.available_moves()
-            if game.is_player_busted(moves):
-                continue
-            chosen_move = random.choice(moves)
-            game.play(chosen_move)
-            who_won, end_game = game.is_finished()
+        if self.fast_rollout:
+            who_won = random_rollout(node.state, self.random)
+        else:
+            end_game = False
+            game = node.state.clone()
+            while not end_game:
+                #avoid infinite loops in smaller boards
+                who_won, end_game = game.is_finished()
+                moves = game.available_moves()
+                if game.is_player_busted(moves):
+                    continue
+                chosen_move = self.random.choice(moves)
+                game.play(chosen_move)
+                who_won, end_game = game.is_finished()
         if who_won == 1:
             return 1
         else:
@@ -50,7 +70,10 @@ class Network_UCT_With_Playout(AlphaZeroPlayer):
 
         self_copy = Network_UCT_With_Playout(self.c, self.n_simulations, 
                         self.column_range, self.offset, self.initial_height, 
-                        self.dice_value, None
+                        self.dice_value, None, self.transposition_table_size,
+                        self.chance_nodes, self.fast_rollout,
+                        self.tree_store_size, self.max_interior_states,
+                        self.batch_size, self.evaluation_cache_size
                         )
         self_copy.root = pickle.loads(pickle.dumps(self.root, -1))
         self_copy.action = pickle.loads(pickle.dumps(self.action, -1))
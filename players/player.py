@@ -1,11 +1,26 @@
 from abc import ABC, abstractmethod
+import random
+from random_streams import python_random
 
 class Player(ABC):
+    # Source of the random choices of the player: the random module unless
+    # seed() gives the player its own generator.
+    random = random
+
     @abstractmethod
     def get_action(self, game, *args):
         """
-        Return the action to be made by the player given the 
+        Return the action to be made by the player given the
         game state passed.
         Concrete classes must implement this method.
         """
-        pass
\ No newline at end of file
+        pass
+
+    def seed(self, seed):
+        """
+        Give the player its own random.Random seeded from 'seed' (an int or
+        a numpy SeedSequence, see random_streams.py), so its random choices
+        no longer depend on the global random module and can be reproduced.
+        """
+
+        self.random = python_random(seed)
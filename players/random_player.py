@@ -1,8 +1,7 @@
 from players.player import Player
-import random
 
 class RandomPlayer(Player):
 
     def get_action(self, game):
         actions = game.available_moves()
-        return random.choice(actions)
\ No newline at end of file
+        return self.random.choice(actions)
\ No newline at end of file
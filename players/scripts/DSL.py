@@ -1,10 +1,21 @@
-import copy
 import random
 from players.scripts.Script import Script
+from bust_tables import bust_probability, expected_progress
 
 class DSL:
     
-    def __init__(self):
+    def __init__(self, generator=random, bust_rules=False):
+        """
+        - generator is the source of the random choices made when generating
+          and mutating scripts, the random module or a random.Random.
+        - bust_rules is a boolean. If True, the grammar also has a rule
+          stopping when the exact probability of busting with the next roll
+          is greater than a PROBABILITY (see bust_tables.py). False by
+          default, so that a seed generates the same scripts as before the
+          rule existed.
+        """
+        
+        self.generator = generator
         
         self.start = 'S'
         self.start_single = 'SR'
@@ -18,10 +29,13 @@ class DSL:
         self._grammar['B1'] = ['DSL.isDoubles(a)', 'DSL.containsNumber(a, NUMBER )', 'DSL.actionWinsColumn(state,a)', 'DSL.hasWonColumn(state,a)', 
                                'DSL.numberPositionsProgressedThisRoundColumn(state, NUMBER ) > SMALL_NUMBER and DSL.isStopAction(a)', 'DSL.isStopAction(a)',
                                'DSL.numberPositionsConquered(state, NUMBER ) > SMALL_NUMBER and DSL.containsNumber(a, NUMBER )']
+        if bust_rules:
+            self._grammar['B1'].append('DSL.bustProbability(state) > PROBABILITY and DSL.isStopAction(a)')
         self._grammar['NUMBER'] = ['2', '3', '4', '5', '6']
 #         self._grammar['NUMBER'] = ['2', '3', '4', '5', '6', '7', '8', '9', '10', '11', '12']
         self._grammar['SMALL_NUMBER'] = ['0', '1', '2']
 #         self._grammar['SMALL_NUMBER'] = ['0', '1', '2', '3', '4', '5']
+        self._grammar['PROBABILITY'] = ['0.1', '0.2', '0.3', '0.4', '0.5']
         
         self._reservedWords = ['if']
         
@@ -42,7 +56,7 @@ class DSL:
         if depth == 0 and symbol == self.start:
             index = 0
         else:
-            index = random.randint(0, len(self._grammar[symbol]) - 1)
+            index = self.generator.randint(0, len(self._grammar[symbol]) - 1)
         random_rule = self._grammar[symbol][index]
         
         symbols = random_rule.split()
@@ -74,10 +88,13 @@ class DSL:
     
     @staticmethod
     def actionWinsColumn(state, action):
-        copy_state = copy.deepcopy(state)
-        copy_state.play(action)
-        columns_won = copy_state.columns_won_current_round()
-        columns_won_previously = state.columns_won_current_round()
+        # Play the action in place and undo it afterwards instead of
+        # deep-copying the whole state. unmake also takes back the dice
+        # play() draws, so the probe does not change the game's rolls.
+        columns_won_previously = list(state.columns_won_current_round())
+        token = state.make_move(action)
+        columns_won = list(state.columns_won_current_round())
+        state.unmake(token)
         if len(columns_won) > 0 and columns_won != columns_won_previously:
             return True
         return False
@@ -102,4 +119,14 @@ class DSL:
     def isStopAction(action):
         if isinstance(action, str) and action == 'n':
             return True
-        return False
\ No newline at end of file
+        return False
+
+    @staticmethod
+    def bustProbability(state):
+        # Exact probability of busting with the next roll (table lookup).
+        return bust_probability(state)
+
+    @staticmethod
+    def expectedProgress(state):
+        # Expected number of cells advanced with the next roll.
+        return expected_progress(state)
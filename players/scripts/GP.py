@@ -4,13 +4,23 @@ import shutil
 import glob
 import copy
 import os
+import numpy as np
 
 from players.scripts.DSL import DSL
 from players.scripts.Script import Script
 from game import Game
+from random_streams import python_random, spawn_seeds
 
 class GP:
-    def __init__(self, generations, mutation_rate, population_size, elite, tournament_size, number_matches, invaders, run_id = 0):
+    def __init__(self, generations, mutation_rate, population_size, elite, tournament_size, number_matches, invaders, run_id = 0, seed = None, bust_rules = False):
+        """
+        - seed (an int or a numpy SeedSequence) makes the evolution
+          reproducible: the generation, selection and mutation of scripts
+          and the dice of the matches get their own streams spawned from it.
+          None uses the random module.
+        - bust_rules is a boolean telling if the grammar has the bust
+          probability rule (see DSL).
+        """
         self._generations = generations
         self._mutation_rate = mutation_rate
         self._population_size = population_size
@@ -30,7 +40,12 @@ class GP:
         
         self._population = []
         
-        self._dsl = DSL()
+        self._generator = random
+        self._games_seed = None
+        if seed is not None:
+            evolution_seed, self._games_seed = spawn_seeds(seed, 2)
+            self._generator = python_random(evolution_seed)
+        self._dsl = DSL(self._generator, bust_rules)
         
         for _ in range(self._population_size):
             script = self._dsl.generateRandomScript(self._id_counter)
@@ -71,9 +86,9 @@ class GP:
                         self._population[j].addFitness(-1)
     
     def _tournament(self):
-        best_individual = self._population[random.randint(0, self._population_size - 1)]
+        best_individual = self._population[self._generator.randint(0, self._population_size - 1)]
         for _ in range(0, self._tournament_size - 1):
-            rand_individual = self._population[random.randint(0, self._population_size - 1)]
+            rand_individual = self._population[self._generator.randint(0, self._population_size - 1)]
             if best_individual.getFitness() < rand_individual.getFitness():
                 best_individual = rand_individual
         return best_individual
@@ -81,8 +96,8 @@ class GP:
     def _crossover(self, parent1, parent2):
         children = []
         
-        child1_1, child2_1 = parent1.generateSplit()
-        child1_2, child2_2 = parent2.generateSplit()
+        child1_1, child2_1 = parent1.generateSplit(self._generator)
+        child1_2, child2_2 = parent2.generateSplit(self._generator)
         
         ind1 = child1_1 + child2_2
         ind2 = child1_2 + child2_1
@@ -147,7 +162,7 @@ class GP:
                         if len(next_population) == self._population_size:
                             break
                 else:
-                    random_elite = next_population[random.randint(0, self._elite - 1)]
+                    random_elite = next_population[self._generator.randint(0, self._elite - 1)]
                     copy_random_elite = copy.deepcopy(random_elite)
                     copy_random_elite.forcedMutation(self._mutation_rate, self._dsl)
                     next_population.append(copy_random_elite)
@@ -192,7 +207,10 @@ class GP:
             instance_script2 = self._scripts_instances[script2_name]
         
 #         game = Game(n_players = 2, dice_number = 4, dice_value = 6, column_range = [2, 12], offset = 2, initial_height = 2)
-        game = Game(n_players = 2, dice_number = 4, dice_value = 3, column_range = [2, 6], offset = 2, initial_height = 1)
+        rng = None
+        if self._games_seed is not None:
+            rng = np.random.default_rng(spawn_seeds(self._games_seed, 1)[0])
+        game = Game(n_players = 2, dice_number = 4, dice_value = 3, column_range = [2, 6], offset = 2, initial_height = 1, rng = rng)
         
         is_over = False
         who_won = None
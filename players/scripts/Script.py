@@ -66,11 +66,11 @@ class Script{0}(Player):
         has_mutated = False
         for i in range(len(self._rules)):
             #checking if mutation will happen
-            if random.randint(0, 100) < rate * 100:
+            if dsl.generator.randint(0, 100) < rate * 100:
                 has_mutated = True
                 rule = dsl.generateRandomScript('SR').getRules()
                 #verify if mutation replaces old rule
-                if random.randint(0, 100) < rate * 100:
+                if dsl.generator.randint(0, 100) < rate * 100:
                     mutated_rules.append(rule[0])
                 else:
                     mutated_rules.append(self._rules[i])
@@ -87,7 +87,7 @@ class Script{0}(Player):
         for i in range(len(self._rules)):
             rule = dsl.generateRandomScript('SR').getRules()
             #verify if mutation replaces old rule
-            if random.randint(0, 100) < rate * 100:
+            if dsl.generator.randint(0, 100) < rate * 100:
                 mutated_rules.append(rule[0])
             else:
                 mutated_rules.append(self._rules[i])
@@ -95,8 +95,8 @@ class Script{0}(Player):
                 
         self._rules = mutated_rules
     
-    def generateSplit(self):
-        split_index = random.randint(0, len(self._rules))
+    def generateSplit(self, generator=random):
+        split_index = generator.randint(0, len(self._rules))
         split1 = self._rules[0:split_index + 1]
         split2 = self._rules[split_index + 1: len(self._rules) + 1]
                 
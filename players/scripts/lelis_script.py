@@ -1,5 +1,4 @@
 from players.player import Player
-import random
 from players.scripts.DSL import DSL
 
 class LelisPlayer(Player):
@@ -19,4 +18,4 @@ class LelisPlayer(Player):
             
             if DSL.isDoubles(a):
                 return a            
-        return random.choice(actions)
\ No newline at end of file
+        return self.random.choice(actions)
\ No newline at end of file
@@ -0,0 +1,18 @@
+from players.player import Player
+
+class TablebasePlayer(Player):
+
+    def __init__(self, tablebase):
+        """
+        Player choosing the optimal action given by 'tablebase' (a
+        Tablebase, see tablebase.py). Positions missing from the table are
+        played randomly.
+        """
+
+        self.tablebase = tablebase
+
+    def get_action(self, game):
+        action = self.tablebase.best_action(game)
+        if action is None:
+            return self.random.choice(game.available_moves())
+        return action
@@ -1,53 +1,255 @@
 import math, random
+import array
 import numpy as np
 import copy
 import collections
 from players.player import Player
+from tree_store import TreeStore
+from root_parallel import RootParallel
 from abc import abstractmethod
 from collections import defaultdict
 import time
 
 class Node:
+    __slots__ = ('_state', 'packed', 'player_turn', 'parent', 'key',
+                    'n_visits', 'actions', 'children', 'n_a', 'q_a', 'p_a')
+
     def __init__(self, state, parent=None):
         """
-        - n_visits is the number of visits in this node
-        - n_a is a dictionary {key, value} where key is the action taken from 
-          this node and value is the number of times this action was chosen.
-        - q_a is a dictionary {key, value} where key is the action taken from
-          this node and value is the mean reward of the simulation that passed
-          through this node and used action 'a'.
-        - p_a is a dictionary {key, value} where key is the action taken from
-          this node and value is the probability given by the trained network
-          to choose this action. Value updated in the expand_children() method
-          from the MCTS class.
+        - state is the Game of this node. It may be dropped to save memory
+          (see StateBudget), in which case it is rebuilt from packed the
+          next time it is read.
+        - packed is None, or a tuple (budget, data) if the state of this
+          node was dropped once: data is the encoding of the state (see
+          Game.to_bytes) and budget the StateBudget that dropped it. It is
+          kept when the state is rebuilt, since the state of an expanded
+          node does not change, so dropping it again costs nothing.
+        - player_turn is the player to move in state, set when the node is
+          expanded so that selection does not need the state.
         - parent is a Node object. 'None' if this node is the root of the tree.
-        - children is a dictionary {key, value} where key is the action 
-          taken from this node and value is the resulting node after applying 
-          the action.
-        - action_taken is the action taken from parent to get to this node.
+        - key is the key of this node in the transposition table of the
+          player (see UCTPlayer.transposition_table), 'None' if it is not
+          in it.
+        - n_visits is the number of visits in this node
+        - actions is the list of actions that can be taken from this node,
+          empty until the node is expanded (see expand).
+        - children is a list parallel to actions where children[i] is the
+          Node resulting from applying actions[i]. Children are created
+          lazily: children[i] is None until the action is first selected
+          (see UCTPlayer.get_child).
+        - n_a, q_a and p_a are arrays parallel to actions. n_a[i] is the
+          number of times actions[i] was chosen, q_a[i] is the mean reward
+          of the simulations that passed through this node and used
+          actions[i], and p_a[i] is the probability given by the trained
+          network to choose actions[i] (only set by AlphaZeroPlayer, see
+          AlphaZeroPlayer.add_dist_prob_to_children).
+        Nodes use __slots__ and unexpanded nodes share empty tuples instead
+        of owning containers, so a tree holds many more nodes in the same
+        memory (see benchmark_tree_memory in benchmarks.py).
         """
-        self.state = state
-        self.n_visits = 0
-        self.n_a = {}
-        self.q_a = {}
-        self.p_a = {}
-        # These will initialize value = 0 for whichever keys yet to be added.
-        self.n_a = defaultdict(lambda: 0, self.n_a)
-        self.q_a = defaultdict(lambda: 0, self.q_a)
-        self.p_a = defaultdict(lambda: 0, self.q_a)
+        self._state = state
+        self.packed = None
+        self.player_turn = None
         self.parent = parent
-        self.children = {}
-        self.action_taken = None
+        self.key = None
+        self.n_visits = 0
+        self.actions = ()
+        self.children = ()
+        self.n_a = ()
+        self.q_a = ()
+        self.p_a = ()
+
+    @property
+    def state(self):
+        if self._state is None and self.packed is not None:
+            budget, data = self.packed
+            self._state = budget.unpack(self, data)
+        return self._state
+
+    @state.setter
+    def state(self, state):
+        self._state = state
+        self.packed = None
+
+    def pack(self, budget):
+        """
+        Drop the state of this node, keeping only its encoding. 'budget' is
+        the StateBudget rebuilding it when it is read again.
+        """
+        if self._state is not None:
+            if self.packed is None:
+                self.packed = (budget, self._state.to_bytes())
+            self._state = None
+
+    def release(self):
+        """
+        Drop the state, the statistics and the children of this node,
+        evicted from the transposition table, so that the nodes only it
+        reaches are freed. Its parents replace it with a new node the next
+        time they select it (see UCTPlayer.get_child).
+        """
+        self._state = None
+        self.packed = None
+        self.parent = None
+        self.actions = ()
+        self.children = ()
+        self.n_a = ()
+        self.q_a = ()
+        self.p_a = ()
+
+    def is_released(self):
+        """Return True if the node was released (see release)."""
+        return self._state is None and self.packed is None
+
+    def expand(self, actions):
+        """
+        Set the actions of this node. Their statistics start at 0 and their
+        children are not created yet.
+        """
+        self.player_turn = self.state.player_turn
+        self.actions = list(actions)
+        self.children = [None] * len(self.actions)
+        self.n_a = array.array('l', [0]) * len(self.actions)
+        self.q_a = array.array('d', [0.0]) * len(self.actions)
+
+    def add_action(self, action, child):
+        """
+        Append 'action', leading to the Node 'child', to the actions of this
+        node and return its index.
+        """
+        self.actions.append(action)
+        self.children.append(child)
+        self.n_a.append(0)
+        self.q_a.append(0.0)
+        return len(self.actions) - 1
 
+    def find_child(self, action):
+        """
+        Return the child Node of 'action', None if 'action' is not an action
+        of this node or its child was not created yet.
+        """
+        if action in self.actions:
+            return self.children[self.actions.index(action)]
+        return None
 
     def is_expanded(self):
         """Return a boolean."""
-        return len(self.children) > 0
+        return len(self.actions) > 0
+
+
+class ChanceNode(Node):
+    __slots__ = ()
+
+    def __init__(self, state, parent=None):
+        """
+        Node whose state is waiting for the dice to be rolled (used when
+        UCTPlayer.chance_nodes is True). Its actions are the sorted dice
+        rolls sampled so far: children are created lazily as rolls are
+        sampled, so there is one child per distinct roll multiset (126
+        for four six-sided dice). The current_roll of state is the one
+        sampled when the state was created and is only used by rollouts
+        starting at this node.
+        """
+        super().__init__(state, parent)
+        self.expand([])
+
+    def is_expanded(self):
+        """
+        Return a boolean. Chance nodes have no children to expand beforehand,
+        so they are expanded as soon as they are visited.
+        """
+        return self.n_visits > 0
     
 
+class StateBudget:
+    def __init__(self, max_states):
+        """
+        Bound on the number of states of interior nodes kept by a UCTPlayer
+        (see UCTPlayer.max_interior_states). Once every child of a node is
+        created, its state is no longer read by the search (Node.player_turn
+        gives the player to move), so the states of the oldest such nodes
+        are dropped and only their encoding (Game.to_bytes, a few dozen
+        bytes) is kept. They are rebuilt from it if read again, e.g. when
+        the node becomes the root.
+        Nodes whose children are not all created keep their state: it is
+        cloned for every new child, and rebuilding it would also rebuild
+        the columns it shares with its children (see Board).
+        - max_states is the maximum number of states kept.
+        - materialized is the deque of the interior nodes whose state is
+          kept, oldest first.
+        - game_class, config and dice_stream are used to rebuild the states:
+          the class of the states (Game or CompactGame), the arguments of
+          its from_bytes and the DiceStream shared by the clones of the
+          game searched, if it is seeded (see set_template).
+        """
+
+        self.max_states = max_states
+        self.materialized = collections.deque()
+        self.game_class = None
+        self.config = None
+        self.dice_stream = None
+
+    def set_template(self, state):
+        """Rebuild the dropped states like 'state', a state of the tree."""
+
+        self.game_class = type(state)
+        self.config = (state.n_players, state.dice_number, state.dice_value,
+                        state.column_range, state.offset, state.initial_height)
+        self.dice_stream = state.dice_stream
+
+    def add(self, node):
+        """Count the state of the interior node 'node' in the budget."""
+
+        self.materialized.append(node)
+
+    def unpack(self, node, data):
+        """
+        Return the state of 'node' rebuilt from 'data' (see Node.pack),
+        counting it in the budget again. The columns it has in common with
+        the state of the parent of 'node' are shared with it.
+        """
+
+        base = None
+        if node.parent is not None:
+            base = node.parent.state
+        state = self.game_class.from_bytes(data, *self.config, base=base)
+        state.dice_stream = self.dice_stream
+        self.materialized.append(node)
+        return state
+
+    def enforce(self):
+        """
+        Drop the states of the oldest materialized interior nodes until at
+        most max_states are kept. Only call it between simulations, when no
+        state of the tree is being modified.
+        """
+
+        while len(self.materialized) > self.max_states:
+            self.materialized.popleft().pack(self)
+
+    def clear(self):
+        """Forget every node."""
+
+        self.materialized.clear()
+
+    def __getstate__(self):
+        # Pickled Node objects (see Network_UCT.clone) carry their budget,
+        # but not the other nodes it tracks.
+        state = self.__dict__.copy()
+        state['materialized'] = collections.deque()
+        return state
+
+
 class UCTPlayer(Player):
+    # If False, children are selected by UCB1. If True, by the modified PUCT
+    # of AlphaZero, which weights the exploration term of every child by
+    # the probability p_a given by the network (see select_child).
+    prior_exploration = False
+
     @abstractmethod
-    def __init__(self, c, n_simulations):
+    def __init__(self, c, n_simulations, transposition_table_size=0,
+                    chance_nodes=False, tree_store_size=0,
+                    max_interior_states=0):
         """
         - root is a Node instance representing the root of the game tree.
         - action stores the action this player will return for the game passed
@@ -57,13 +259,81 @@ class UCTPlayer(Player):
           passed as parameter in the get_action method.
         - c is the constant the balance exploration and exploitation.
         - n_simulations is the number of simulations made in the UCT algorithm.
+        - transposition_table_size is the maximum number of nodes kept in the
+          transposition table. If it is 0 (default), no table is used and
+          the search space is a tree. Otherwise, children reaching the same
+          position (same Zobrist hash) through different move orders share a
+          single Node, turning the tree into a DAG. The dice roll is left out
+          of the key: each child already holds a single random roll sampled
+          when it was created, and the roll sampled through one move order is
+          as good a sample as the one through another. When the table is
+          full, the least recently used nodes are evicted and released (see
+          evict_transpositions), so the nodes of the tree are bounded too.
+        - transposition_table is an OrderedDict {key, value} where key is the
+          position hash and value is the Node of that position, ordered from
+          the least to the most recently created or selected. 'None' if no
+          table is used.
+        - chance_nodes is a boolean. If False (default), a child state keeps
+          the dice roll made when the child was created, so each node
+          commits to a single roll. If True, states waiting for a roll
+          (after 'y', after 'n' and after a bust) are ChanceNode objects
+          whose children are the possible rolls, sampled with their actual
+          probabilities, so statistics aggregate over rolls.
+        - tree_store_size is the maximum number of nodes of the tree when it
+          is kept in a TreeStore (tree_store.py), arrays preallocated once
+          holding the encoded states too, instead of Node objects. If it is
+          0 (default), Node objects are used. A TreeStore keeps memory
+          bounded however many simulations are run and releases the
+          discarded part of the tree in O(1) when the root advances. It
+          cannot be combined with a transposition table or chance nodes.
+          root is then a Node holding a copy of the root statistics of the
+          last search (see store_root_view).
+        - tree_store is the TreeStore of the player, 'None' if not used.
+        - max_interior_states is the maximum number of states kept by the
+          Node objects whose children are all created. If it is 0 (default),
+          all of them are kept. Otherwise, the states beyond it are dropped
+          and rebuilt from their encoding if needed (see StateBudget).
+          Leaves always keep their state, which their next visit expands
+          from.
+        - state_budget is the StateBudget of the player, 'None' if not used.
+        - root_parallel is the RootParallel (root_parallel.py) pool of worker
+          processes searching for the player, 'None' if the player searches
+          alone (see start_root_parallel).
+        - root_roll is the dice roll of the game of the last run_UCT. When
+          the action chosen leads to a ChanceNode ('y' or 'n', which do not
+          roll), it is the roll the next play is chosen with, so the next
+          search can reuse the child of that roll (see search_tree).
         """
         self.root = None
+        self.root_roll = None
         self.action = None
         self.dist_probability = None
         self.c = c
         self.n_simulations = n_simulations
+        self.transposition_table_size = transposition_table_size
+        self.transposition_table = None
+        if transposition_table_size > 0:
+            self.transposition_table = collections.OrderedDict()
+        self.chance_nodes = chance_nodes
+        self.tree_store_size = tree_store_size
+        self.tree_store = None
+        if tree_store_size > 0:
+            if transposition_table_size > 0 or chance_nodes:
+                raise ValueError('A tree store cannot be used with a '
+                                    'transposition table or chance nodes.')
+            self.tree_store = TreeStore(tree_store_size)
+        self.max_interior_states = max_interior_states
+        self.state_budget = None
+        if max_interior_states > 0:
+            self.state_budget = StateBudget(max_interior_states)
+        self.root_parallel = None
+
+    def __getstate__(self):
+        """The pool of worker processes is not sent to other processes."""
 
+        state = self.__dict__.copy()
+        state['root_parallel'] = None
+        return state
 
     @abstractmethod
     def expand_children(self, parent):
@@ -78,21 +348,18 @@ class UCTPlayer(Player):
         """
         pass
 
-    @abstractmethod
-    def calculate_ucb_max(self, node):
+    def exploration_bonus(self, log_n_visits, n_a, p_a):
         """
-        Return the node UCB value of the MAX player.
-        Concrete classes must implement this method.
+        Return the array of the exploration terms of the UCB values of the
+        children of a node (see select_child_store). log_n_visits is the
+        log of the number of visits of the node, n_a and p_a are the arrays
+        of the visits (all greater than 0) and priors of the children. The
+        terms are the ones of select_child.
         """
-        pass
 
-    @abstractmethod
-    def calculate_ucb_min(self, node):
-        """
-        Return the node UCB value of the MIN player.
-        Concrete classes must implement this method.
-        """
-        pass
+        if self.prior_exploration:
+            return self.c * p_a * (math.sqrt(log_n_visits) / n_a)
+        return self.c * np.sqrt(log_n_visits / n_a)
 
     @abstractmethod
     def select_action(self):
@@ -113,10 +380,222 @@ class UCTPlayer(Player):
         self.root = None
         self.action = None
         self.dist_probability = None
+        self.clear_node_caches()
+        if self.tree_store is None and self.tree_store_size > 0:
+            self.tree_store = TreeStore(self.tree_store_size)
+        if self.tree_store is not None:
+            self.tree_store.clear()
+
+    def clear_node_caches(self):
+        """
+        Forget the nodes of the discarded tree kept by the transposition
+        table and the state budget, if there are any.
+        """
+
+        self.clear_transposition_table()
+        if self.state_budget is not None:
+            self.state_budget.clear()
+
+    def clear_transposition_table(self):
+        """Remove every node from the transposition table, if there is one."""
+
+        if self.transposition_table is not None:
+            for node in self.transposition_table.values():
+                node.key = None
+            self.transposition_table.clear()
+
+    def evict_transpositions(self):
+        """
+        Evict the least recently used nodes of the transposition table until
+        at most transposition_table_size are left, and release them (see
+        Node.release) but the root, so that the subtrees only they reach are
+        freed. The table grows beyond its size by the nodes created during
+        a simulation: only call it between simulations, when no node is on
+        a search path.
+        """
+
+        table = self.transposition_table
+        while len(table) > self.transposition_table_size:
+            _, node = table.popitem(last=False)
+            node.key = None
+            if node is not self.root:
+                node.release()
+
+    def get_child_node(self, parent, action):
+        """
+        Return the Node resulting from applying 'action' to the state of the
+        "parent" node. If a transposition table is used and the resulting
+        position is already in it, the stored Node is returned instead of a
+        new one, so its statistics are shared among all of its parents.
+        """
+
+        if self.transposition_table is None:
+            child_game = parent.state.clone()
+            child_game.play(action)
+            return self.create_node(child_game, parent)
+
+        # Play the action in place and only clone the resulting state if the
+        # position is not in the table yet.
+        token = parent.state.make_move(action)
+        key = parent.state.hash_key()
+        child = self.transposition_table.get(key)
+        if child is not None:
+            self.transposition_table.move_to_end(key)
+        else:
+            child = self.create_node(parent.state.clone(), parent)
+            child.key = key
+            self.transposition_table[key] = child
+        parent.state.unmake(token)
+        return child
+
+    def get_child(self, node, i):
+        """
+        Return the child Node of node.actions[i], creating it (see
+        get_child_node) if it is the first time the action is selected or
+        if it was released. A child in the transposition table becomes its
+        most recently used node.
+        """
+
+        child = node.children[i]
+        if child is None:
+            child = self.get_child_node(node, node.actions[i])
+            node.children[i] = child
+            if self.state_budget is not None and None not in node.children:
+                self.state_budget.add(node)
+        elif child.key is not None:
+            self.transposition_table.move_to_end(child.key)
+        elif child.is_released():
+            child = self.get_child_node(node, node.actions[i])
+            node.children[i] = child
+        return child
+
+    def create_node(self, state, parent):
+        """
+        Return a new node for "state". It is a ChanceNode if chance nodes are
+        used and "state" is waiting for a dice roll, and a Node otherwise.
+        """
+
+        if self.chance_nodes and state.dice_action \
+            and not state.is_finished()[1]:
+            return ChanceNode(state, parent)
+        return Node(state, parent)
+
+    def select_roll(self, node):
+        """
+        Sample a dice roll for the ChanceNode "node" and return the index
+        of its outcome (the sorted roll) in node.actions together with the
+        resulting child, which is created if this roll was not sampled
+        before. If the player has no plays with the roll, the bust is
+        applied and the child waits for the next player's roll.
+        """
+
+        roll = node.state.roll_dice()
+        outcome = tuple(sorted(roll))
+        if outcome in node.actions:
+            i = node.actions.index(outcome)
+            return i, node.children[i]
+        child_game = node.state.clone()
+        child_game.current_roll = roll
+        # The roll is made: unless it busts the player, the child chooses a
+        # combination, although its state has dice_action set like the
+        # states waiting for a roll (see create_node).
+        if child_game.is_player_busted(child_game.available_moves()):
+            child = self.create_node(child_game, node)
+        else:
+            child = Node(child_game, node)
+        return node.add_action(outcome, child), child
+
+    def start_root_parallel(self, n_workers, network_spec=None):
+        """
+        Search with 'n_workers' worker processes from now on (root
+        parallelization). At every move, each worker runs its share of
+        n_simulations from the same root with its own seed, and the visits
+        and values of the actions of the root are merged before choosing
+        the action, so distribution_probability and select_action work as
+        with a single search. The workers start from a new tree at every
+        move and the pool is kept until stop_root_parallel is called.
+        - network_spec is the dictionary of the arguments of
+          models.define_model rebuilding the network of the player in the
+          workers, None if the player has no network (see
+          AlphaZeroPlayer.start_root_parallel).
+        """
+
+        self.stop_root_parallel()
+        weights = None
+        if network_spec is not None:
+            weights = self.network.get_weights()
+        self.root_parallel = RootParallel(self, n_workers, network_spec,
+                                            weights)
+
+    def stop_root_parallel(self):
+        """Stop the worker processes, if any, and search alone again."""
+
+        if self.root_parallel is not None:
+            self.root_parallel.shutdown()
+            self.root_parallel = None
+
+    def search_copy(self):
+        """
+        Return a copy of the player without its tree, its network and its
+        worker processes, sent to the workers of RootParallel.
+        """
+
+        worker = copy.copy(self)
+        worker.root = None
+        worker.root_parallel = None
+        if hasattr(self, 'network'):
+            worker.network = None
+        if self.transposition_table is not None:
+            worker.transposition_table = collections.OrderedDict()
+        if self.tree_store is not None:
+            # The arrays are allocated by the worker (see reset_tree).
+            worker.tree_store = None
+        if self.state_budget is not None:
+            worker.state_budget = StateBudget(self.max_interior_states)
+        return worker
+
+    def search_root(self, game):
+        """
+        Run n_simulations from a new tree whose root is 'game' and return a
+        Node holding the statistics of its root.
+        """
+
+        self.reset_tree()
+        if self.tree_store is not None:
+            return self.store_root_view(self.search_store(game, []))
+        self.search_tree(game, [])
+        return self.root
+
+    def run_root_parallel(self, game):
+        """
+        Root parallel version of run_UCT (see start_root_parallel). Each
+        worker gets a seed drawn from the random choices of the player, so
+        a seeded player plays the same moves with the same number of
+        workers. self.root is a Node holding the merged statistics.
+        """
+
+        seeds = [self.random.getrandbits(64)
+                    for _ in range(self.root_parallel.n_workers)]
+        actions, n_a, q_a, n_visits = self.root_parallel.search(
+                                    game, self.n_simulations, seeds)
+        self.root = Node(game.clone())
+        self.root.expand(actions)
+        self.root.n_visits = n_visits
+        self.root.n_a = n_a
+        self.root.q_a = q_a
+        dist_probability = self.distribution_probability(game)
+        action = self.select_action(game, self.root, dist_probability)
+
+        return action, dist_probability
 
     def get_action(self, game, actions_taken):
         """ Return the action given by the UCT algorithm. """
-        action, dist_probability = self.run_UCT(game, actions_taken)
+        if self.root_parallel is not None:
+            action, dist_probability = self.run_root_parallel(game)
+        elif self.tree_store is not None:
+            action, dist_probability = self.run_UCT_store(game, actions_taken)
+        else:
+            action, dist_probability = self.run_UCT(game, actions_taken)
         self.action = action
         self.dist_probability = dist_probability
         return action
@@ -132,51 +611,130 @@ class UCTPlayer(Player):
     def run_UCT(self, game, actions_taken):
         """Main routine of the UCT algoritm."""
 
+        self.search_tree(game, actions_taken)
+        dist_probability = self.distribution_probability(game)
+        action = self.select_action(game, self.root, dist_probability)
+        self.root_roll = game.current_roll
+        # The new root has no statistics left from its visits as a leaf (see
+        # backpropagate), so none has to be removed.
+        self.root = self.get_child(self.root,
+                                    self.root.actions.index(action))
+
+        return action, dist_probability 
+
+    def search_tree(self, game, actions_taken):
+        """
+        Move self.root to the position of 'game' (reusing the subtree of the
+        previous search when it is still relevant) and run the simulations
+        from it.
+        """
+
         # If current tree is null, create one using game
         if self.root == None:
             self.root = Node(game.clone())
-        # If it's not, check if there are actions from actions_taken to update
-        # the tree from this player.
-        # If the list is not empty, update the root accordingly.
-        # If the list is empty, that means this player hasn't passed the turn,
-        # therefore the root is already updated.
-        elif len(actions_taken) != 0:
-            for i in range(len(actions_taken)):
-                # Check if action from history is in current root.children.
-                if actions_taken[i][0] in self.root.children:
-                    # Check if the actions are made from the same player
-                    child_node = self.root.children[actions_taken[i][0]]
-                    if child_node.state.player_turn == actions_taken[i][1] \
-                        and set(self.root.state.available_moves()) \
-                        == set(game.available_moves()):
-                        self.root = child_node
-                    else:
-                        self.root = None
-                        self.root = Node(actions_taken[i][2].clone())
-                else:
-                    self.root = None
-                    self.root = Node(actions_taken[i][2].clone())
-        # This means the player is still playing (i.e.: didn't choose 'n').
         else:
-            # Therefore, check if current root has the same children as "game"
-            # offers. If not, reset the tree.
-            if set(self.root.children) != set(game.available_moves()):
+            # If the list is empty, that means this player hasn't passed the
+            # turn, therefore the root is already updated.
+            if len(actions_taken) != 0:
+                self.follow_actions(actions_taken)
+            # With chance nodes, the root might be waiting for the roll "game"
+            # has already made. In this case, move to the child of that roll.
+            if isinstance(self.root, ChanceNode):
+                outcome = tuple(sorted(game.current_roll))
+                self.root = self.root.find_child(outcome)
+            # Check if current root has the same children as "game" offers. If
+            # not, reset the tree.
+            if self.root is None or isinstance(self.root, ChanceNode) \
+                or set(self.root.actions) != set(game.available_moves()):
                 self.root = None
                 self.root = Node(game.clone())
+                self.clear_node_caches()
 
         #Expand the children of the root if it is not expanded already
         if not self.root.is_expanded():
             self.expand_children(self.root)
 
         root_state = self.root.state.clone()
+        if self.state_budget is not None:
+            self.state_budget.set_template(root_state)
+        self.run_simulations(root_state)
+
+    def follow_actions(self, actions_taken):
+        """
+        Move self.root along the plays of actions_taken (the plays made by
+        the other player since this player's last action, see run_UCT),
+        starting over from the game after a play whenever the tree does not
+        hold it.
+        """
+
+        for i in range(len(actions_taken)):
+            # With chance nodes, the root might be waiting for the roll the
+            # action was chosen with: the roll of the game before it ('y'
+            # and 'n' do not roll). Move to the child of that roll.
+            if isinstance(self.root, ChanceNode):
+                if i == 0:
+                    roll = self.root_roll
+                else:
+                    roll = actions_taken[i - 1][2].current_roll
+                child_node = self.root.find_child(tuple(sorted(roll)))
+                if child_node is not None:
+                    self.root = child_node
+            # Check if action from history is one of the current root's.
+            if actions_taken[i][0] in self.root.actions:
+                index = self.root.actions.index(actions_taken[i][0])
+                child_node = self.get_child(self.root, index)
+                if self.is_same_position(child_node.state,
+                                            actions_taken[i][2]):
+                    self.root = child_node
+                    continue
+            self.root = None
+            self.root = Node(actions_taken[i][2].clone())
+            self.clear_node_caches()
+
+    def is_same_position(self, state, game):
+        """
+        Return True if 'state', the Game of a child reached through a play
+        of actions_taken, is the position 'game' the play led to, so that
+        the search can go on from the child (see follow_actions and
+        search_store). Without chance nodes, a child commits to the roll
+        sampled when it was created, which must be the actual one too.
+        """
+
+        return state.hash_key(not self.chance_nodes) \
+                == game.hash_key(not self.chance_nodes)
+
+    def run_simulations(self, root_state):
+        """
+        Run n_simulations from self.root, whose state is reset to a clone of
+        'root_state' at the start of each simulation. Every node keeps its
+        state, so the descent plays no move: a simulation only clones the
+        state of the leaf it creates. Descending with make_move and unmake
+        on a single scratch state would play and undo every move of the
+        path instead, about 9 per simulation (see benchmark_make_move in
+        benchmarks.py). The memory of the states is bounded by
+        max_interior_states or tree_store_size instead.
+        """
 
         for _ in range(self.n_simulations):
             node = self.root
             node.state = root_state.clone()
             search_path = [node]
+            # edges[k] is the index of the action chosen in search_path[k].
+            edges = []
+            cycle_found = False
             while node.is_expanded():
-                action, new_node = self.select_child(node)
-                node.action_taken = action
+                if isinstance(node, ChanceNode):
+                    i, new_node = self.select_roll(node)
+                else:
+                    i, new_node = self.select_child(node)
+                edges.append(i)
+                # With a transposition table, a position can be reached again
+                # after both players bust in a row. Stop the descent there
+                # instead of walking the cycle.
+                if self.transposition_table is not None \
+                    and new_node in search_path:
+                    cycle_found = True
+                    break
                 search_path.append(new_node)
                 node = new_node
             # At this point, a leaf was reached.
@@ -184,9 +742,12 @@ class UCTPlayer(Player):
             # backpropagates the reward returned from the simulation.
             # If it has been visited, then expand its children, choose the one
             # with the highest ucb score and do a rollout from there.
-            if node.n_visits == 0:
+            if cycle_found:
+                rollout_value = self.rollout(new_node)
+                self.backpropagate(search_path, edges, rollout_value)
+            elif node.n_visits == 0:
                 rollout_value = self.rollout(node)
-                self.backpropagate(search_path, rollout_value)
+                self.backpropagate(search_path, edges, rollout_value)
             else:
                 _, terminal_state = node.state.is_finished()
                 # Special case: if "node" is actually a leaf of the game (not 
@@ -195,72 +756,286 @@ class UCTPlayer(Player):
                 # of a leaf.
                 if terminal_state:
                     rollout_value = self.rollout(node)
-                    self.backpropagate(search_path, rollout_value)
+                    self.backpropagate(search_path, edges, rollout_value)
                 else:
                     self.expand_children(node)
-                    action, new_node = self.select_child(node)
-                    node.action_taken = action
+                    i, new_node = self.select_child(node)
+                    edges.append(i)
                     search_path.append(new_node)
                     node = new_node
                     rollout_value = self.rollout(node)
-                    self.backpropagate(search_path, rollout_value)
-
-        dist_probability = self.distribution_probability(game)
-        action = self.select_action(game, self.root, dist_probability)
-        self.root = self.root.children[action]
-        if self.root.n_a:
-            self.root.n_a.pop(action)
-
-        return action, dist_probability 
+                    self.backpropagate(search_path, edges, rollout_value)
+            if self.state_budget is not None:
+                self.state_budget.enforce()
+            if self.transposition_table is not None:
+                self.evict_transpositions()
 
     def get_tree_size(self, node):
         """
         Return the number of nodes in the tree starting from self.root.
-        Currently works only when node == self.root.
+        Currently works only when node == self.root. Nodes shared through the
+        transposition table are counted once.
         """
 
         # If the tree has not been created yet.
         if node == None:
             return 0
-        n_nodes = 1
-        for child in node.children:
-            n_nodes += self.get_tree_size(node.children[child])
-        return n_nodes
+        visited = {id(node)}
+        nodes_to_visit = [node]
+        while nodes_to_visit:
+            for child in nodes_to_visit.pop().children:
+                if child is not None and id(child) not in visited:
+                    visited.add(id(child))
+                    nodes_to_visit.append(child)
+        return len(visited)
+
+    def run_UCT_store(self, game, actions_taken):
+        """
+        Main routine of the UCT algorithm when the tree is kept in
+        self.tree_store. The search is the same as run_UCT's, and so is the
+        reuse of the tree (see search_store).
+        """
+
+        root = self.search_store(game, actions_taken)
+        self.root = self.store_root_view(root)
+        dist_probability = self.distribution_probability(game)
+        action = self.select_action(game, self.root, dist_probability)
+        child = self.tree_store.find_child(root, action)
+        self.get_store_child(child, self.root.state)
+        self.tree_store.advance_root(child)
+
+        return action, dist_probability
+
+    def search_store(self, game, actions_taken):
+        """
+        Same as search_tree for the tree of self.tree_store. Return the
+        index of the root.
+        """
+
+        store = self.tree_store
+        root = store.root
+        # If current tree is null, create one using game
+        if root < 0:
+            root = store.new_root(game.clone())
+        else:
+            # Move the root along the plays of actions_taken, as
+            # follow_actions does.
+            for action, _, action_game in actions_taken:
+                child = store.find_child(root, action)
+                if child >= 0 and self.is_same_position(
+                                    self.get_store_child(child), action_game):
+                    store.advance_root(child)
+                    root = child
+                else:
+                    root = store.new_root(action_game.clone())
+            # Check if current root has the same children as "game" offers.
+            # If not, reset the tree.
+            if set(store.child_actions(root)) != set(game.available_moves()):
+                root = store.new_root(game.clone())
 
-    def backpropagate(self, search_path, value):
-        """Propagate the game value all the way up the tree to the root."""
+        root_state = store.state(root)
+        #Expand the children of the root if it is not expanded already
+        if not store.is_expanded(root) \
+            and not self.expand_store_node(root, root_state):
+            # The store is too full to expand the root: start over.
+            root = store.new_root(root_state)
+            self.expand_store_node(root, root_state)
+
+        for _ in range(self.n_simulations):
+            node = root
+            # The Games of the nodes of this simulation at hand, so that
+            # they are not rebuilt from the store (see get_store_child).
+            states = {root: root_state.clone()}
+            search_path = [node]
+            while store.is_expanded(node):
+                node = self.select_child_store(node, states)
+                search_path.append(node)
+            # At this point, a leaf was reached (see run_UCT). If the store
+            # is full, the leaf is not expanded and its rollout is used.
+            if node not in states:
+                states[node] = store.state(node)
+            if store.n_visits[node] > 0 \
+                and not states[node].is_finished()[1] \
+                and self.expand_store_node(node, states[node]):
+                node = self.select_child_store(node, states)
+                search_path.append(node)
+            rollout_value = self.rollout(Node(states[node]))
+            self.backpropagate_store(search_path, rollout_value)
+
+        return root
+
+    def get_store_child(self, node, parent_state=None):
+        """
+        Return the Game of the node 'node' of self.tree_store, rebuilt from
+        the store, or created from the Game of its parent if it is the
+        first time the node is selected (see get_child). parent_state is
+        the Game of the parent, None to rebuild it from the store.
+        """
+
+        store = self.tree_store
+        if store.has_state(node):
+            return store.state(node)
+        if parent_state is None:
+            parent_state = store.state(store.parent[node])
+        state = parent_state.clone()
+        state.play(store.actions[store.action[node]])
+        store.set_state(node, state)
+        return state
+
+    def expand_store_node(self, node, state):
+        """
+        Expand the children of the node 'node' of self.tree_store, whose
+        Game is 'state', with expand_children and return True, or False if
+        the store is full.
+        """
+
+        # expand_children works on a Node sharing 'state', and applies the
+        # busts of the player to move to it: store it again.
+        view = Node(state)
+        self.expand_children(view)
+        self.tree_store.set_state(node, state)
+        return self.tree_store.expand(node, view.actions, view.p_a)
+
+    def store_root_view(self, node):
+        """
+        Return a Node holding a copy of the state and of the statistics of
+        the children of the node 'node' of self.tree_store, as used by
+        distribution_probability and select_action.
+        """
+
+        store = self.tree_store
+        view = Node(store.state(node))
+        view.n_visits = int(store.n_visits[node])
+        view.expand(store.child_actions(node))
+        start = store.first_child[node]
+        stop = start + len(view.actions)
+        view.n_a = array.array('l', store.n_visits[start:stop].tolist())
+        view.q_a = array.array('d', store.q[start:stop].tolist())
+        view.p_a = array.array('d', store.prior[start:stop].tolist())
+        return view
+
+    def select_child_store(self, node, states):
+        """
+        Return the child of the node 'node' of self.tree_store with the
+        highest UCB score, breaking ties as select_child does. The scores of
+        all children are computed at once over their block of the store.
+        If the Game of the child is created (see get_store_child), it is
+        added to 'states', the dictionary {node: Game} of the simulation,
+        which provides the Game of 'node' if it has it.
+        """
+
+        store = self.tree_store
+        start = store.first_child[node]
+        stop = start + store.n_children[node]
+        n_a = store.n_visits[start:stop]
+        unvisited = n_a == 0
+        n_visits = store.n_visits[node]
+        bonus = self.exploration_bonus(math.log(n_visits) if n_visits else 0,
+                                        np.maximum(n_a, 1),
+                                        store.prior[start:stop])
+        if store.player_turn[node] == 1:
+            scores = store.q[start:stop] + bonus
+            scores[unvisited] = np.inf
+            # Last of the highest scores
+            best = len(scores) - 1 - int(np.argmax(scores[::-1]))
+        else:
+            scores = store.q[start:stop] - bonus
+            scores[unvisited] = -np.inf
+            # First of the lowest scores
+            best = int(np.argmin(scores))
+        child = start + best
+        if not store.has_state(child):
+            states[child] = self.get_store_child(child, states.get(node))
+        return child
+
+    def backpropagate_store(self, search_path, value):
+        """
+        Propagate the game value all the way up the tree of self.tree_store
+        to the root. Same statistics as backpropagate, updated at once.
+        """
+
+        store = self.tree_store
+        path = np.array(search_path)
+        store.n_visits[path] += 1
+        parents_visits = store.n_visits[path[:-1]]
+        children = path[1:]
+        # Incremental mean calculation
+        store.q[children] = (store.q[children] * (parents_visits - 1)
+                                + value) / parents_visits
+
+    def backpropagate(self, search_path, edges, value):
+        """
+        Propagate the game value all the way up the tree to the root.
+        edges[k] is the index of the action chosen in search_path[k]; the
+        last node of the path has no chosen action if it is the leaf, and
+        only its n_visits is counted. Its visit used to be also counted in
+        its own n_a and q_a under the action leading to it, an entry that is
+        never one of its actions and was only read by
+        distribution_probability (hence the pop in run_UCT): the statistics
+        of the actions, and so the searches, are the same.
+        """
         
-        for node in search_path:
+        for node, i in zip(search_path, edges):
             node.n_visits += 1
-            node.n_a[node.action_taken] += 1 
+            node.n_a[i] += 1 
             # Incremental mean calculation
-            node.q_a[node.action_taken] = (node.q_a[node.action_taken] * 
-                                            (node.n_visits - 1) + value) / \
-                                                node.n_visits
+            node.q_a[i] = (node.q_a[i] * (node.n_visits - 1) + value) / \
+                            node.n_visits
+        if len(search_path) > len(edges):
+            search_path[-1].n_visits += 1
 
     def select_child(self, node):
-        """Return the child Node with the highest UCB score."""
-        ucb_values = []
-        for action, child in node.children.items():
-            if node.state.player_turn == 1:
-                if child.n_visits == 0:
-                    ucb_max = float('inf')
-                else:
-                    ucb_max =  self.calculate_ucb_max(node, action)
-                ucb_values.append((ucb_max, action, child))
-            else:
-                if child.n_visits == 0:
-                    ucb_min = float('-inf')
+        """
+        Return the index in node.actions of the action with the best UCB
+        score for the player to move (the highest for player 1, the lowest
+        for player 2) and its child Node (see get_child). The score of
+        action i is q_a[i] plus (player 1) or minus (player 2)
+          - c * sqrt(log(n_visits) / n_a[i]) (UCB1), or
+          - c * p_a[i] * sqrt(log(n_visits)) / n_a[i] (modified PUCT, see
+            AZ paper) if prior_exploration is True.
+        Unvisited actions come first. Ties go to the last action for player
+        1 and to the first one for player 2.
+        This runs at every level of every simulation: the log is computed
+        once and the scores are compared as they are computed, since a
+        plain loop beats NumPy for the few actions of a Can't Stop node.
+        """
+
+        n_a = node.n_a
+        q_a = node.q_a
+        c = self.c
+        log_n_visits = math.log(node.n_visits) if node.n_visits > 0 else 0.0
+        sqrt_log_n_visits = math.sqrt(log_n_visits)
+        best_i = 0
+        # Unvisited edges are checked through node.n_a instead of
+        # child.n_visits since a child shared through the transposition
+        # table may have been visited from another parent only.
+        if node.player_turn == 1:
+            best_ucb = -math.inf
+            for i in range(len(n_a)):
+                if n_a[i] == 0:
+                    ucb = math.inf
+                elif self.prior_exploration:
+                    ucb = q_a[i] + c * node.p_a[i] * (sqrt_log_n_visits
+                                                        / n_a[i])
                 else:
-                    ucb_min =  self.calculate_ucb_min(node, action)
-                ucb_values.append((ucb_min, action, child))
-        # Sort the list based on the ucb score
-        ucb_values.sort(key=lambda t: t[0])
-        if node.state.player_turn == 1:
-            best_ucb, best_action, best_child = ucb_values[-1]
+                    ucb = q_a[i] + c * math.sqrt(log_n_visits / n_a[i])
+                if ucb >= best_ucb:
+                    best_ucb = ucb
+                    best_i = i
         else:
-            best_ucb, best_action, best_child = ucb_values[0]
-        return best_action, best_child
+            best_ucb = math.inf
+            for i in range(len(n_a)):
+                if n_a[i] == 0:
+                    ucb = -math.inf
+                elif self.prior_exploration:
+                    ucb = q_a[i] - c * node.p_a[i] * (sqrt_log_n_visits
+                                                        / n_a[i])
+                else:
+                    ucb = q_a[i] - c * math.sqrt(log_n_visits / n_a[i])
+                if ucb < best_ucb:
+                    best_ucb = ucb
+                    best_i = i
+        return best_i, self.get_child(node, best_i)
 
     def distribution_probability(self, game):
         """
@@ -269,8 +1044,9 @@ class UCTPlayer(Player):
         """
         dist_probability = {}
 
-        total_visits = sum(self.root.n_a.values())
+        total_visits = sum(self.root.n_a)
 
-        for action, visits in self.root.n_a.items():
-            dist_probability[action] = visits/total_visits
+        for action, visits in zip(self.root.actions, self.root.n_a):
+            if visits > 0:
+                dist_probability[action] = visits/total_visits
         return dist_probability
\ No newline at end of file
@@ -4,11 +4,56 @@ import math, random
 import numpy as np
 import copy
 from players.uct_player import UCTPlayer, Node
+from rollout_kernel import random_rollout
+from bust_tables import stop_decision
+from batch_game import BatchGame
+from random_streams import spawn_seeds
 
 class Vanilla_UCT(UCTPlayer):
 
-    def __init__(self, c, n_simulations):
-        super().__init__(c, n_simulations)
+    def __init__(self, c, n_simulations, transposition_table_size=0,
+                    chance_nodes=False, fast_rollout=False,
+                    rollouts_per_leaf=1, tablebase=None, tree_store_size=0,
+                    max_interior_states=0, max_bust_probability=None):
+        """
+        - fast_rollout is a boolean. If True, rollouts are played by
+          random_rollout (rollout_kernel.py) instead of a cloned Game. Both
+          follow the same random policy.
+        - rollouts_per_leaf is the number of random playouts run from each
+          leaf. If greater than 1, they are played at once by a BatchGame
+          (batch_game.py) and the leaf value is their mean result.
+        - rng is the numpy.random.Generator used by the batched playouts
+          (see seed).
+        - tablebase is a Tablebase (tablebase.py) of the game configuration
+          or None. If given, rollouts are played with a cloned Game and
+          stop at the first turn start whose board is in the table, using
+          its value instead of playing the game until the end.
+        - max_bust_probability is None (default) or a probability. If given,
+          rollouts answer 'y'/'n' with bust_tables.stop_decision (stop when
+          the next roll busts with a greater probability) instead of at
+          random. It cannot be combined with batched playouts.
+        """
+
+        super().__init__(c, n_simulations, transposition_table_size,
+                            chance_nodes, tree_store_size, max_interior_states)
+        if max_bust_probability is not None and rollouts_per_leaf > 1:
+            raise ValueError('A rollout stop policy cannot be used with '
+                                'batched playouts.')
+        self.fast_rollout = fast_rollout
+        self.rollouts_per_leaf = rollouts_per_leaf
+        self.rng = np.random.default_rng()
+        self.tablebase = tablebase
+        self.max_bust_probability = max_bust_probability
+
+    def seed(self, seed):
+        """
+        Seed the random choices of the player (see Player.seed) and rng
+        from two independent streams spawned from 'seed'.
+        """
+
+        choices_seed, playouts_seed = spawn_seeds(seed, 2)
+        super().seed(choices_seed)
+        self.rng = np.random.default_rng(playouts_seed)
 
     def expand_children(self, parent):
         """Expand the children of the "parent" node."""
@@ -23,16 +68,14 @@ class Vanilla_UCT(UCTPlayer):
                             parent.state.available_moves()
                         )
         valid_actions = parent.state.available_moves()
-        
-        for action in valid_actions:
-            child_game = parent.state.clone()
-            child_game.play(action)
-            child_state = Node(child_game, parent)
-            child_state.action_taken = action
-            parent.children[action] = child_state
+        # Children are created lazily, when first selected (see get_child).
+        parent.expand(valid_actions)
 
     def rollout(self, node):
-        """Take random actions until a game is finished and return the value."""
+        """
+        Take random actions until a game is finished and return the value
+        (the mean value of rollouts_per_leaf games if greater than 1).
+        """
 
         # Special case where 'node' is a terminal state.
         winner, terminal_state = node.state.is_finished()
@@ -42,42 +85,62 @@ class Vanilla_UCT(UCTPlayer):
             else:
                 return -1
 
-        end_game = False
-        game = node.state.clone()
-        while not end_game:
-            #avoid infinite loops in smaller boards
-            who_won, end_game = game.is_finished()
-            moves = game.available_moves()
-            if game.is_player_busted(moves):
-                continue
-            chosen_move = random.choice(moves)
-            game.play(chosen_move)
-            who_won, end_game = game.is_finished()
+        if self.tablebase is not None:
+            game = node.state.clone()
+            while not game.is_finished()[1]:
+                if game.dice_action and game.n_neutral_markers == 0:
+                    value = self.tablebase.turn_start_value(game)
+                    if value is not None:
+                        if game.player_turn == 2:
+                            value = 1 - value
+                        return 2 * value - 1
+                moves = game.available_moves()
+                if game.is_player_busted(moves):
+                    continue
+                game.play(self.rollout_action(game, moves))
+            who_won = game.is_finished()[0]
+        elif self.rollouts_per_leaf > 1:
+            batch = BatchGame.from_game(node.state, self.rollouts_per_leaf,
+                                        self.rng)
+            winners = batch.random_playout()
+            return 2 * float(np.mean(winners == 1)) - 1
+        elif self.fast_rollout:
+            who_won = random_rollout(node.state, self.random,
+                                        self.max_bust_probability)
+        else:
+            end_game = False
+            game = node.state.clone()
+            while not end_game:
+                #avoid infinite loops in smaller boards
+                who_won, end_game = game.is_finished()
+                moves = game.available_moves()
+                if game.is_player_busted(moves):
+                    continue
+                chosen_move = self.rollout_action(game, moves)
+                game.play(chosen_move)
+                who_won, end_game = game.is_finished()
         if who_won == 1:
             return 1
         else:
             return -1
 
+    def rollout_action(self, game, moves):
+        """
+        Return the action played by the rollouts in 'game' among 'moves':
+        a random one, or the one of stop_decision if 'game' waits for the
+        'y'/'n' decision and max_bust_probability is given.
+        """
+
+        if self.max_bust_probability is not None and not game.dice_action:
+            return stop_decision(game, self.max_bust_probability)
+        return self.random.choice(moves)
+
     def select_action(self, game, root, dist_probability):
         """Return the action with the highest visit score."""
 
-        visit_counts = [(child.n_visits, action)
-                      for action, child in root.children.items()]
+        visit_counts = [(n_a, action)
+                      for action, n_a in zip(root.actions, root.n_a)]
         # Sort based on the number of visits
         visit_counts.sort(key=lambda t: t[0])
         _, action = visit_counts[-1]
         return action
-
-    def calculate_ucb_max(self, node, action):
-        """Return the node UCB1 value of the MAX player."""
-
-        return node.q_a[action] + self.c * math.sqrt(
-                                    np.divide(math.log(node.n_visits),
-                                  node.n_a[action]))
-
-    def calculate_ucb_min(self, node, action):
-        """Return the node UCB1 value of the MIN player."""
-        
-        return node.q_a[action] - self.c * math.sqrt(
-                                    np.divide(math.log(node.n_visits),
-                                  node.n_a[action]))
\ No newline at end of file
@@ -0,0 +1,298 @@
+import pickle
+import sys
+import time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from numpy_network import NumpyNetwork
+from random_streams import spawn_seeds
+
+class ActivationRecorder(NumpyNetwork):
+    def __init__(self, network, percentile):
+        """
+        Copy of the NumpyNetwork 'network' recording the range of the
+        inputs of its layers while it predicts (see quantize_int8).
+        - percentile is the percentile of the absolute values of the inputs
+          of a layer kept as its range, so that a few outliers do not waste
+          the precision of all the other values.
+        - ranges is a dictionary {id of a layer: list of the ranges of its
+          inputs in each prediction}.
+        """
+
+        self.__dict__.update(network.__dict__)
+        self.percentile = percentile
+        self.ranges = {}
+
+    def record(self, x, layer):
+        self.ranges.setdefault(id(layer), []).append(
+                        float(np.percentile(np.abs(x), self.percentile)))
+
+    def convolve(self, x, layer):
+        self.record(x, layer)
+        return super().convolve(x, layer)
+
+    def dense(self, x, layer):
+        self.record(x, layer)
+        return super().dense(x, layer)
+
+class SimulatedInt8Network(NumpyNetwork):
+    def __init__(self, network, ranges):
+        """
+        Copy of the NumpyNetwork 'network' whose convolutions and dense
+        layers use an 8-bit quantization (see quantize_int8): their kernels
+        and inputs are int8 and their products are accumulated in int32,
+        as int8 inference does. NumPy has no int8 matrix kernels, so the
+        products run on NumPy's generic integer loops: this simulation
+        measures the accuracy and the weight memory of int8 inference, not
+        its speed.
+        - ranges is the dictionary {id of a layer of 'network': range of
+          its inputs} found by the calibration.
+        Every layer becomes a tuple (kernel, kernel_scale, bias,
+        input_scale): kernel holds the int8 round(weight / kernel_scale) of
+        [-127, 127], with one scale per output (filter or unit) mapping its
+        largest weight to 127, and the inputs are rounded to int8
+        multiples of input_scale, their range mapping to 127. The int32
+        sums are exact and scaled back to float32 before adding the float32
+        bias. The batch normalization and the activations stay in float32.
+        """
+
+        self.__dict__.update(network.astype(np.float32).__dict__)
+        self.convs = [self.quantize(layer, ranges[id(original)], (0, 1, 2))
+                        for layer, original in zip(self.convs,
+                                                    network.convs)]
+        self.prob_dense = [self.quantize(layer, ranges[id(original)], 0)
+                            for layer, original in zip(self.prob_dense,
+                                                    network.prob_dense)]
+        self.value_dense = [self.quantize(layer, ranges[id(original)], 0)
+                            for layer, original in zip(self.value_dense,
+                                                    network.value_dense)]
+
+    def quantize(self, layer, input_range, axis):
+        """
+        Return the quantized tuple of 'layer', a (kernel, bias) whose inputs
+        are in [-input_range, input_range]. axis are the axes of the kernel
+        reduced to get one scale per output.
+        """
+
+        kernel, bias = layer
+        kernel_scale = np.abs(kernel).max(axis=axis) / 127
+        kernel_scale[kernel_scale == 0] = 1
+        quantized = np.round(kernel / kernel_scale).astype(np.int8)
+        input_scale = max(input_range, 1e-8) / 127
+        return quantized, kernel_scale.astype(np.float32), bias, \
+                np.float32(input_scale)
+
+    def quantize_inputs(self, x, input_scale):
+        """Return 'x' rounded to the int8 integers of [-127, 127]."""
+
+        x = np.rint(x / input_scale)
+        return np.clip(x, -127, 127, out=x).astype(np.int8)
+
+    def convolve(self, x, layer):
+        kernel, kernel_scale, bias, input_scale = layer
+        rows, columns = kernel.shape[:2]
+        windows = sliding_window_view(self.quantize_inputs(x, input_scale),
+                                        (rows, columns), axis=(1, 2))
+        output = np.einsum('nijckl,klcf->nijf', windows, kernel,
+                            dtype=np.int32)
+        return output.astype(np.float32) * (input_scale * kernel_scale) \
+                + bias
+
+    def dense(self, x, layer):
+        kernel, kernel_scale, bias, input_scale = layer
+        # einsum's integer loops are several times faster than matmul's.
+        output = np.einsum('ni,io->no', self.quantize_inputs(x, input_scale),
+                            kernel, dtype=np.int32)
+        return output.astype(np.float32) * (input_scale * kernel_scale) \
+                + bias
+
+def float16_network(network):
+    """
+    Return the float16 version of the NumpyNetwork 'network': weights and
+    computations in half precision.
+    """
+
+    return network.astype(np.float16)
+
+def quantize_int8(network, states, valid_actions, percentile=99.99,
+                    batch_size=512):
+    """
+    Return the SimulatedInt8Network of the NumpyNetwork 'network'
+    calibrated on the positions 'states' and 'valid_actions' (see
+    load_dataset): the range of the inputs of each layer is the largest
+    'percentile' of their absolute values over the batches of batch_size
+    positions.
+    """
+
+    recorder = ActivationRecorder(network.astype(np.float32), percentile)
+    for start in range(0, len(states), batch_size):
+        recorder.predict([states[start:start + batch_size],
+                            valid_actions[start:start + batch_size]])
+    # The recorder shares the layers of the float32 copy.
+    ranges = {id(original): max(recorder.ranges[id(layer)])
+                for layer, original in zip(recorder.convs + recorder.prob_dense
+                                            + recorder.value_dense,
+                                            network.convs + network.prob_dense
+                                            + network.value_dense)}
+    return SimulatedInt8Network(network, ranges)
+
+def load_dataset(file_name, player):
+    """
+    Return the state channels and valid actions of the positions of the
+    selfplay dataset saved in 'file_name' (the pickled dataset_for_network
+    of Experiment.play_alphazero), using the AlphaZeroPlayer 'player' to
+    read it (see AlphaZeroPlayer.transform_dataset_to_input).
+    """
+
+    with open(file_name, 'rb') as file:
+        dataset = pickle.load(file)
+    states, valid_actions, _, _ = player.transform_dataset_to_input(dataset)
+    return states, valid_actions
+
+def accuracy(reference, network, states, valid_actions):
+    """
+    Return the mean KL divergence of the policies of 'network' from the
+    ones of 'reference' (the float32 network) and the mean squared error of
+    its values on the positions 'states' and 'valid_actions'.
+    """
+
+    reference_policies, reference_values = reference.predict(
+                                                [states, valid_actions])
+    policies, values = network.predict([states, valid_actions])
+    # Renormalized in float64: the float16 policies do not sum exactly to 1.
+    reference_policies = reference_policies.astype(np.float64)
+    reference_policies /= reference_policies.sum(axis=1, keepdims=True)
+    policies = np.maximum(policies.astype(np.float64), 1e-12)
+    policies /= policies.sum(axis=1, keepdims=True)
+    terms = np.where(reference_policies > 0, reference_policies
+                    * np.log(np.maximum(reference_policies, 1e-12)
+                                / policies), 0)
+    policy_kl = float(terms.sum(axis=1).mean())
+    value_mse = float(((values.astype(np.float64)
+                        - reference_values.astype(np.float64)) ** 2).mean())
+    return policy_kl, value_mse
+
+def play_game(players, config, seed, max_game_length=1000):
+    """
+    Play a game seeded with 'seed' (see random_streams.py) between the UCT
+    players players[1] and players[2], which are seeded too, giving them
+    the plays made since their last turn as Experiment does. Return the
+    winner, 0 if the game is longer than max_game_length plays.
+    """
+
+    from game import Game
+    dice_seed, player1_seed, player2_seed = spawn_seeds(seed, 3)
+    game = Game(*config, np.random.default_rng(dice_seed))
+    players[1].seed(player1_seed)
+    players[2].seed(player2_seed)
+    actions_taken = []
+    actions_from_player = 1
+    for _ in range(max_game_length):
+        if game.is_finished()[1]:
+            return game.is_finished()[0]
+        if game.is_player_busted(game.available_moves()):
+            actions_taken = []
+            actions_from_player = game.player_turn
+            continue
+        player = game.player_turn
+        if actions_from_player == player:
+            action = players[player].get_action(game, [])
+        else:
+            action = players[player].get_action(game, actions_taken)
+            actions_taken = []
+            actions_from_player = player
+        game.play(action)
+        actions_taken.append((action, player, game.clone()))
+    return game.is_finished()[0]
+
+def win_rate(network, reference, config, n_simulations, n_games, seed):
+    """
+    Return the fraction of the games won by a Network_UCT searching with
+    'network' against one searching with 'reference', both with
+    n_simulations. The sides alternate and both games of a pair use the
+    same seed (common random numbers). Draws count as half a win.
+    - config is (n_players, dice_number, dice_value, column_range, offset,
+      initial_height).
+    """
+
+    from players.net_uct_player import Network_UCT
+    dice_value, column_range, offset, initial_height = config[2:6]
+    score = 0.0
+    for i, game_seed in enumerate(spawn_seeds(seed, (n_games + 1) // 2)):
+        for side in (1, 2):
+            if 2 * i + side > n_games:
+                break
+            players = {}
+            for player, player_network in ((side, network),
+                                            (3 - side, reference)):
+                players[player] = Network_UCT(1, n_simulations, column_range,
+                                                offset, initial_height,
+                                                dice_value, player_network)
+            winner = play_game(players, config, game_seed)
+            if winner == 0:
+                score += 0.5
+            elif winner == side:
+                score += 1
+    return score / n_games
+
+def main():
+    """
+    Report the accuracy of the float16 and int8 versions of a network of
+    models.define_model on a saved selfplay dataset of the 2-12 board: the
+    first half of the positions calibrates the int8 network, the second
+    half measures the policy KL divergence and the value MSE from the
+    float32 network, followed by the memory of the weights, the time of a
+    prediction and the win rate of each version against the float32
+    network. The int8 version is only simulated (see SimulatedInt8Network):
+    its time is not the one of int8 inference. Keras is not needed.
+    Usage: quantized_network.py weights_file dataset_file conv_number
+    [n_games] [n_simulations]
+    """
+
+    if len(sys.argv) < 4:
+        print('Usage: quantized_network.py weights_file dataset_file '
+                'conv_number [n_games] [n_simulations]')
+        return
+    from players.net_uct_player import Network_UCT
+    config = (2, 4, 6, [2, 12], 2, 2)
+    conv_number = int(sys.argv[3])
+    n_games = int(sys.argv[4]) if len(sys.argv) > 4 else 20
+    n_simulations = int(sys.argv[5]) if len(sys.argv) > 5 else 50
+    with open(sys.argv[1], 'rb') as file:
+        weights = pickle.load(file)
+    reference = NumpyNetwork.from_weights(weights, conv_number, *config[3:],
+                                            config[2])
+    player = Network_UCT(1, 1, config[3], config[4], config[5], config[2],
+                            reference)
+    states, valid_actions = load_dataset(sys.argv[2], player)
+    half = len(states) // 2
+    print(len(states), 'positions:', half, 'for calibration,',
+            len(states) - half, 'for evaluation')
+    print('int8 is simulated: int8 weights and inputs with int32 sums run '
+            'on NumPy\'s generic integer loops, so its time is not the one '
+            'of int8 inference.')
+    variants = [('float16', float16_network(reference)),
+                ('int8 (simulated)', quantize_int8(reference, states[:half],
+                                                    valid_actions[:half]))]
+    single = [states[half:half + 1], valid_actions[half:half + 1]]
+    for name, network in [('float32', reference)] + variants:
+        policy_kl, value_mse = accuracy(reference, network, states[half:],
+                                        valid_actions[half:])
+        start = time.perf_counter()
+        for _ in range(1000):
+            network.predict(single)
+        micros = (time.perf_counter() - start) * 1e3
+        weights_kb = sum(array.nbytes for layer in network.convs
+                            + network.prob_dense + network.value_dense
+                            for array in layer
+                            if isinstance(array, np.ndarray)) / 1024
+        line = ('{:16s} policy KL {:.2e} value MSE {:.2e} weights {:7.1f} KB'
+                ' {:7.1f} us').format(name, policy_kl, value_mse,
+                                        weights_kb, micros)
+        if network is not reference:
+            line += ' win rate {:.2f}'.format(win_rate(network, reference,
+                                                config, n_simulations,
+                                                n_games, 0))
+        print(line)
+
+if __name__ == "__main__":
+    main()
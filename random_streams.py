@@ -0,0 +1,120 @@
+import random
+import numpy as np
+
+# Number of rolls drawn at once by DiceStream.
+ROLL_BLOCK = 1024
+
+def seed_sequence(seed):
+    """
+    Return 'seed' as a numpy SeedSequence. 'seed' is an int, a SeedSequence
+    (returned as is) or None for fresh entropy.
+    """
+
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+def spawn_seeds(seed, n):
+    """
+    Return a list of n independent SeedSequence spawned from 'seed' (see
+    seed_sequence). The i-th child of a given seed is always the same, so
+    the i-th game (or worker) of two runs sharing a seed gets the same
+    random numbers, whichever process plays it. SeedSequence objects are
+    small and picklable, so they can be sent to ProcessPoolExecutor workers.
+    """
+
+    return seed_sequence(seed).spawn(n)
+
+def python_random(seed):
+    """
+    Return a random.Random seeded from 'seed' (see seed_sequence). It has
+    the API of the random module, which is what players and scripts use
+    for their own choices (see Player.seed).
+    """
+
+    state = seed_sequence(seed).generate_state(4, np.uint64)
+    return random.Random(int.from_bytes(state.tobytes(), 'little'))
+
+class RollBlock:
+    def __init__(self, rolls):
+        """
+        Rolls drawn at once by a DiceStream.
+        - rolls is the list of the rolls, in the order they are handed out.
+        - next is the RollBlock drawn after this one, None until it is
+          needed. Blocks are kept linked so that a stream restored to an
+          earlier position (see DiceStream.restore) hands out the same rolls
+          again instead of drawing new ones.
+        """
+
+        self.rolls = rolls
+        self.next = None
+
+class DiceStream:
+    def __init__(self, dice_number, dice_value, rng):
+        """
+        Source of the dice rolls of a seeded Game or CompactGame.
+        - rng is the numpy.random.Generator the rolls are drawn from.
+        - block is the current RollBlock and index the position of the next
+          roll in it. Rolls are drawn ROLL_BLOCK at a time, which is much
+          cheaper than calling random.randrange for every die.
+        - simulation is the DiceStream of the clones of the game (see
+          clone_stream), None until a clone is made.
+        """
+
+        self.dice_number = dice_number
+        self.dice_value = dice_value
+        self.rng = rng
+        self.block = RollBlock([])
+        self.index = 0
+        self.simulation = None
+
+    def roll(self):
+        """Return the next roll, a tuple like the ones of Game.roll_dice."""
+
+        if self.index == len(self.block.rolls):
+            if self.block.next is None:
+                block = self.rng.integers(1, self.dice_value + 1,
+                                        size=(ROLL_BLOCK, self.dice_number))
+                self.block.next = RollBlock(list(map(tuple, block.tolist())))
+            self.block = self.block.next
+            self.index = 0
+        roll = self.block.rolls[self.index]
+        self.index += 1
+        return roll
+
+    def position(self):
+        """
+        Return the position of the stream, to be given to restore, or None
+        for the simulation stream shared by the clones of a game: rewinding
+        it would hand the same roll to several clones (tree nodes,
+        rollouts), so their rolls are never taken back.
+        """
+
+        if self.simulation is self:
+            return None
+        return self.block, self.index
+
+    def restore(self, position):
+        """
+        Move the stream back to 'position' (see position): the rolls handed
+        out since then are handed out again, in the same order.
+        """
+
+        if position is not None:
+            self.block, self.index = position
+
+    def clone_stream(self):
+        """
+        Return the stream used by the clones of a game rolling from this
+        stream. Clones (tree nodes, rollouts) roll from a child stream
+        spawned from this one and shared by all of them, so the rolls of
+        the game actually played do not depend on how many simulations the
+        players run: two players facing the same seed get the same
+        sequence of rolls (common random numbers).
+        """
+
+        if self.simulation is None:
+            self.simulation = DiceStream(self.dice_number, self.dice_value,
+                                            self.rng.spawn(1)[0])
+            self.simulation.simulation = self.simulation
+        return self.simulation
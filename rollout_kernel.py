@@ -0,0 +1,267 @@
+import random
+from game import combination_table
+from compact_game import CompactGame
+from bust_tables import bust_table
+
+# Number of dice rolls drawn at once by random_rollout.
+ROLL_BATCH = 64
+
+# Maximum number of entries of a moves cache (see rollout_tables) before it
+# is emptied.
+MOVES_CACHE_SIZE = 20000
+
+# Cache of the tables built by rollout_tables(), one per dice_value.
+_rollout_tables = {}
+
+def rollout_tables(dice_value):
+    """
+    Return the tables used by random_rollout for 'dice_value', built from
+    combination_table(dice_value):
+    - pairings is a list of the distinct pairing tuples of the table (one
+      per roll multiset). Rolls are referred to by their index in it.
+    - roll_ids is a dict mapping every ordered roll to its index.
+    - ordered_roll_ids is a list with the index of every ordered roll, so
+      drawing an entry uniformly is the same as rolling the dice.
+    - moves_cache is a dict used by random_rollout to store the available
+      moves. Its keys are built from the column masks and n_neutral_markers
+      and its values are lists with the moves of each roll index (None if
+      not computed yet).
+    """
+
+    if dice_value not in _rollout_tables:
+        table = combination_table(dice_value)
+        pairings = []
+        index_of_pairings = {}
+        roll_ids = {}
+        for roll, roll_pairings in table.items():
+            if id(roll_pairings) not in index_of_pairings:
+                index_of_pairings[id(roll_pairings)] = len(pairings)
+                pairings.append(roll_pairings)
+            roll_ids[roll] = index_of_pairings[id(roll_pairings)]
+        _rollout_tables[dice_value] = (pairings, roll_ids,
+                                        list(roll_ids.values()), {})
+    return _rollout_tables[dice_value]
+
+def available_moves(pairings, closed_mask, neutral_mask, n_neutral_markers):
+    """
+    Return the available moves of a roll, given its 'pairings' (see
+    combination_table), the bitmask of the finished and won columns, the
+    bitmask of the columns holding a neutral marker and the number of
+    neutral markers. Same as Game.available_moves when dice_action is True.
+    """
+
+    open_mask = ~closed_mask
+    if n_neutral_markers < 3:
+        available_mask = open_mask
+    else:
+        available_mask = open_mask & neutral_mask
+    moves = []
+    for first_bit, second_bit, outcomes in pairings:
+        pair_mask = first_bit | second_bit
+        if (open_mask & pair_mask) != pair_mask:
+            code = 0
+        elif n_neutral_markers < 2:
+            code = 4
+        elif n_neutral_markers == 2:
+            if (neutral_mask & pair_mask) or first_bit == second_bit:
+                code = 4
+            else:
+                code = 0
+        elif (neutral_mask & pair_mask) == pair_mask:
+            code = 4
+        else:
+            code = 0
+        if available_mask & first_bit:
+            code += 2
+        if available_mask & second_bit:
+            code += 1
+        for move in outcomes[code]:
+            if move not in moves:
+                moves.append(move)
+    return moves
+
+def playable_mask(closed_mask, neutral_mask, n_neutral_markers,
+                    columns_mask):
+    """
+    Return the bitmask of the columns that can be advanced with the next
+    roll (same as bust_tables.playable_mask), columns_mask being the
+    bitmask of every column.
+    """
+
+    if n_neutral_markers < 3:
+        return ~closed_mask & columns_mask
+    return neutral_mask & ~closed_mask
+
+def random_rollout(game, generator=random, max_bust_probability=None):
+    """
+    Play random moves from the state of 'game' (a Game or a CompactGame,
+    left untouched) until the game is over and return the winner (1 or 2).
+
+    Moves follow the same distribution as taking random.choice over
+    available_moves() at every step (busts included), but the game is kept
+    in a few lists and bitmasks instead of a Game object:
+    - progress[player][column] is the cell of the furthest marker of
+      'player' in 'column' (-1 if absent).
+    - neutral[column] is the cell of the neutral marker in 'column' (-1 if
+      absent), and neutral_columns lists the columns holding one.
+    - finished_mask and neutral_mask are the bitmasks of Game, and
+      closed_mask is finished_mask with the columns won in the current
+      turn (listed in won_columns).
+    Dice rolls are drawn ROLL_BATCH at a time. The first roll used is the
+    current_roll of 'game'. Moves and rolls are drawn from 'generator', the
+    random module or a random.Random (e.g. the one of a seeded Player).
+    If max_bust_probability is not None, the 'y'/'n' decisions are not
+    random but those of bust_tables.stop_decision: stop when the
+    probability of busting with the next roll is greater than it.
+    """
+
+    winner = game.winner
+    if winner != 0:
+        return winner
+
+    n_players = game.n_players
+    n_slots = game.column_range[1] + 1
+    top = [-1] * n_slots
+    # progress[0] holds the neutral markers.
+    progress = [[-1] * n_slots for _ in range(n_players + 1)]
+    if isinstance(game, CompactGame):
+        top = [height - 1 for height in game.heights]
+        for marker in range(n_players + 1):
+            progress[marker] = game.positions[marker * game.n_slots:
+                                                (marker + 1) * game.n_slots]
+    else:
+        for x in range(game.column_range[0], game.column_range[1]+1):
+            list_of_cells = game.board_game.board[x]
+            top[x] = len(list_of_cells) - 1
+            # Finished columns are never played again.
+            if game.finished_columns_mask & (1 << x):
+                continue
+            for i in range(len(list_of_cells)):
+                for marker in list_of_cells[i].markers:
+                    progress[marker][x] = i
+    neutral = progress[0]
+
+    player = game.player_turn
+    n_neutral_markers = game.n_neutral_markers
+    neutral_columns = [item[0] for item in game.neutral_positions]
+    won_columns = [item[0] for item in game.player_won_column]
+    finished_mask = game.finished_columns_mask
+    closed_mask = finished_mask | game.player_won_column_mask
+    neutral_mask = game.neutral_columns_mask
+    n_won_columns = game.n_won_columns[:]
+
+    pairings, roll_ids, ordered_roll_ids, moves_cache = \
+                                        rollout_tables(game.dice_value)
+    if len(moves_cache) > MOVES_CACHE_SIZE:
+        moves_cache.clear()
+    roll_id = roll_ids[game.current_roll]
+    rolls = []
+    uniform = generator.random
+    # Moves of each roll in the current state, reset to None when the
+    # neutral markers or the closed columns change.
+    state_moves = None
+
+    busts = None
+    if max_bust_probability is not None:
+        busts = bust_table(game.dice_value)
+        columns_mask = (1 << (2 * game.dice_value + 1)) - 1
+
+    # A state waiting for the 'y'/'n' decision starts with it.
+    if busts is None:
+        stop = not game.dice_action and uniform() >= 0.5
+    else:
+        stop = not game.dice_action and busts[playable_mask(
+                    closed_mask, neutral_mask, n_neutral_markers,
+                    columns_mask)] > max_bust_probability
+
+    while True:
+        if stop:
+            # 'n': same as Game.transform_neutral_markers
+            player_progress = progress[player]
+            for col in neutral_columns:
+                player_progress[col] = neutral[col]
+                neutral[col] = -1
+            finished_mask = closed_mask
+            n_won_columns[player] += len(won_columns)
+            # The other players cannot reach 3 columns in this turn
+            if n_won_columns[player] >= 3:
+                return player
+            neutral_columns = []
+            won_columns = []
+            n_neutral_markers = 0
+            neutral_mask = 0
+            player = player % n_players + 1
+            stop = False
+            state_moves = None
+
+        # Besides the roll, the moves only depend on whether there are less
+        # than 2, 2 or more neutral markers and on the columns that are
+        # closed (less than 2), closed or holding a neutral marker (2), or
+        # open and holding a neutral marker (3 or more).
+        if state_moves is None:
+            if n_neutral_markers < 2:
+                key = closed_mask << 2
+            elif n_neutral_markers == 2:
+                key = (closed_mask << n_slots
+                        | neutral_mask & ~closed_mask) << 2 | 1
+            else:
+                key = (neutral_mask & ~closed_mask) << 2 | 2
+            state_moves = moves_cache.get(key)
+            if state_moves is None:
+                state_moves = [None] * len(pairings)
+                moves_cache[key] = state_moves
+        moves = state_moves[roll_id]
+        if moves is None:
+            moves = available_moves(pairings[roll_id], closed_mask,
+                                    neutral_mask, n_neutral_markers)
+            state_moves[roll_id] = moves
+
+        if not rolls:
+            rolls = generator.choices(ordered_roll_ids, k=ROLL_BATCH)
+        roll_id = rolls.pop()
+
+        # Busted: same as Game.is_player_busted (with 3 neutral markers, every
+        # available move is on a column holding one, so the player can only
+        # be busted when there are no moves).
+        if not moves:
+            for col in neutral_columns:
+                neutral[col] = -1
+            neutral_columns = []
+            won_columns = []
+            n_neutral_markers = 0
+            neutral_mask = 0
+            closed_mask = finished_mask
+            player = player % n_players + 1
+            state_moves = None
+            continue
+
+        # Same as Game.play
+        player_progress = progress[player]
+        for col in moves[int(uniform() * len(moves))]:
+            position = neutral[col]
+            if position == -1:
+                n_neutral_markers += 1
+                state_moves = None
+                position = player_progress[col]
+                if position == top[col]:
+                    if not closed_mask & (1 << col):
+                        closed_mask |= 1 << col
+                        won_columns.append(col)
+                else:
+                    neutral[col] = position + 1
+                    neutral_columns.append(col)
+                    neutral_mask |= 1 << col
+            elif position == top[col]:
+                if not closed_mask & (1 << col):
+                    closed_mask |= 1 << col
+                    won_columns.append(col)
+                    state_moves = None
+            else:
+                neutral[col] = position + 1
+        # Then 'y' or 'n'
+        if busts is None:
+            stop = uniform() >= 0.5
+        else:
+            stop = busts[playable_mask(closed_mask, neutral_mask,
+                            n_neutral_markers, columns_mask)] \
+                    > max_bust_probability
@@ -0,0 +1,110 @@
+import array
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from random_streams import DiceStream, spawn_seeds
+
+# Player searching in the current worker process (see _init_worker).
+_worker_player = None
+
+def _init_worker(player, network_spec, weights):
+    """
+    Initializer of the worker processes of RootParallel. 'player' is the
+    copy of the UCTPlayer the worker searches with; its network, if any, is
+    rebuilt from define_model(**network_spec) and 'weights' as in
+    Experiment._play_single_game.
+    """
+
+    global _worker_player
+    if network_spec is not None:
+        from keras import backend as K
+        K.set_image_data_format('channels_first')
+        from models import define_model
+        player.network = define_model(**network_spec)
+        player.network.set_weights(weights)
+    player.reset_tree()
+    _worker_player = player
+
+def _search(args):
+    """
+    Run the simulations of one worker and return the statistics of its
+    root: the lists of the actions and of their n_a and q_a, and the number
+    of visits of the root.
+    - args[0] is the Game to search from.
+    - args[1] is the seed of the search. The player and the dice rolled in
+      the tree get their own streams spawned from it, so every worker
+      explores a different tree.
+    - args[2] is the number of simulations.
+    """
+
+    game, seed, n_simulations = args
+    player = _worker_player
+    player_seed, dice_seed = spawn_seeds(seed, 2)
+    player.seed(player_seed)
+    game.dice_stream = DiceStream(game.dice_number, game.dice_value,
+                                    np.random.default_rng(dice_seed))
+    player.n_simulations = n_simulations
+    root = player.search_root(game)
+    return root.actions, root.n_a.tolist(), root.q_a.tolist(), \
+            root.n_visits
+
+class RootParallel:
+    def __init__(self, player, n_workers, network_spec=None, weights=None):
+        """
+        Pool of worker processes running independent searches from the same
+        root for 'player' (root parallelization, see
+        UCTPlayer.start_root_parallel). The pool is started once and kept
+        for every move, so processes and networks are not rebuilt each
+        time.
+        - player is the UCTPlayer whose copy every worker searches with.
+          Its tree is not sent to the workers.
+        - n_workers is the number of worker processes.
+        - network_spec is the dictionary of the arguments of
+          models.define_model rebuilding the network of the player in the
+          workers, None if the player has no network.
+        - weights are the weights of that network.
+        """
+
+        self.n_workers = n_workers
+        worker = player.search_copy()
+        self.executor = ProcessPoolExecutor(max_workers=n_workers,
+                                            initializer=_init_worker,
+                                            initargs=(worker, network_spec,
+                                                        weights))
+
+    def search(self, game, n_simulations, seeds):
+        """
+        Split 'n_simulations' among the workers, search from 'game' with
+        each of the 'seeds' (one per worker) and return the merged root
+        statistics: the list of actions and the lists of their n_a and q_a
+        and the number of visits of the root. Visits are summed and values
+        averaged weighted by the visits of each worker.
+        """
+
+        n_workers = len(seeds)
+        args = [(game, seed, n_simulations // n_workers
+                    + (i < n_simulations % n_workers))
+                for i, seed in enumerate(seeds)]
+        actions = []
+        visits = {}
+        values = {}
+        n_visits = 0
+        for worker_actions, n_a, q_a, worker_visits \
+            in self.executor.map(_search, args):
+            n_visits += worker_visits
+            for action, n, q in zip(worker_actions, n_a, q_a):
+                if action not in visits:
+                    actions.append(action)
+                    visits[action] = 0
+                    values[action] = 0.0
+                visits[action] += n
+                values[action] += n * q
+        n_a = array.array('l', [visits[action] for action in actions])
+        q_a = array.array('d', [values[action] / visits[action]
+                                if visits[action] else 0.0
+                                for action in actions])
+        return actions, n_a, q_a, n_visits
+
+    def shutdown(self):
+        """Stop the worker processes."""
+
+        self.executor.shutdown()
@@ -0,0 +1,508 @@
+import collections
+import sys
+import timeit
+import numpy as np
+from game import column_heights
+from compact_game import CompactGame
+from rollout_kernel import available_moves, rollout_tables
+
+# (n_players, dice_number, dice_value, column_range, offset, initial_height)
+TOY_CONFIG = (2, 4, 3, [2,6], 2, 1)
+
+class Tablebase:
+    def __init__(self, config, values=None):
+        """
+        Exact win probabilities of the positions of a 2-player, 4-dice
+        configuration, computed by solve() and stored in a table that can
+        be saved and memory-mapped (see save and load).
+
+        - config is a tuple (n_players, dice_number, dice_value,
+          column_range, offset, initial_height), as the arguments of Game.
+        - columns is the list of the board columns and heights[column] the
+          number of cells of each column.
+        - A board is the state of a game at the start of a turn, before
+          the dice are rolled: the finished columns with their winner and
+          the furthest marker of each player in the other columns. Each
+          column is encoded as an integer code: (p1 + 1) * (height + 1)
+          + (p2 + 1) for an open column where the players are at cells p1
+          and p2 (-1 if absent), (height + 1) ** 2 + player - 1 for a
+          column won by 'player'. The board index is the column codes read
+          as a mixed radix number (see board_index).
+        - values is a float32 array of shape (n_boards, 2) where
+          values[board, player - 1] is the probability that 'player' wins
+          when starting a turn on 'board' with optimal play from both
+          players, NaN if the board was not solved. It is allocated by
+          solve() if not given (None until then).
+        """
+
+        self.config = config
+        (n_players, dice_number, self.dice_value, self.column_range,
+            offset, initial_height) = config
+        if n_players != 2 or dice_number != 4:
+            raise ValueError('Only 2 players and 4 dice are supported.')
+        self.n_slots = self.column_range[1] + 1
+        self.heights = column_heights(self.column_range, offset,
+                                        initial_height)
+        self.columns = list(range(self.column_range[0],
+                                    self.column_range[1]+1))
+        self.n_codes = [(self.heights[column] + 1) ** 2 + 2
+                        for column in self.columns]
+        self.strides = [1] * len(self.columns)
+        for i in range(len(self.columns) - 2, -1, -1):
+            self.strides[i] = self.strides[i + 1] * self.n_codes[i + 1]
+        self.n_boards = self.strides[0] * self.n_codes[0]
+        self.values = values
+        # Outcomes of a roll (see roll_outcomes), cached by
+        # (closed_mask, neutral_mask, n_neutral_markers).
+        self.outcomes_cache = {}
+
+    @classmethod
+    def load(cls, config, path):
+        """
+        Return the Tablebase of 'config' saved in 'path' by save(). The
+        table is memory-mapped, not read into memory.
+        """
+
+        return cls(config, np.load(path, mmap_mode='r'))
+
+    def save(self, path):
+        """Save the values table to 'path' (NumPy .npy format)."""
+
+        np.save(path, self.values)
+
+    def board_index(self, finished, progress):
+        """
+        Return the index of the board where finished[column] is the player
+        who won 'column' (0 if open) and progress[player][column] is the
+        cell of the furthest marker of 'player' in 'column' (-1 if absent).
+        """
+
+        index = 0
+        for i, column in enumerate(self.columns):
+            height = self.heights[column]
+            if finished[column]:
+                code = (height + 1) ** 2 + finished[column] - 1
+            else:
+                code = (progress[1][column] + 1) * (height + 1) \
+                        + progress[2][column] + 1
+            index += code * self.strides[i]
+        return index
+
+    def board(self, index):
+        """Return the (finished, progress) lists of the board 'index'."""
+
+        finished = [0] * self.n_slots
+        progress = [None, [-1] * self.n_slots, [-1] * self.n_slots]
+        for i, column in enumerate(self.columns):
+            code = index // self.strides[i] % self.n_codes[i]
+            height = self.heights[column]
+            if code >= (height + 1) ** 2:
+                finished[column] = code - (height + 1) ** 2 + 1
+            else:
+                progress[1][column] = code // (height + 1) - 1
+                progress[2][column] = code % (height + 1) - 1
+        return finished, progress
+
+    def game_board(self, game):
+        """
+        Return the (finished, progress) lists of the board of 'game' (a
+        Game or CompactGame), ignoring the neutral markers.
+        """
+
+        finished = [0] * self.n_slots
+        for column, player in game.finished_columns:
+            finished[column] = player
+        if isinstance(game, CompactGame):
+            progress = [None] + [game.positions[player * game.n_slots:
+                                                (player + 1) * game.n_slots]
+                                    for player in (1, 2)]
+            return finished, progress
+        progress = [None, [-1] * self.n_slots, [-1] * self.n_slots]
+        for column in self.columns:
+            if finished[column]:
+                continue
+            list_of_cells = game.board_game.board[column]
+            for i in range(len(list_of_cells)):
+                for marker in list_of_cells[i].markers:
+                    if marker != 0:
+                        progress[marker][column] = i
+        return finished, progress
+
+    def turn_state(self, game):
+        """
+        Return the turn state (positions, n_neutral_markers) of 'game': the
+        cell reached in the current turn by the player in every column
+        (the neutral marker if there is one, the permanent marker
+        otherwise, the column height for a column won in the current turn)
+        and the number of neutral markers (at most 3).
+        """
+
+        if not isinstance(game, CompactGame):
+            game = CompactGame.from_game(game)
+        positions = game.positions[game.player_turn * game.n_slots:
+                                    (game.player_turn + 1) * game.n_slots]
+        for column in game.neutral_columns:
+            positions[column] = game.positions[column]
+        for column, _ in game.player_won_column:
+            positions[column] = self.heights[column]
+        return tuple(positions), min(game.n_neutral_markers, 3)
+
+    def roll_outcomes(self, closed_mask, neutral_mask, n_neutral_markers):
+        """
+        Return a list of (probability, moves) pairs, one per distinct roll,
+        with the probability of the roll and its available moves (same
+        rules as Game.available_moves) given the bitmask of the closed
+        columns, the bitmask of the open columns holding a neutral marker
+        and the number of neutral markers (at most 3).
+        """
+
+        key = (closed_mask, neutral_mask, n_neutral_markers)
+        if key not in self.outcomes_cache:
+            pairings, _, ordered_roll_ids, _ = rollout_tables(
+                                                        self.dice_value)
+            rolls_of_pairings = collections.Counter(ordered_roll_ids)
+            self.outcomes_cache[key] = [
+                (count / len(ordered_roll_ids),
+                    available_moves(pairings[roll_id], closed_mask,
+                                    neutral_mask, n_neutral_markers))
+                for roll_id, count in rolls_of_pairings.items()]
+        return self.outcomes_cache[key]
+
+    def advance(self, own_progress, positions, n_neutral_markers, move):
+        """
+        Return the turn state (see turn_state) reached by playing 'move'
+        from (positions, n_neutral_markers), own_progress being the
+        permanent markers of the player. Same as Game.play: a (7,7) pair
+        advances 7 twice, and a neutral marker is placed (and counted)
+        unless there is one already, which is not the case for a column
+        won from the permanent marker.
+        """
+
+        heights = self.heights
+        positions = list(positions)
+        for column in move:
+            position = positions[column]
+            if position == own_progress[column] \
+                or (position == heights[column]
+                    and own_progress[column] == heights[column] - 1):
+                n_neutral_markers += 1
+            if position < heights[column]:
+                positions[column] = position + 1
+        return tuple(positions), min(n_neutral_markers, 3)
+
+    def turn_graph(self, board, player, roots):
+        """
+        Return the graph of the turn states of 'player' on 'board' reachable
+        from the turn states 'roots' (a list of (positions,
+        n_neutral_markers) pairs, see turn_state), as a 3-tuple:
+        - ids is a dict mapping each turn state to its index.
+        - stop_values is a list with the value for 'player' of stopping in
+          each state (1 minus the value of the other player starting a
+          turn on the board reached, 1 if 'player' wins). Stopping is only
+          allowed after a move, so the boards reached must be solved
+          (roots without progress get None).
+        - outcomes is a list with, for each state, a list of
+          (probability, children) pairs, one per distinct roll, where
+          children are the indexes of the states reached by each available
+          move (an empty list is a bust).
+        States are indexed children first, so the graph can be evaluated
+        in index order (see evaluate_graph).
+        """
+
+        finished, progress = board
+        other = 3 - player
+        own_progress = progress[player]
+        heights = self.heights
+        columns = self.columns
+        finished_mask = 0
+        n_won_columns = 0
+        for column in columns:
+            if finished[column]:
+                finished_mask |= 1 << column
+                n_won_columns += finished[column] == player
+        ids = {}
+        stop_values = []
+        outcomes = []
+
+        def advance(positions, n_neutral_markers, move):
+            return self.advance(own_progress, positions, n_neutral_markers,
+                                move)
+
+        def stop_value(positions):
+            # Same as Game.transform_neutral_markers
+            if positions == tuple(own_progress):
+                return None
+            new_finished = finished[:]
+            new_progress = [None, progress[1][:], progress[2][:]]
+            n_won = n_won_columns
+            for column in columns:
+                if positions[column] == heights[column]:
+                    new_finished[column] = player
+                    n_won += 1
+                elif positions[column] != own_progress[column]:
+                    new_progress[player][column] = positions[column]
+            if n_won >= 3:
+                return 1.
+            return 1. - float(self.values[self.board_index(new_finished,
+                                                            new_progress),
+                                            other - 1])
+
+        def visit(state):
+            # Iterative post-order depth-first search.
+            stack = [(state, None)]
+            while stack:
+                state, state_outcomes = stack.pop()
+                if state in ids:
+                    continue
+                positions, n_neutral_markers = state
+                if state_outcomes is None:
+                    closed_mask = finished_mask
+                    neutral_mask = 0
+                    for column in columns:
+                        if positions[column] == heights[column]:
+                            closed_mask |= 1 << column
+                        elif positions[column] != own_progress[column]:
+                            neutral_mask |= 1 << column
+                    state_outcomes = [
+                        (probability,
+                            [advance(positions, n_neutral_markers, move)
+                                for move in moves])
+                        for probability, moves in self.roll_outcomes(
+                                                        closed_mask,
+                                                        neutral_mask,
+                                                        n_neutral_markers)]
+                    stack.append((state, state_outcomes))
+                    for _, children in state_outcomes:
+                        for child in children:
+                            if child not in ids:
+                                stack.append((child, None))
+                    continue
+                ids[state] = len(stop_values)
+                stop_values.append(stop_value(positions))
+                outcomes.append([(probability,
+                                    [ids[child] for child in children])
+                                    for probability, children
+                                    in state_outcomes])
+
+        for root in roots:
+            visit(root)
+        return ids, stop_values, outcomes
+
+    def evaluate_graph(self, graph, bust_value):
+        """
+        Evaluate the turn graph 'graph' (see turn_graph) when busting is
+        worth bust_value, choosing at every state the best move of each
+        roll and the best of stopping and rolling again. Return two lists
+        with the value of each state before its 'y'/'n' decision (rolling
+        is forced in the roots without progress) and after rolling again,
+        both as lines (a, b) whose value is a + b * bust_value, b being the
+        probability of busting with that policy.
+        """
+
+        _, stop_values, outcomes = graph
+        decision_lines = []
+        continue_lines = []
+        for stop, state_outcomes in zip(stop_values, outcomes):
+            a = b = 0.
+            for probability, children in state_outcomes:
+                if not children:
+                    b += probability
+                    continue
+                best_a, best_b = decision_lines[children[0]]
+                best_value = best_a + best_b * bust_value
+                for child in children[1:]:
+                    child_a, child_b = decision_lines[child]
+                    if child_a + child_b * bust_value > best_value:
+                        best_a, best_b = child_a, child_b
+                        best_value = child_a + child_b * bust_value
+                a += probability * best_a
+                b += probability * best_b
+            continue_lines.append((a, b))
+            if stop is None or a + b * bust_value > stop:
+                decision_lines.append((a, b))
+            else:
+                decision_lines.append((stop, 0.))
+        return decision_lines, continue_lines
+
+    def solve_board(self, board):
+        """
+        Solve 'board' for both players, given that every board reachable
+        by stopping is solved. The value x1 of player 1 starting a turn is
+        the fixed point of x1 = F1(1 - F2(1 - x1)), where Fp(y) is the
+        optimal turn value of player p when busting is worth y. It is
+        found by Newton steps (the lines of evaluate_graph give the
+        slopes) kept inside a bisection bracket. Return (x1, x2).
+        """
+
+        graphs = [None]
+        for player in (1, 2):
+            start = (tuple(board[1][player]), 0)
+            graphs.append(self.turn_graph(board, player, [start]))
+        low, high = 0., 1.
+        x1 = 0.5
+        for _ in range(100):
+            a2, b2 = self.evaluate_graph(graphs[2], 1. - x1)[1][-1]
+            x2 = a2 + b2 * (1. - x1)
+            a1, b1 = self.evaluate_graph(graphs[1], 1. - x2)[1][-1]
+            difference = a1 + b1 * (1. - x2) - x1
+            if abs(difference) < 1e-12:
+                break
+            if difference > 0:
+                low = x1
+            else:
+                high = x1
+            next_x1 = x1 - difference / (b1 * b2 - 1.)
+            if not low < next_x1 < high:
+                next_x1 = (low + high) / 2.
+            x1 = next_x1
+        return x1, x2
+
+    def solve(self, min_finished_columns=0, verbose=False):
+        """
+        Compute the values of every board with at least
+        min_finished_columns finished columns. Finished columns are never
+        reopened and every stop advances the board, so boards are solved
+        from the most to the least advanced one (see solve_board), and a
+        board and its mirror (players swapped) are solved together.
+        Boards where a player won 3 columns are terminal.
+        """
+
+        if self.values is None:
+            self.values = np.full((self.n_boards, 2), np.nan,
+                                    dtype=np.float32)
+        codes = [np.arange(self.n_boards) // stride % n_codes
+                    for stride, n_codes in zip(self.strides, self.n_codes)]
+        n_finished = np.zeros(self.n_boards, dtype=int)
+        n_won = np.zeros((2, self.n_boards), dtype=int)
+        advancement = np.zeros(self.n_boards, dtype=int)
+        for code, column in zip(codes, self.columns):
+            height = self.heights[column]
+            is_finished = code >= (height + 1) ** 2
+            n_finished += is_finished
+            n_won[0] += code == (height + 1) ** 2
+            n_won[1] += code == (height + 1) ** 2 + 1
+            # Won columns rank above any progress in open columns.
+            advancement += np.where(is_finished, 2 * height + 1,
+                                    code // (height + 1) + code % (height + 1))
+        for player in (1, 2):
+            terminal = n_won[player - 1] >= 3
+            self.values[terminal, player - 1] = 1.
+            self.values[terminal, 2 - player] = 0.
+        selected = (n_finished >= min_finished_columns) \
+                    & (n_won[0] < 3) & (n_won[1] < 3)
+        order = np.flatnonzero(selected)
+        order = order[np.argsort(-advancement[order], kind='stable')]
+
+        start = timeit.default_timer()
+        for count, index in enumerate(order):
+            if not np.isnan(self.values[index, 0]):
+                continue
+            finished, progress = self.board(index)
+            x1, x2 = self.solve_board((finished, progress))
+            self.values[index] = (x1, x2)
+            mirror = self.board_index([3 - player if player else 0
+                                        for player in finished],
+                                        [None, progress[2], progress[1]])
+            self.values[mirror] = (x2, x1)
+            if verbose and count % 1000 == 0:
+                print(count, '/', len(order), 'boards,',
+                        round(timeit.default_timer() - start), 's')
+
+    def value(self, game):
+        """
+        Return the probability that game.player_turn wins from the current
+        state of 'game' (a Game or CompactGame of this configuration) with
+        optimal play, or None if its board is not in the table.
+        """
+
+        if game.winner != 0:
+            return float(game.winner == game.player_turn)
+        return self.evaluate(game)[0]
+
+    def best_action(self, game):
+        """
+        Return the optimal action of 'game' (one of its available moves),
+        or None if its board is not in the table.
+        """
+
+        return self.evaluate(game)[1]
+
+    def turn_start_value(self, game):
+        """
+        Return values[board, player_turn - 1] for the board of 'game' (the
+        value of the turn before the dice are rolled, ignoring the neutral
+        markers), or None if it is not in the table.
+        """
+
+        if self.values is None:
+            return None
+        finished, progress = self.game_board(game)
+        value = float(self.values[self.board_index(finished, progress),
+                                    game.player_turn - 1])
+        if np.isnan(value):
+            return None
+        return value
+
+    def evaluate(self, game):
+        """
+        Return the value for game.player_turn of the current state of
+        'game' and its optimal action: the best of its available moves, or
+        'y'/'n' when deciding whether to continue. Return (None, None) if
+        the board is not in the table.
+        """
+
+        if self.values is None:
+            return None, None
+        board = self.game_board(game)
+        player = game.player_turn
+        other_value = float(self.values[self.board_index(*board),
+                                        2 - player])
+        if np.isnan(other_value):
+            return None, None
+        bust_value = 1. - other_value
+        state = self.turn_state(game)
+        if not game.dice_action:
+            graph = self.turn_graph(board, player, [state])
+            decision_lines, continue_lines = self.evaluate_graph(graph,
+                                                                bust_value)
+            a, b = decision_lines[graph[0][state]]
+            if (a, b) == continue_lines[graph[0][state]]:
+                return a + b * bust_value, 'y'
+            return a, 'n'
+
+        moves = game.available_moves()
+        if not moves:
+            return bust_value, None
+        graph = self.turn_graph(board, player, [state])
+        decision_lines, _ = self.evaluate_graph(graph, bust_value)
+        positions, n_neutral_markers = state
+        best_value = best_move = None
+        for move in moves:
+            child = self.advance(board[1][player], positions,
+                                    n_neutral_markers, move)
+            a, b = decision_lines[graph[0][child]]
+            if best_value is None or a + b * bust_value > best_value:
+                best_value = a + b * bust_value
+                best_move = move
+        return best_value, best_move
+
+def main():
+    """
+    Solve the toy configuration and write the table. Usage:
+    tablebase.py [min_finished_columns] [path]
+    """
+
+    min_finished_columns = 0
+    path = 'toy_tablebase.npy'
+    if len(sys.argv) > 1:
+        min_finished_columns = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        path = sys.argv[2]
+    tablebase = Tablebase(TOY_CONFIG)
+    tablebase.solve(min_finished_columns, verbose=True)
+    tablebase.save(path)
+    print('Solved', int(np.sum(~np.isnan(tablebase.values[:, 0]))),
+            'boards, table written to', path)
+
+if __name__ == "__main__":
+    main()
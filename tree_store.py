@@ -0,0 +1,283 @@
+import numpy as np
+
+class TreeStore:
+    def __init__(self, capacity):
+        """
+        Search tree of UCTPlayer kept in preallocated NumPy arrays (see
+        UCTPlayer.tree_store_size) instead of Node objects. Nodes are
+        indexes into the arrays and the children of a node are a contiguous
+        block of slots, so selection scores all of them with a single
+        vectorized operation over a slice (see UCTPlayer.select_child_store).
+        - capacity is the maximum number of nodes. Memory is allocated once,
+          states included, and does not grow: when it is full, the nodes no
+          longer reachable from the root are reclaimed (see collect) and, if
+          there is still no room, leaves stop being expanded.
+        - n_visits[i] is the number of visits of node i, which is also the
+          number of times the action leading to it was chosen from its
+          parent (n_a of Node).
+        - q[i] is the mean reward of the simulations that used the action
+          leading to node i (q_a of Node).
+        - prior[i] is the probability given by the network to the action
+          leading to node i (p_a of Node, 0 if there is no network).
+        - parent[i] is the index of the parent of node i, -1 for a root.
+        - first_child[i] and n_children[i] delimit the block of children of
+          node i. n_children[i] is 0 until node i is expanded.
+        - action[i] is the id of the action leading to node i in actions.
+        - actions is the list of actions seen so far and action_ids is the
+          dictionary {action: id} mapping them back to their position.
+        - packed[i] is the encoding of the Game of node i (Game.to_bytes,
+          a few dozen bytes), so that the states take a fixed amount of
+          memory too. The array is allocated by the first new_root, once
+          the size of an encoding is known. Games are rebuilt from it when
+          the search needs them (see state).
+        - player_turn[i] is the player to move in the Game of node i, read
+          by the selection without rebuilding the Game. It is 0 until the
+          node is first selected and its Game created (see
+          UCTPlayer.get_store_child).
+        - game_class, config and dice_stream rebuild the Games as
+          StateBudget does in uct_player.py: the class of the states (Game
+          or CompactGame), the arguments of its from_bytes and the
+          DiceStream shared by the clones of the game searched, if it is
+          seeded. They are taken from the state of the last new_root.
+        - block_size[i] is the number of slots of the block starting at
+          slot i if i starts an allocated block, 0 otherwise.
+        - tags[i] is the generation in which node i was allocated or last
+          found reachable from the root (see advance_root and collect).
+        - collected is the generation of the last collect. Nodes are only
+          released when the generation changes, so collect is not run
+          again before that.
+        - free_blocks is a dictionary {size: list of block starts} of the
+          reclaimed blocks, reused by later allocations.
+        - top is the first slot never allocated.
+        - root is the index of the root, -1 if there is no tree.
+        """
+
+        self.capacity = capacity
+        self.n_visits = np.zeros(capacity, dtype=np.int64)
+        self.q = np.zeros(capacity, dtype=np.float64)
+        self.prior = np.zeros(capacity, dtype=np.float64)
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.first_child = np.zeros(capacity, dtype=np.int32)
+        self.n_children = np.zeros(capacity, dtype=np.int32)
+        self.action = np.zeros(capacity, dtype=np.int32)
+        self.block_size = np.zeros(capacity, dtype=np.int32)
+        self.tags = np.zeros(capacity, dtype=np.uint32)
+        self.packed = None
+        self.player_turn = np.zeros(capacity, dtype=np.int8)
+        self.game_class = None
+        self.config = None
+        self.dice_stream = None
+        self.actions = []
+        self.action_ids = {}
+        self.generation = 0
+        self.collected = -1
+        self.free_blocks = {}
+        self.top = 0
+        self.root = -1
+
+    def clear(self):
+        """Release every node."""
+
+        self.player_turn[:self.top] = 0
+        self.block_size[:self.top] = 0
+        self.free_blocks = {}
+        self.top = 0
+        self.root = -1
+        self.generation += 1
+
+    def new_root(self, state):
+        """
+        Release every node and return the index of a new root whose Game
+        is 'state'.
+        """
+
+        self.clear()
+        self.game_class = type(state)
+        self.config = (state.n_players, state.dice_number, state.dice_value,
+                        state.column_range, state.offset, state.initial_height)
+        self.dice_stream = state.dice_stream
+        size = len(state.to_bytes())
+        if self.packed is None or self.packed.shape[1] != size:
+            self.packed = np.zeros((self.capacity, size), dtype=np.uint8)
+        self.root = self.allocate(1)
+        self.n_visits[self.root] = 0
+        self.parent[self.root] = -1
+        self.n_children[self.root] = 0
+        self.tags[self.root] = self.generation
+        self.set_state(self.root, state)
+        return self.root
+
+    def set_state(self, node, state):
+        """Store 'state' as the Game of 'node'."""
+
+        self.packed[node] = np.frombuffer(state.to_bytes(), dtype=np.uint8)
+        self.player_turn[node] = state.player_turn
+
+    def has_state(self, node):
+        """Return True if the Game of 'node' was created."""
+
+        return self.player_turn[node] != 0
+
+    def state(self, node):
+        """Return a new Game rebuilt in the state of 'node'."""
+
+        state = self.game_class.from_bytes(self.packed[node].tobytes(),
+                                            *self.config)
+        state.dice_stream = self.dice_stream
+        return state
+
+    def advance_root(self, node):
+        """
+        Make 'node', a child of the root, the new root. The rest of the old
+        tree is released in O(1): the generation is bumped, and the blocks
+        not reachable from the new root are only reclaimed by collect, when
+        the store is full.
+        """
+
+        self.root = node
+        self.parent[node] = -1
+        self.generation += 1
+
+    def allocate(self, size):
+        """
+        Return the first slot of a free block of 'size' slots, -1 if the
+        store is full even after reclaiming the unreachable nodes.
+        """
+
+        start = self._allocate(size)
+        if start < 0 and self.collected != self.generation \
+            and self.collect() > 0:
+            start = self._allocate(size)
+        if start >= 0:
+            self.block_size[start] = size
+        return start
+
+    def _allocate(self, size):
+        """
+        Return the first slot of a free block of 'size' slots taken from
+        free_blocks or from the never allocated slots, -1 if there is none.
+        A larger reclaimed block is split if needed.
+        """
+
+        if self.free_blocks.get(size):
+            return self.free_blocks[size].pop()
+        if self.top + size <= self.capacity:
+            self.top += size
+            return self.top - size
+        for free_size in sorted(self.free_blocks):
+            if free_size > size and self.free_blocks[free_size]:
+                start = self.free_blocks[free_size].pop()
+                self.free_blocks.setdefault(free_size - size, []).append(
+                                                                start + size)
+                return start
+        return -1
+
+    def init_block(self, start, parent, actions, priors):
+        """
+        Initialize the nodes of the block starting at 'start' as the
+        children of 'parent' reached through 'actions' (whose priors are
+        'priors', empty if there are none).
+        """
+
+        stop = start + len(actions)
+        ids = []
+        for action in actions:
+            if action not in self.action_ids:
+                self.action_ids[action] = len(self.actions)
+                self.actions.append(action)
+            ids.append(self.action_ids[action])
+        self.n_visits[start:stop] = 0
+        self.q[start:stop] = 0
+        self.prior[start:stop] = priors if len(priors) > 0 else 0
+        self.parent[start:stop] = parent
+        self.n_children[start:stop] = 0
+        self.action[start:stop] = ids
+        self.tags[start:stop] = self.generation
+        self.player_turn[start:stop] = 0
+
+    def expand(self, node, actions, priors=()):
+        """
+        Create the children of 'node' for 'actions' (with their network
+        'priors', if any) and return True, or False if the store is full.
+        """
+
+        start = self.allocate(len(actions))
+        if start < 0:
+            return False
+        self.init_block(start, node, actions, priors)
+        self.first_child[node] = start
+        self.n_children[node] = len(actions)
+        return True
+
+    def is_expanded(self, node):
+        """Return a boolean."""
+
+        return self.n_children[node] > 0
+
+    def child_actions(self, node):
+        """Return the list of the actions of the children of 'node'."""
+
+        start = self.first_child[node]
+        ids = self.action[start:start + self.n_children[node]]
+        return [self.actions[i] for i in ids.tolist()]
+
+    def find_child(self, node, action):
+        """
+        Return the index of the child of 'node' reached through 'action', -1
+        if there is none.
+        """
+
+        if action not in self.action_ids or not self.is_expanded(node):
+            return -1
+        start = self.first_child[node]
+        found = np.flatnonzero(self.action[start:start + self.n_children[node]]
+                                == self.action_ids[action])
+        if found.size == 0:
+            return -1
+        return start + int(found[0])
+
+    def collect(self):
+        """
+        Reclaim the blocks not reachable from the root and return the number
+        of slots reclaimed. The reachable nodes are tagged with the current
+        generation level by level; every allocated block whose first node
+        has an older tag is then unreachable and goes to free_blocks. The
+        block holding the root is kept whole since its siblings share it,
+        but the siblings lose their states and children.
+        """
+
+        self.collected = self.generation
+        if self.root < 0:
+            return 0
+        frontier = np.array([self.root])
+        while frontier.size:
+            self.tags[frontier] = self.generation
+            frontier = frontier[self.n_children[frontier] > 0]
+            counts = self.n_children[frontier]
+            offsets = np.cumsum(counts) - counts
+            frontier = np.arange(counts.sum()) + np.repeat(
+                            self.first_child[frontier] - offsets, counts)
+        starts = np.flatnonzero(self.block_size[:self.top])
+        sizes = self.block_size[starts]
+        in_root_block = (starts <= self.root) & (self.root < starts + sizes)
+        stale = (self.tags[starts] != self.generation) & ~in_root_block
+        for start, size in zip(starts[in_root_block].tolist(),
+                                sizes[in_root_block].tolist()):
+            siblings = np.arange(start, start + size)
+            siblings = siblings[siblings != self.root]
+            self.player_turn[siblings] = 0
+            self.n_children[siblings] = 0
+        reclaimed = 0
+        for start, size in zip(starts[stale].tolist(), sizes[stale].tolist()):
+            self.free_blocks.setdefault(size, []).append(start)
+            self.player_turn[start:start + size] = 0
+            self.n_children[start:start + size] = 0
+            reclaimed += size
+        self.block_size[starts[stale]] = 0
+        return reclaimed
+
+    def n_nodes(self):
+        """Return the number of slots in use (reachable or not collected)."""
+
+        return self.top - sum(size * len(blocks) for size, blocks
+                                in self.free_blocks.items())